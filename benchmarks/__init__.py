@@ -0,0 +1,4 @@
+'''
+Замеры производительности репозиториев на синтетической БД.
+Запускаются из корня проекта как модули, например: python -m benchmarks.repositories
+'''
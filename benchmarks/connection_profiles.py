@@ -0,0 +1,90 @@
+'''
+Замер профилей подключения из modules.database в сравнении с подключением без настроек
+(режим журнала DELETE, кеш и ожидание блокировок по умолчанию, без отображения в память).
+Каждый вариант работает со своей копией одной и той же синтетической БД.
+
+Пример запуска: python -m benchmarks.connection_profiles --writes 200 --import-books 20000
+'''
+import argparse
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import date
+from pathlib import Path
+
+from components.books.book import Book
+from components.clients.client import Client
+
+from benchmarks.repositories import CASES, Repositories, touch
+from benchmarks.synthetic import build_database
+from modules.database import PROFILES, open_database
+
+def connect_bare(path: Path) -> sqlite3.Connection:
+    '''Подключение так, как оно открывалось до появления профилей'''
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA foreign_keys = ON;")
+    return connection
+
+OPENERS : list[tuple[str, Callable[[Path], sqlite3.Connection]]] = [
+    ("без настроек", connect_bare),
+    *((name, lambda path, name=name: open_database(path, name)) for name in PROFILES)
+]
+'''Сравниваемые способы открыть подключение: название и функция'''
+
+def measure_writes(connection: sqlite3.Connection, count: int) -> float:
+    '''Время добавления count читателей, каждого отдельной транзакцией (как при работе с меню)'''
+    repos = Repositories(connection)
+    started = time.perf_counter()
+    for i in range(count):
+        repos.clients.add_client(Client(f"Читатель {i}", date.today(), "ул. Садовая, д. 1"))
+    return time.perf_counter() - started
+
+def measure_reports(connection: sqlite3.Connection, repeat: int) -> float:
+    '''Суммарное лучшее время всех вызовов из benchmarks.repositories.CASES'''
+    repos = Repositories(connection)
+    total = 0.0
+    for _, case in CASES:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            touch(case(repos))
+            best = min(best, time.perf_counter() - started)
+        total += best
+    return total
+
+def measure_import(connection: sqlite3.Connection, count: int) -> float:
+    '''Время добавления count книг одной транзакцией'''
+    repos = Repositories(connection)
+    books = [Book(f"Книга {i}", 2000, "А.П. Чехов", "Рассказ", date.today()) for i in range(count)]
+    started = time.perf_counter()
+    repos.books.add_books(books)
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнить профили подключения к БД.")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--loans", type=int, default=100000)
+    parser.add_argument("--writes", type=int, default=200, help="число отдельных транзакций записи")
+    parser.add_argument("--import-books", type=int, default=20000, help="число книг в массовой загрузке")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        template = Path(directory) / "template.db"
+        build_database(template, args.books, args.clients, args.loans)
+
+        print(f"{'Подключение':<16}{'запись, мс':>14}{'отчёты, мс':>14}{'загрузка, мс':>16}")
+        for name, opener in OPENERS:
+            path = Path(directory) / f"{name}.db"
+            shutil.copyfile(template, path)
+            connection = opener(path)
+            try:
+                writes = measure_writes(connection, args.writes)
+                reports = measure_reports(connection, args.repeat)
+                imported = measure_import(connection, args.import_books)
+            finally:
+                connection.close()
+            print(f"{name:<16}{writes * 1000:>14.1f}{reports * 1000:>14.1f}{imported * 1000:>16.1f}")
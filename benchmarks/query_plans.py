@@ -0,0 +1,186 @@
+'''
+Проверка планов запросов всех view репозиториев.
+
+Строит синтетическую БД, выполняет через каждый view все виды запросов (длина, срез с шагом 1 и 2,
+поиск от ключа вперёд и назад, потоковый обход) с предикатами и без, и для каждого запроса получает
+EXPLAIN QUERY PLAN. Планы сравниваются со снимком query_plans.json: новые строки SCAN и USE TEMP B-TREE
+считаются регрессией, и скрипт завершается с кодом 1.
+
+Запуск: python -m benchmarks.query_plans [--update]
+После намеренного изменения запросов или схемы снимок обновляется с флагом --update.
+Планы зависят от версии SQLite, поэтому снимок следует обновлять на той же версии, на которой выполняется проверка.
+'''
+import argparse
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import tempfile
+from collections import Counter
+from collections.abc import Callable, Sequence
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from components.books.book import Book
+from components.books.repository import BookSearchPredicate
+from components.clients.repository import ClientSearchPredicate
+from components.loans.repository import LoanSearchPredicate
+
+from benchmarks.synthetic import build_database
+from benchmarks.repositories import Repositories
+
+SNAPSHOT = Path(__file__).resolve().parent / "query_plans.json"
+'''Файл со снимком планов запросов'''
+
+SUSPICIOUS = re.compile(r"\bSCAN\b|USE TEMP B-TREE")
+'''Строки плана, появление которых считается регрессией'''
+
+PAGE_SIZE = 20
+
+class RecordingConnection:
+    '''
+    Обёртка подключения, запоминающая все выполненные через неё запросы.
+    Остальные атрибуты передаются обёрнутому подключению.
+    '''
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+        self.queries : list[tuple[str, Any]] = []
+        '''Выполненные запросы и их параметры'''
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        self.queries.append((sql, parameters))
+        return self._connection.execute(sql, parameters)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+_TODAY = date.today()
+_PAST = date(2017, 6, 1)
+_BOOK = Book("", 0, "", "", _TODAY, 1)
+
+def _snapshot_expired_loans(r: Repositories, at: date, predicate: LoanSearchPredicate | None = None) -> Any:
+    '''Отчёт о просроченных взятиях, прочитанный из снимка'''
+    r.loans.snapshot_expired_loans(at)
+    return r.loans.get_expired_loans_at(at, predicate)
+
+VIEWS : list[tuple[str, Callable[[Repositories], Any]]] = [
+    ("books.get_unloaned_books_at", lambda r: r.books.get_unloaned_books_at(_PAST)),
+    ("books.get_unloaned_books_at[today]", lambda r: r.books.get_unloaned_books_at(_TODAY)),
+    ("books.get_unloaned_books_at[predicate]", lambda r: r.books.get_unloaned_books_at(_PAST, BookSearchPredicate(NameContains="каренина", PublicationYearMin=1900))),
+    ("books.get_genre_scores", lambda r: r.books.get_genre_scores()),
+    ("books.get_books", lambda r: r.books.get_books()),
+    ("books.get_books[predicate]", lambda r: r.books.get_books(BookSearchPredicate(AuthorContains="толстой", GenreContains="ро"))),
+    ("clients.get_clients", lambda r: r.clients.get_clients()),
+    ("clients.get_clients[predicate]", lambda r: r.clients.get_clients(ClientSearchPredicate(NameContains="обломов"))),
+    ("clients.get_last_visit_dates", lambda r: r.clients.get_last_visit_dates()),
+    ("clients.get_last_visit_dates[predicate]", lambda r: r.clients.get_last_visit_dates(ClientSearchPredicate(NameContains="обломов"))),
+    ("clients.get_total_loans_per_client", lambda r: r.clients.get_total_loans_per_client()),
+    ("clients.get_total_loans_per_client[predicate]", lambda r: r.clients.get_total_loans_per_client(ClientSearchPredicate(NameContains="обломов"))),
+    ("clients.get_total_unreturned_loans_per_client", lambda r: r.clients.get_total_unreturned_loans_per_client()),
+    ("clients.get_total_unreturned_loans_per_client[predicate]", lambda r: r.clients.get_total_unreturned_loans_per_client(ClientSearchPredicate(NameContains="обломов"))),
+    ("clients.get_client_summaries", lambda r: r.clients.get_client_summaries()),
+    ("clients.get_client_summaries[predicate]", lambda r: r.clients.get_client_summaries(ClientSearchPredicate(NameContains="обломов"))),
+    ("loans.get_unreturned_loans", lambda r: r.loans.get_unreturned_loans()),
+    ("loans.get_unreturned_loans[predicate]", lambda r: r.loans.get_unreturned_loans(LoanSearchPredicate(GenreContains="роман", ClientNameContains="дон"))),
+    ("loans.get_expired_loans_at", lambda r: r.loans.get_expired_loans_at(_TODAY)),
+    ("loans.get_expired_loans_at[predicate]", lambda r: r.loans.get_expired_loans_at(_TODAY, LoanSearchPredicate(AuthorContains="пушкин", StartDateMin=_PAST))),
+    ("loans.get_expired_loans_at[snapshot]", lambda r: _snapshot_expired_loans(r, _PAST)),
+    ("loans.get_expired_loans_at[snapshot, predicate]", lambda r: _snapshot_expired_loans(r, _PAST, LoanSearchPredicate(AuthorContains="пушкин"))),
+    ("loans.get_book_history", lambda r: r.loans.get_book_history(_BOOK)),
+    ("loans.get_availability", lambda r: r.loans.get_availability([1, 2, 3], _PAST, _PAST + timedelta(days=365))),
+]
+'''Проверяемые view: название и функция, получающая view из репозитория'''
+
+OPERATIONS : list[tuple[str, Callable[[Any], Any]]] = [
+    ("len", lambda view: view._get_len()),
+    ("slice", lambda view: view._get_slice(PAGE_SIZE, PAGE_SIZE, 1)),
+    ("slice_stride", lambda view: view._get_slice(PAGE_SIZE, PAGE_SIZE, 2)),
+    ("seek_first", lambda view: view._get_seek_slice(None, PAGE_SIZE, False)),
+    ("seek_forward", lambda view: seek_from_first_page(view, False)),
+    ("seek_backward", lambda view: seek_from_first_page(view, True)),
+    ("iter", lambda view: list(itertools.islice(view, PAGE_SIZE))),
+]
+'''Виды запросов view: название и функция, выполняющая запрос'''
+
+def seek_from_first_page(view: Any, backward: bool) -> Sequence[Any]:
+    '''Поиск от ключа последней записи первой страницы (без него запрос с условием ключа не выполняется).'''
+    items = view._get_seek_slice(None, PAGE_SIZE, False)
+    if len(items) == 0:
+        return []
+    connection : RecordingConnection = view._connection
+    connection.queries.clear()
+    return view._get_seek_slice(view._get_key(items[-1]), PAGE_SIZE, backward)
+
+def explain(connection: sqlite3.Connection, sql: str, parameters: Any) -> list[str]:
+    '''План запроса в виде строк с отступами по вложенности.'''
+    depth : dict[int, int] = { 0: -1 }
+    lines : list[str] = []
+    for id, parent, _, detail in connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters):
+        depth[id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[id] + detail)
+    return lines
+
+def collect_plans(connection: sqlite3.Connection) -> dict[str, list[str]]:
+    '''Планы всех запросов всех view по названию вида "view.операция" (или "view.операция#N" для нескольких запросов).'''
+    recording = RecordingConnection(connection)
+    repos = Repositories(recording) #type: ignore
+    plans : dict[str, list[str]] = {}
+    for view_name, get_view in VIEWS:
+        for operation_name, operation in OPERATIONS:
+            view = get_view(repos)
+            recording.queries.clear()
+            operation(view)
+            queries = [(sql, params) for sql, params in recording.queries if sql.lstrip().upper().startswith("SELECT")]
+            for index, (sql, params) in enumerate(queries):
+                name = f"{view_name}.{operation_name}" + (f"#{index}" if len(queries) > 1 else "")
+                plans[name] = explain(connection, sql, params)
+    return plans
+
+def compare(snapshot: dict[str, list[str]], plans: dict[str, list[str]]) -> list[str]:
+    '''
+    Сравнить планы со снимком.
+    Возвращает описания регрессий: новых строк SCAN и USE TEMP B-TREE, а также запросов, отсутствующих в снимке.
+    '''
+    problems : list[str] = []
+    for name, plan in plans.items():
+        if name not in snapshot:
+            problems.append(f"{name}: нет в снимке")
+            continue
+        known = Counter(line.strip() for line in snapshot[name] if SUSPICIOUS.search(line))
+        current = Counter(line.strip() for line in plan if SUSPICIOUS.search(line))
+        for line, count in (current - known).items():
+            problems.append(f"{name}: {line}" + (f" (x{count})" if count > 1 else ""))
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнить планы запросов view репозиториев со снимком.")
+    parser.add_argument("--update", action="store_true", help="перезаписать снимок текущими планами")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--loans", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "plans.db"
+        build_database(path, args.books, args.clients, args.loans)
+        connection = sqlite3.connect(path)
+        try:
+            plans = collect_plans(connection)
+        finally:
+            connection.close()
+
+    if args.update:
+        SNAPSHOT.write_text(json.dumps(plans, ensure_ascii=False, indent=4) + "\n", encoding="utf-8")
+        print(f"Снимок обновлён: {len(plans)} запросов")
+        sys.exit(0)
+
+    snapshot = json.loads(SNAPSHOT.read_text(encoding="utf-8")) if SNAPSHOT.exists() else {}
+    problems = compare(snapshot, plans)
+    for name in sorted(snapshot.keys() - plans.keys()):
+        print(f"{name}: запрос больше не выполняется")
+    for problem in problems:
+        print(problem)
+    print(f"Проверено запросов: {len(plans)}, регрессий: {len(problems)}")
+    sys.exit(1 if len(problems) > 0 else 0)
@@ -0,0 +1,127 @@
+'''
+Замер времени методов репозиториев до и после миграции с индексами.
+Обе БД строятся с одинаковыми данными, различается только набор применённых миграций.
+
+Пример запуска: python -m benchmarks.repositories --before 7 --books 20000 --clients 5000 --loans 100000
+'''
+import argparse
+import sqlite3
+import tempfile
+import time
+from collections.abc import Callable, Sequence
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from components.books.book import Book
+from components.books.repository import BookSearchPredicate
+from components.books.sqlite3 import BookRepositorySqlite3
+from components.clients.repository import ClientSearchPredicate
+from components.clients.sqlite3 import ClientRepositorySqlite3
+from components.loans.repository import LoanSearchPredicate
+from components.loans.sqlite3 import LoanRepositorySqlite3
+
+from benchmarks.synthetic import build_database, migrations, migration_number
+
+class Repositories:
+    '''Репозитории, работающие через одно подключение'''
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.books = BookRepositorySqlite3(connection)
+        self.clients = ClientRepositorySqlite3(connection)
+        self.loans = LoanRepositorySqlite3(connection)
+
+_TODAY = date.today()
+_PAST = date(2017, 6, 1)
+_BOOK = Book("", 0, "", "", _TODAY, 1)
+
+CASES : list[tuple[str, Callable[[Repositories], Any]]] = [
+    ("books.get_books", lambda r: r.books.get_books()),
+    ("books.get_books(name)", lambda r: r.books.get_books(BookSearchPredicate(NameContains="каренина"))),
+    ("books.get_unloaned_books_at(today)", lambda r: r.books.get_unloaned_books_at(_TODAY)),
+    ("books.get_unloaned_books_at(past)", lambda r: r.books.get_unloaned_books_at(_PAST)),
+    ("books.get_genre_scores", lambda r: r.books.get_genre_scores()),
+    ("clients.get_clients", lambda r: r.clients.get_clients()),
+    ("clients.get_clients(name)", lambda r: r.clients.get_clients(ClientSearchPredicate(NameContains="обломов"))),
+    ("clients.get_last_visit_dates", lambda r: r.clients.get_last_visit_dates()),
+    ("clients.get_total_loans_per_client", lambda r: r.clients.get_total_loans_per_client()),
+    ("clients.get_total_unreturned_loans_per_client", lambda r: r.clients.get_total_unreturned_loans_per_client()),
+    ("clients.get_client_summaries", lambda r: r.clients.get_client_summaries()),
+    ("loans.get_unreturned_loans", lambda r: r.loans.get_unreturned_loans()),
+    ("loans.get_unreturned_loans(genre)", lambda r: r.loans.get_unreturned_loans(LoanSearchPredicate(GenreContains="роман"))),
+    ("loans.get_expired_loans_at(today)", lambda r: r.loans.get_expired_loans_at(_TODAY)),
+    ("loans.get_expired_loans_at(past)", lambda r: r.loans.get_expired_loans_at(_PAST)),
+    ("loans.get_book_history", lambda r: r.loans.get_book_history(_BOOK)),
+    ("loans.is_book_loaned_during", lambda r: r.loans.is_book_loaned_during(_BOOK, _PAST, _PAST + timedelta(days=30))),
+    ("loans.get_books_loaned_during(100)", lambda r: r.loans.get_books_loaned_during(range(1, 101), _PAST, _PAST + timedelta(days=30))),
+    ("loans.get_availability(100)", lambda r: r.loans.get_availability(range(1, 101), _PAST, _PAST + timedelta(days=365))),
+]
+'''Замеряемые вызовы: название и функция, вызывающая метод репозитория'''
+
+PAGE_SIZE = 20
+
+def touch(result: Any) -> None:
+    '''
+    Выполнить запросы, которые выполняет меню при показе результата:
+    длина, первая страница и страница из середины списка.
+    '''
+    if not isinstance(result, Sequence):
+        return
+    length = len(result)
+    if hasattr(result, "get_page"):
+        result.get_page(0, PAGE_SIZE)
+        result.get_page(length // PAGE_SIZE // 2, PAGE_SIZE)
+    else:
+        result[0:PAGE_SIZE]
+
+def measure(path: Path, repeat: int) -> dict[str, float | None]:
+    '''
+    Лучшее время каждого вызова из CASES (в секундах) на указанной БД.
+    Вызовы, которым нужны таблицы из более поздних миграций, получают None.
+    '''
+    timings : dict[str, float | None] = {}
+    with sqlite3.connect(path) as connection:
+        connection.execute("PRAGMA foreign_keys = ON;")
+        repos = Repositories(connection)
+        for name, case in CASES:
+            best : float | None = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                try:
+                    touch(case(repos))
+                except sqlite3.OperationalError:
+                    best = None
+                    break
+                best = min(best, time.perf_counter() - started)
+            timings[name] = best
+    connection.close()
+    return timings
+
+if __name__ == "__main__":
+    latest = migration_number(migrations()[-1])
+
+    parser = argparse.ArgumentParser(description="Сравнить время методов репозиториев до и после миграции.")
+    parser.add_argument("--before", type=int, default=latest - 1, help="номер последней миграции для замера \"до\"")
+    parser.add_argument("--after", type=int, default=latest, help="номер последней миграции для замера \"после\"")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--loans", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results : list[dict[str, float | None]] = []
+        for upto in (args.before, args.after):
+            path = Path(directory) / f"bench_{upto}.db"
+            build_database(path, args.books, args.clients, args.loans, upto)
+            results.append(measure(path, args.repeat))
+
+    before, after = results
+    print(f"{'Метод':<48}{f'до ({args.before}), мс':>16}{f'после ({args.after}), мс':>18}{'ускорение':>12}")
+    for name, _ in CASES:
+        was, now = before[name], after[name]
+        print(
+            f"{name:<48}"
+            f"{f'{was * 1000:.2f}' if was is not None else 'н/д':>16}"
+            f"{f'{now * 1000:.2f}' if now is not None else 'н/д':>18}"
+            f"{f'{was / max(now, 1e-9):.1f}x' if was is not None and now is not None else '':>12}"
+        )
@@ -0,0 +1,145 @@
+'''
+Построение синтетической БД заданного размера для замеров производительности.
+
+Пример запуска: python -m benchmarks.synthetic bench.db --books 20000 --clients 5000 --loans 100000
+'''
+import argparse
+import random
+import re
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+
+from components.books.sqlite3 import fill_folded_columns as fill_book_folded_columns
+from components.clients.sqlite3 import fill_folded_columns as fill_client_folded_columns
+from modules.invalidation import InvalidationBus
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+'''Папка со скриптами миграций'''
+
+_WORDS = [
+    "Война", "мир", "Анна", "Каренина", "Идиот", "Бесы", "Мёртвые", "души", "Отцы", "дети",
+    "Тихий", "Дон", "Мастер", "Маргарита", "Обломов", "Герой", "нашего", "времени", "Вишнёвый", "сад"
+]
+_AUTHORS = ["А.С. Пушкин", "Л.Н. Толстой", "Ф.М. Достоевский", "Н.В. Гоголь", "М.А. Булгаков", "И.А. Гончаров", "А.П. Чехов"]
+_GENRES = ["Роман", "Повесть", "Фантастика", "Детектив", "Поэзия", "Драма", "Комедия", "Рассказ"]
+_STREETS = ["ул. Ленина", "ул. Пушкина", "пр. Мира", "ул. Садовая"]
+
+def migration_number(path: Path) -> int:
+    '''Номер миграции по имени файла (migration_N_*.sql)'''
+    match = re.match(r"migration_(\d+)_", path.name)
+    if match is None:
+        raise ValueError(f"Not a migration script: {path.name}")
+    return int(match.group(1))
+
+def migrations(upto: int | None = None) -> list[Path]:
+    '''
+    Скрипты миграций в порядке применения.
+
+    Аргументы:
+    upto : int | None -- номер последней применяемой миграции (все, если не указан).
+    '''
+    scripts = sorted(MIGRATIONS_DIR.glob("migration_*.sql"), key=migration_number)
+    return [script for script in scripts if upto is None or migration_number(script) <= upto]
+
+def build_database(path: str | Path, books: int, clients: int, loans: int, upto: int | None = None, seed: int = 0) -> None:
+    '''
+    Создать БД со схемой после указанной миграции и заполнить её случайными данными.
+    Существующий файл БД перезаписывается.
+
+    Аргументы:
+    path : str | Path -- путь к файлу БД.
+    books : int -- число книг.
+    clients : int -- число читателей.
+    loans : int -- примерное число взятий (около 10% книг остаются на руках).
+    upto : int | None -- номер последней применяемой миграции (все, если не указан).
+    seed : int -- начальное значение генератора случайных чисел.
+    '''
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    rnd = random.Random(seed)
+
+    connection = sqlite3.connect(path)
+    try:
+        for script in migrations(upto):
+            connection.executescript(script.read_text(encoding="utf-8"))
+
+        #Данные генерируются без пересечений взятий по построению, поэтому построчная проверка триггерами не нужна
+        #(к тому же TRG_LoanOnce_* отвергают вторую завершённую выдачу одной и той же книги)
+        triggers = connection.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'TRG_LoanOnce%'").fetchall()
+        for name, _ in triggers:
+            connection.execute(f"DROP TRIGGER {name};")
+
+        opened = date(2015, 1, 1)
+        first_loan = opened + timedelta(days=365)
+        today = date.today()
+
+        connection.executemany(
+            "INSERT INTO Book (ID, Name, PublicationYear, Author, Genre, AddedAtDate) VALUES (?, ?, ?, ?, ?, ?);",
+            (
+                (
+                    i + 1,
+                    " ".join(rnd.sample(_WORDS, rnd.randint(1, 3))),
+                    rnd.randint(1800, 2020),
+                    rnd.choice(_AUTHORS),
+                    rnd.choice(_GENRES),
+                    (opened + timedelta(days=rnd.randint(0, 364))).isoformat()
+                )
+                for i in range(books)
+            )
+        )
+        connection.executemany(
+            "INSERT INTO Client (ID, Name, RegistrationDate, Address) VALUES (?, ?, ?, ?);",
+            (
+                (
+                    i + 1,
+                    " ".join(rnd.sample(_WORDS, 3)),
+                    (opened + timedelta(days=rnd.randint(0, 364))).isoformat(),
+                    f"{rnd.choice(_STREETS)}, д. {rnd.randint(1, 100)}"
+                )
+                for i in range(clients)
+            )
+        )
+
+        #Взятия каждой книги идут друг за другом; у части книг последнее взятие остаётся открытым
+        rows : list[tuple[str, str, str | None, int, int]] = []
+        next_start = { book: first_loan + timedelta(days=rnd.randint(0, 60)) for book in range(1, books + 1) }
+        for _ in range(loans):
+            book = rnd.randint(1, books)
+            start = next_start[book] + timedelta(days=rnd.randint(0, 90))
+            if start >= today:
+                continue
+            returned = start + timedelta(days=rnd.randint(1, 45))
+            rows.append((start.isoformat(), (start + timedelta(days=14)).isoformat(), returned.isoformat(), book, rnd.randint(1, clients)))
+            next_start[book] = returned + timedelta(days=1)
+        for book, start in next_start.items():
+            if start < today and rnd.random() < 0.1:
+                rows.append((start.isoformat(), (start + timedelta(days=14)).isoformat(), None, book, rnd.randint(1, clients)))
+        connection.executemany(
+            "INSERT INTO Loan (StartDate, EndDate, ReturnDate, BookID, ClientID) VALUES (?, ?, ?, ?, ?);",
+            rows
+        )
+
+        for _, sql in triggers:
+            connection.execute(sql)
+        connection.commit()
+
+        #Столбцы с приведённым регистром заполняются так же, как при запуске приложения
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(Book);")]
+        if "NameFolded" in columns:
+            bus = InvalidationBus()
+            fill_book_folded_columns(connection, bus)
+            fill_client_folded_columns(connection, bus)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Создать синтетическую БД библиотеки для замеров производительности.")
+    parser.add_argument("path", help="путь к создаваемому файлу БД")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--loans", type=int, default=100000)
+    parser.add_argument("--upto", type=int, default=None, help="номер последней применяемой миграции")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    build_database(args.path, args.books, args.clients, args.loans, args.upto, args.seed)
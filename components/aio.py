@@ -0,0 +1,72 @@
+'''
+Асинхронный фасад репозиториев библиотеки для asyncio:
+
+    with ConnectionPool("library.db") as pool:
+        async with AsyncLibrary(pool) as library:
+            books = await library.books.view(lambda repo: repo.get_books())
+            page = await books.get_page(0, 10)
+            async for book in books:
+                ...
+'''
+from __future__ import annotations
+
+from typing import Any, Self
+
+from modules.aio import AsyncExecutor, AsyncRepository
+from modules.invalidation import InvalidationBus
+from modules.pool import ConnectionPool
+
+from .books.repository import IBookRepository
+from .books.sqlite3 import BookRepositorySqlite3
+from .clients.repository import IClientRepository
+from .clients.sqlite3 import ClientRepositorySqlite3
+from .loans.repository import ILoanRepository
+from .loans.sqlite3 import LoanRepositorySqlite3
+
+
+class LibraryRepositories:
+    '''Репозитории AsyncLibrary: пишут через подключение writer пула (взятия - через его очередь записи), читают через пул'''
+    def __init__(self, pool: ConnectionPool, bus: InvalidationBus) -> None:
+        self.books : IBookRepository = BookRepositorySqlite3(pool.writer, bus, None, pool)
+        self.clients : IClientRepository = ClientRepositorySqlite3(pool.writer, bus, None, pool)
+        self.loans : ILoanRepository = LoanRepositorySqlite3(pool.writer, bus, None, pool.write_queue(bus), pool)
+
+
+class AsyncLibrary:
+    '''
+    Асинхронный доступ к репозиториям книг, читателей и взятий.
+    Запросы выполняются в ограниченном пуле потоков, у каждого потока собственное подключение только для чтения.
+    Изменения пишутся через единственное пишущее подключение пула подключений (и его очередь записи),
+    поэтому в процессе остаётся один писатель, а шина bus может быть общей с остальным приложением:
+    изменение через любой поток или через синхронные репозитории сбрасывает кеши всех view.
+    '''
+
+    def __init__(self, pool: ConnectionPool, max_workers: int = 4, bus: InvalidationBus | None = None) -> None:
+        '''
+        pool : ConnectionPool -- пул подключений к БД (закрывается вызывающим после закрытия AsyncLibrary).
+        max_workers : int -- число потоков (и подключений для чтения) для запросов.
+        bus : InvalidationBus | None -- шина уведомлений об изменениях. Должна совпадать с шиной очереди записи пула,
+                                        если очередь уже создана (см. ConnectionPool.write_queue).
+        '''
+        if bus is None:
+            bus = InvalidationBus()
+        repositories = LibraryRepositories(pool, bus)
+        self._executor = AsyncExecutor(
+            pool.open_reader,
+            lambda connection: repositories,
+            max_workers
+        )
+        self.books = AsyncRepository[IBookRepository](self._executor, lambda context: context.books)
+        self.clients = AsyncRepository[IClientRepository](self._executor, lambda context: context.clients)
+        self.loans = AsyncRepository[ILoanRepository](self._executor, lambda context: context.loans)
+
+    def close(self: Self) -> None:
+        '''Дождаться выполнения начатых запросов и закрыть подключения потоков (пул подключений остаётся открытым)'''
+        self._executor.close()
+
+    async def __aenter__(self: Self) -> Self:
+        await self._executor.__aenter__()
+        return self
+
+    async def __aexit__(self: Self, *args: Any) -> None:
+        await self._executor.__aexit__(*args)
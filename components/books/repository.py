@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Self, Protocol, Sequence
+from typing import Self, Protocol, Sequence, Iterable
 from datetime import date
 from .book import Book
 from dataclasses import dataclass
@@ -38,6 +38,17 @@ class IBookRepository(Protocol):
             Если книга с таким ID уже существует, будет поднята ошибка.
         """
         raise NotImplementedError()
+
+    def add_books(self: Self, books: Iterable[Book]) -> None:
+        """
+            Добавить сразу несколько новых книг одной транзакцией.
+            Книгам без ID присваиваются ID.
+            
+            books: Iterable[Book] -- книги.
+
+            Если книга с таким ID уже существует, будет поднята ошибка, и ни одна книга не будет добавлена.
+        """
+        raise NotImplementedError()
     
     def update_book(self: Self, book: Book) -> None:
         """
@@ -1,40 +1,64 @@
 import sqlite3
 from typing import Self, Sequence, Any
+from collections.abc import Iterator, Iterable
 from datetime import date
 from .book import Book
 from .repository import BookSearchPredicate
-from modules.view import CachingView
-from modules.events import Event, WeakSubscriber
+from modules.view import CachingView, KeysetCachingView, iter_cursor
+from modules.keyset import seek_condition, seek_order, seek_params
+from modules.events import WeakSubscriber
+from modules.invalidation import InvalidationBus
+from modules.transaction import commit, rollback
+from modules.report_cache import ReportCache
+from modules.pool import ConnectionPool
+from modules.casefold import fold, contains_pattern, fts_phrase, register_casefold
+from modules.bulk import insert_many
 
 class BookRepositorySqlite3:
     """
         Репозиторий книг, реализованный для SQLite
     """
-    def __init__(self, connection: sqlite3.Connection):
+    def __init__(self, connection: sqlite3.Connection, bus: InvalidationBus | None = None, cache: ReportCache | None = None,
+                 readers: ConnectionPool | None = None):
+        """
+            connection: sqlite3.Connection -- подключение к БД.
+            bus: InvalidationBus | None -- шина сброса кешей, общая с другими репозиториями той же БД.
+                                           Если не указана, то создаётся собственная шина репозитория.
+            cache: ReportCache | None -- общий кеш готовых результатов отчётов для этого подключения.
+                                         Если не указан, то результаты кешируются только внутри каждого view.
+            readers: ConnectionPool | None -- пул подключений для чтения, через которые выполняются запросы возвращаемых view.
+                                              Если не указан, то view выполняют запросы через connection.
+        """
         self._connection = connection
-        self._reset_cache_event = Event[()]()
+        self._bus = bus if bus is not None else InvalidationBus()
+        self._cache = cache
+        self._readers = readers
+
+    def _register[V: CachingView[Any]](self: Self, view: V) -> V:
+        """
+            Подготовить возвращаемый view: подписать его сброс кеша на изменения его таблиц,
+            подключить общий кеш отчётов и пул подключений для чтения.
+        """
+        self._bus.subscribe(view.tables, WeakSubscriber(view.reset_cache))
+        view.report_cache = self._cache
+        view.readers = self._readers
+        return view
     
     def get_unloaned_books_at(self: Self, date: date, predicate: BookSearchPredicate | None = None) -> Sequence[Book]:
-        view = UnloanedBooksView(self._connection, date, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(UnloanedBooksView(self._connection, date, predicate))
 
     def get_genre_scores(self: Self) -> Sequence[tuple[str, int]]:
         """
             Вычислить количество взятий книг каждого жанра (популярность жанра).
             Возвращает последовательность с парами жанр-количество взятий.
         """
-        view = GenreScoresView(self._connection)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(GenreScoresView(self._connection))
     
     def get_books(self: Self, predicate: BookSearchPredicate | None = None) -> Sequence[Book]:
         """
             Список книг, удовлетворяющих заданному предикату (или всех, если предикат не указан)
         """
-        view = AllBooksView(self._connection, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(AllBooksView(self._connection, predicate))
     
     def add_book(self: Self, book: Book) -> None:
         """
@@ -47,38 +71,76 @@ class BookRepositorySqlite3:
         try:
             if book.ID is None:
                 cur = self._connection.execute(
-                    "INSERT INTO Book (Name, Author, Genre, PublicationYear, AddedAtDate) "
-                    "VALUES (:name, :author, :genre, :year, :regDate) "
+                    "INSERT INTO Book (Name, Author, Genre, PublicationYear, AddedAtDate, NameFolded, AuthorFolded, GenreFolded) "
+                    "VALUES (:name, :author, :genre, :year, :regDate, :nameFolded, :authorFolded, :genreFolded) "
                     "RETURNING ID; ",
                     {
                         "name": book.Name,
                         "author": book.Author,
                         "genre": book.Genre,
                         "year": book.PublicationYear,
-                        "regDate": book.AddedAtDate
+                        "regDate": book.AddedAtDate,
+                        "nameFolded": fold(book.Name),
+                        "authorFolded": fold(book.Author),
+                        "genreFolded": fold(book.Genre)
                     }
                 )
                 cur.row_factory = None
                 book.ID = cur.fetchone()[0]
             else:
                 self._connection.execute(
-                    "INSERT INTO Book (ID, Name, Author, Genre, PublicationYear, AddedAtDate) "
-                    "VALUES (:id, :name, :author, :genre, :year, :regDate);",
+                    "INSERT INTO Book (ID, Name, Author, Genre, PublicationYear, AddedAtDate, NameFolded, AuthorFolded, GenreFolded) "
+                    "VALUES (:id, :name, :author, :genre, :year, :regDate, :nameFolded, :authorFolded, :genreFolded);",
                     {
                         "id": book.ID,
                         "name": book.Name,
                         "author": book.Author,
                         "genre": book.Genre,
                         "year": book.PublicationYear,
-                        "regDate": book.AddedAtDate
+                        "regDate": book.AddedAtDate,
+                        "nameFolded": fold(book.Name),
+                        "authorFolded": fold(book.Author),
+                        "genreFolded": fold(book.Genre)
                     }
                 )
         except:
-            self._connection.rollback()
+            rollback(self._connection)
+            raise
+        else:
+            commit(self._connection, self._bus, "Book")
+
+    def add_books(self: Self, books: Iterable[Book]) -> None:
+        """
+            Добавить сразу несколько новых книг одной транзакцией.
+            Книгам без ID присваиваются ID.
+            
+            books: Iterable[Book] -- книги.
+
+            Если книга с таким ID уже существует, будет поднята ошибка, и ни одна книга не будет добавлена.
+        """
+        try:
+            insert_many(
+                self._connection,
+                "Book",
+                books,
+                "INSERT INTO Book (ID, Name, Author, Genre, PublicationYear, AddedAtDate, NameFolded, AuthorFolded, GenreFolded) "
+                "VALUES (:id, :name, :author, :genre, :year, :regDate, :nameFolded, :authorFolded, :genreFolded);",
+                lambda book: {
+                    "name": book.Name,
+                    "author": book.Author,
+                    "genre": book.Genre,
+                    "year": book.PublicationYear,
+                    "regDate": book.AddedAtDate,
+                    "nameFolded": fold(book.Name),
+                    "authorFolded": fold(book.Author),
+                    "genreFolded": fold(book.Genre)
+                }
+            )
+        except:
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Book")
 
     def update_book(self: Self, book: Book) -> None:
         """
@@ -94,7 +156,8 @@ class BookRepositorySqlite3:
         try:
             self._connection.execute(
                 "UPDATE Book SET "
-                "Name=:name,Author=:author,Genre=:genre,PublicationYear=:year,AddedAtDate=:regDate "
+                "Name=:name,Author=:author,Genre=:genre,PublicationYear=:year,AddedAtDate=:regDate,"
+                "NameFolded=:nameFolded,AuthorFolded=:authorFolded,GenreFolded=:genreFolded "
                 "WHERE ID=:id;",
                 {
                         "id": book.ID,
@@ -102,15 +165,17 @@ class BookRepositorySqlite3:
                         "author": book.Author,
                         "genre": book.Genre,
                         "year": book.PublicationYear,
-                        "regDate": book.AddedAtDate
+                        "regDate": book.AddedAtDate,
+                        "nameFolded": fold(book.Name),
+                        "authorFolded": fold(book.Author),
+                        "genreFolded": fold(book.Genre)
                     }
             )
         except:
-            self._connection.rollback()
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Book")
 
     def delete_book(self: Self, book: Book) -> None:
         """
@@ -131,27 +196,62 @@ class BookRepositorySqlite3:
                 }
             )
         except:
-            self._connection.rollback()
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Book", "Loan")
+
+def book_from_row(row: sqlite3.Row) -> Book:
+    return Book(row["Name"], row["PublicationYear"], row["Author"], row["Genre"], date.fromisoformat(row["AddedAtDate"]), row["ID"])
+
+def genre_score_from_row(row: sqlite3.Row) -> tuple[str, int]:
+    return (row['Genre'], row['Score'])
+
+def fill_folded_columns(connection: sqlite3.Connection, bus: InvalidationBus) -> int:
+    """
+        Заполнить столбцы для поиска без учёта регистра у книг, добавленных в обход репозитория
+        (например, скриптами с тестовыми данными). Выполняется один раз при запуске приложения через пишущее подключение.
+        Возвращает число обновлённых книг.
+
+        bus: InvalidationBus -- шина, через которую сообщается об изменении таблицы (внутри unit_of_work - после его фиксации).
+    """
+    register_casefold(connection)
+    try:
+        cur = connection.execute(
+            "UPDATE Book SET NameFolded = casefold(Name), AuthorFolded = casefold(Author), GenreFolded = casefold(Genre) "
+            "WHERE NameFolded IS NULL OR AuthorFolded IS NULL OR GenreFolded IS NULL;"
+        )
+    except:
+        rollback(connection)
+        raise
+    else:
+        commit(connection, bus, "Book")
+    return cur.rowcount
 
 def generate_predicate_query(predicate: BookSearchPredicate) -> tuple[str, dict[str, Any]] | None:
     predicates : list[str] = []
     params : dict[str, Any] = {}
+    #Фразы для поиска по полнотекстовому индексу BookSearch (см. migration_6_book_search.sql)
+    fts_phrases : list[str] = []
 
-    if predicate.AuthorContains is not None:
-        predicates.append("Author LIKE :author")
-        params['author'] = f"%{predicate.AuthorContains}%"
+    for column, param, value in (
+        ("Author", "author", predicate.AuthorContains),
+        ("Name", "name", predicate.NameContains),
+        ("Genre", "genre", predicate.GenreContains)
+    ):
+        if value is None:
+            continue
+        #Сравнение по столбцу с приведённым регистром остаётся в запросе как точная проверка,
+        #а полнотекстовый индекс сужает набор проверяемых книг
+        predicates.append(f"{column}Folded LIKE :{param} ESCAPE '\\'")
+        params[param] = contains_pattern(value)
+        phrase = fts_phrase(column, value)
+        if phrase is not None:
+            fts_phrases.append(phrase)
 
-    if predicate.NameContains is not None:
-        predicates.append("Name LIKE :name")
-        params['name'] = f"%{predicate.NameContains}%"
-
-    if predicate.GenreContains is not None:
-        predicates.append("Genre LIKE :genre")
-        params['genre'] = f"%{predicate.GenreContains}%"
+    if len(fts_phrases) > 0:
+        predicates.insert(0, "Book.ID IN (SELECT rowid FROM BookSearch WHERE BookSearch MATCH :fts)")
+        params['fts'] = " AND ".join(fts_phrases)
 
     if predicate.PublicationYearMin is not None:
         predicates.append("PublicationYear >= :yearmin")
@@ -167,84 +267,101 @@ def generate_predicate_query(predicate: BookSearchPredicate) -> tuple[str, dict[
     return (" AND ".join(predicates), params)
 
 
-class UnloanedBooksView(CachingView[Book]):
-    def __init__(self, connection: sqlite3.Connection, date: date, predicate: BookSearchPredicate | None = None):
+class UnloanedBooksView(KeysetCachingView[Book]):
+    tables = frozenset({"Book", "Loan"})
+    '''Таблицы, от которых зависит содержимое view'''
+
+    def __init__(self, connection: sqlite3.Connection, at: date, predicate: BookSearchPredicate | None = None):
         self._connection = connection
 
         pred = generate_predicate_query(predicate) if predicate is not None else None    
         self._predicate, self._params = pred if pred is not None else (None, {})
-        self._params["date"] = date.isoformat()
-
-    def _get_slice(self: Self, start: int, count: int, stride: int) -> Sequence[Book]:
-        #Запрос меняется в зависимости от наличия предиката
-        #Если stide равен 1, то можно упростить запрос, игнорируя row_cnt и stride
+        self._params["date"] = at.isoformat()
 
-        if self._predicate is None:
-            query = (
-                "SELECT t.ID, t.Name, t.PublicationYear, t.AddedAtDate, t.Author, t.Genre "
-                "FROM (SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt FROM Book WHERE Book.ID IN "
-                "(SELECT Book.ID FROM Book WHERE Book.AddedAtDate <= :date EXCEPT "
-                "SELECT Loan.BookID FROM Loan WHERE Loan.StartDate <= :date AND "
-                "CASE WHEN Loan.ReturnDate IS NULL THEN 1 ELSE Loan.ReturnDate > :date END) "
-                "ORDER BY Book.Name LIMIT :start,:precount) as t WHERE row_cnt % :stride = 1 LIMIT :count"
-            ) if stride > 1 else (
-                "SELECT * FROM Book WHERE Book.ID IN "
-                "(SELECT Book.ID FROM Book WHERE Book.AddedAtDate <= :date EXCEPT "
-                "SELECT Loan.BookID FROM Loan WHERE Loan.StartDate <= :date AND "
-                "CASE WHEN Loan.ReturnDate IS NULL THEN 1 ELSE Loan.ReturnDate > :date END) "
-                "ORDER BY Book.Name LIMIT :start,:count"
+        predicate_condition = f"AND ({self._predicate}) " if self._predicate is not None else ""
+        if at >= date.today():
+            #На текущую и будущие даты книга выдана, если по ней есть невозвращённое взятие (таблица CurrentLoan)
+            #или возвращённое взятие, которое завершается после даты (таких взятий немного, и их находит индекс по ReturnDate).
+            #Так доступность проверяется поиском по ключу для каждой книги, а не вычитанием множества всех взятий.
+            self._condition = (
+                f"Book.AddedAtDate <= :date {predicate_condition}"
+                "AND NOT EXISTS (SELECT 1 FROM CurrentLoan WHERE CurrentLoan.BookID = Book.ID AND CurrentLoan.StartDate <= :date) "
+                "AND Book.ID NOT IN (SELECT Loan.BookID FROM Loan WHERE Loan.ReturnDate > :date AND Loan.StartDate <= :date) "
             )
         else:
-            query = (
-                "SELECT t.ID, t.Name, t.PublicationYear, t.AddedAtDate, t.Author, t.Genre "
-                "FROM (SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt FROM Book WHERE Book.ID IN "
-                "(SELECT Book.ID FROM Book WHERE Book.AddedAtDate <= :date "
-                f"AND ({self._predicate}) "
-                "EXCEPT SELECT Loan.BookID FROM Loan WHERE Loan.StartDate <= :date AND "
-                "CASE WHEN Loan.ReturnDate IS NULL THEN 1 ELSE Loan.ReturnDate > :date END) "
-                "ORDER BY Book.Name LIMIT :start,:precount) as t WHERE row_cnt % :stride = 1 LIMIT :count"
-            ) if stride > 1 else (
-                "SELECT * FROM Book WHERE Book.ID IN "
-                "(SELECT Book.ID FROM Book WHERE Book.AddedAtDate <= :date "
-                f"AND ({self._predicate}) "
-                "EXCEPT SELECT Loan.BookID FROM Loan WHERE Loan.StartDate <= :date AND "
-                "CASE WHEN Loan.ReturnDate IS NULL THEN 1 ELSE Loan.ReturnDate > :date END) "
-                "ORDER BY Book.Name LIMIT :start,:count"
+            #На прошедшие даты выданные книги находятся по R*Tree-индексу интервалов взятий LoanInterval:
+            #книга выдана на дату, если интервал взятия начинается не позже даты и заканчивается (возвратом) позже неё
+            self._condition = (
+                f"Book.AddedAtDate <= :date {predicate_condition}"
+                "AND Book.ID NOT IN (SELECT LoanInterval.MinBook FROM LoanInterval "
+                "WHERE LoanInterval.MinDay <= CAST(julianday(:date) AS INTEGER) "
+                "AND LoanInterval.MaxDay >= CAST(julianday(:date) AS INTEGER) + 1) "
             )
 
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
+    def _get_slice(self: Self, start: int, count: int, stride: int) -> Sequence[Book]:
+        #Если stide равен 1, то можно упростить запрос, игнорируя row_cnt и stride
+        query = (
+            "SELECT t.ID, t.Name, t.PublicationYear, t.AddedAtDate, t.Author, t.Genre "
+            "FROM (SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name, Book.ID) as row_cnt FROM Book "
+            f"WHERE {self._condition}"
+            "ORDER BY Book.Name, Book.ID LIMIT :start,:precount) as t WHERE row_cnt % :stride = 1 LIMIT :count"
+        ) if stride > 1 else (
+            "SELECT * FROM Book "
+            f"WHERE {self._condition}"
+            "ORDER BY Book.Name, Book.ID LIMIT :start,:count"
+        )
 
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
+        )
+        cur.row_factory = sqlite3.Row #type:ignore
+        return [book_from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: Book) -> tuple[Any, ...]:
+        return (item.Name, item.ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[Book]:
+        return [book_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[Book]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, book_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        seek = seek_condition(("Book.Name", "Book.ID"), key, backward)
+
+        cur = self._connection.execute(
+            "SELECT * FROM Book "
+            f"WHERE {self._condition}"
+            f"{f'AND {seek} ' if seek is not None else ''}"
+            f"ORDER BY {seek_order(('Book.Name', 'Book.ID'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
         )
         cur.row_factory = sqlite3.Row #type:ignore
-        return [
-            Book(row["Name"], row["PublicationYear"], row["Author"], row["Genre"], date.fromisoformat(row["AddedAtDate"]), row["ID"])
-            for row in cur.fetchall()
-        ]
+        return cur
     
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
-            ("SELECT Count(*) FROM "
-            "(SELECT Book.ID FROM Book WHERE Book.AddedAtDate <= :date EXCEPT "
-            "SELECT Loan.BookID FROM Loan WHERE Loan.StartDate <= :date AND "
-            "CASE WHEN Loan.ReturnDate IS NULL THEN 1 ELSE Loan.ReturnDate > :date END) ")
-            if self._predicate is None else
-            ("SELECT Count(*) FROM "
-            "(SELECT Book.ID FROM Book WHERE Book.AddedAtDate <= :date "
-            f"AND ({self._predicate}) "
-            "EXCEPT SELECT Loan.BookID FROM Loan WHERE Loan.StartDate <= :date AND "
-            "CASE WHEN Loan.ReturnDate IS NULL THEN 1 ELSE Loan.ReturnDate > :date END) "),
+            f"SELECT Count(*) FROM Book WHERE {self._condition}",
             self._params
         )
         cur.row_factory = None
         return cur.fetchone()[0]
     
-class GenreScoresView(CachingView[tuple[str, int]]):
+class GenreScoresView(KeysetCachingView[tuple[str, int]]):
+    tables = frozenset({"Book", "Loan"})
+    '''Таблицы, от которых зависит содержимое view'''
+
     def __init__(self, connection: sqlite3.Connection):
         self._connection = connection
 
@@ -253,17 +370,13 @@ class GenreScoresView(CachingView[tuple[str, int]]):
         query = (
             "SELECT Genre, Score FROM "
             "(SELECT Genre, Score, ROW_NUMBER() OVER (ORDER BY Score DESC, Genre ASC) as row_cnt FROM "
-            "(SELECT Book.Genre, COUNT(Loan.ID) AS Score FROM "
-            "Book LEFT JOIN Loan ON Book.ID = Loan.BookID "
-            "GROUP BY Book.Genre "
-            "ORDER BY Score DESC, Book.Genre ASC "
+            "(SELECT Genre, Score FROM GenreStats "
+            "ORDER BY Score DESC, Genre ASC "
             "LIMIT :start,:count)) "
             "WHERE row_cnt % :stride = 1"
         ) if stride > 1 else (
-            "SELECT Book.Genre, COUNT(Loan.ID) AS Score FROM "
-            "Book LEFT JOIN Loan ON Book.ID = Loan.BookID "
-            "GROUP BY Book.Genre "
-            "ORDER BY Score DESC, Book.Genre ASC "
+            "SELECT Genre, Score FROM GenreStats "
+            "ORDER BY Score DESC, Genre ASC "
             "LIMIT :start,:count"
         )
         cur = self._connection.execute(
@@ -275,16 +388,51 @@ class GenreScoresView(CachingView[tuple[str, int]]):
             }
         )
         cur.row_factory = sqlite3.Row #type:ignore
-        return [(row['Genre'], row['Score']) for row in cur.fetchall()]
+        return [genre_score_from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: tuple[str, int]) -> tuple[Any, ...]:
+        return (item[1], item[0])
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[tuple[str, int]]:
+        return [genre_score_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[tuple[str, int]]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, genre_score_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        #Жанры отсортированы по убыванию популярности, поэтому условие поиска от ключа строим вручную
+        if key is None:
+            where = ""
+        elif backward:
+            where = "WHERE Score >= :keyScore AND (Score > :keyScore OR Genre < :keyGenre) "
+        else:
+            where = "WHERE Score <= :keyScore AND (Score < :keyScore OR Genre > :keyGenre) "
+
+        cur = self._connection.execute(
+            "SELECT Genre, Score FROM GenreStats "
+            f"{where}"
+            f"ORDER BY {'Score ASC, Genre DESC' if backward else 'Score DESC, Genre ASC'} "
+            "LIMIT :count",
+            {
+                "keyScore": key[0] if key is not None else None,
+                "keyGenre": key[1] if key is not None else None,
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type:ignore
+        return cur
     
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
-            "SELECT COUNT(DISTINCT Book.Genre) FROM Book;"
+            "SELECT COUNT(*) FROM GenreStats;"
         )
         cur.row_factory = None
         return cur.fetchone()[0]
     
-class AllBooksView(CachingView[Book]):
+class AllBooksView(KeysetCachingView[Book]):
+    tables = frozenset({"Book"})
+    '''Таблицы, от которых зависит содержимое view'''
+
     def __init__(self, connection: sqlite3.Connection, predicate: BookSearchPredicate | None = None):
         self._connection = connection
         
@@ -297,30 +445,56 @@ class AllBooksView(CachingView[Book]):
         if self._predicate is None:
             query = (
                 "SELECT t.ID, t.Name, t.PublicationYear, t.AddedAtDate, t.Author, t.Genre FROM "
-                "(SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt FROM Book ORDER BY Book.Name LIMIT :start,:precount) as t "
+                "(SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name, Book.ID) as row_cnt FROM Book ORDER BY Book.Name, Book.ID LIMIT :start,:precount) as t "
                 "WHERE row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else ( "SELECT * FROM Book ORDER BY Book.Name LIMIT :start,:count;" )
+            ) if stride > 1 else ( "SELECT * FROM Book ORDER BY Book.Name, Book.ID LIMIT :start,:count;" )
         else:
             query = (
                 "SELECT t.ID, t.Name, t.PublicationYear, t.AddedAtDate, t.Author, t.Genre FROM "
-                f"(SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt FROM Book WHERE {self._predicate} ORDER BY Book.Name LIMIT :start,:precount) as t "
+                f"(SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name, Book.ID) as row_cnt FROM Book WHERE {self._predicate} ORDER BY Book.Name, Book.ID LIMIT :start,:precount) as t "
                 "WHERE row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else ( f"SELECT * FROM Book WHERE {self._predicate} ORDER BY Book.Name LIMIT :start,:count;" )
-
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
+            ) if stride > 1 else ( f"SELECT * FROM Book WHERE {self._predicate} ORDER BY Book.Name, Book.ID LIMIT :start,:count;" )
 
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type:ignore
-        return [
-            Book(row["Name"], row["PublicationYear"], row["Author"], row["Genre"], date.fromisoformat(row["AddedAtDate"]), row["ID"])
-            for row in cur.fetchall()
-        ]
+        return [book_from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: Book) -> tuple[Any, ...]:
+        return (item.Name, item.ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[Book]:
+        return [book_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[Book]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, book_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        conditions = [f"({self._predicate})"] if self._predicate is not None else []
+        seek = seek_condition(("Book.Name", "Book.ID"), key, backward)
+        if seek is not None:
+            conditions.append(seek)
+        where = f"WHERE {' AND '.join(conditions)} " if len(conditions) > 0 else ""
+
+        cur = self._connection.execute(
+            f"SELECT * FROM Book {where}"
+            f"ORDER BY {seek_order(('Book.Name', 'Book.ID'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type:ignore
+        return cur
 
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
@@ -329,4 +503,4 @@ class AllBooksView(CachingView[Book]):
             self._params
         )
         cur.row_factory = None
-        return cur.fetchone()[0]
\ No newline at end of file
+        return cur.fetchone()[0]
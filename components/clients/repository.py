@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Self, Protocol, Sequence
+from typing import Self, Protocol, Sequence, Iterable
 from datetime import date
 from .client import Client
 from dataclasses import dataclass
@@ -29,6 +29,13 @@ class IClientRepository(Protocol):
     def get_total_unreturned_loans_per_client(self: Self, predicate: ClientSearchPredicate | None = None) -> Sequence[tuple[Client, int]]:
         """
             Количество невозвращённых каждым читателем книг.
+            Выводятся только читатели, у которых есть книги на руках.
+        """
+        raise NotImplementedError()
+
+    def get_client_summaries(self: Self, predicate: ClientSearchPredicate | None = None) -> Sequence[tuple[Client, int, int, date]]:
+        """
+            Сводка по каждому читателю: общее количество взятых книг, количество книг на руках и дата последнего посещения.
         """
         raise NotImplementedError()
     
@@ -41,6 +48,17 @@ class IClientRepository(Protocol):
             Если читатель с таким ID уже существует, будет поднята ошибка.
         """
         raise NotImplementedError()
+
+    def add_clients(self: Self, clients: Iterable[Client]) -> None:
+        """
+            Добавить сразу несколько новых читателей одной транзакцией.
+            Читателям без ID присваиваются ID.
+            
+            clients: Iterable[Client] -- читатели.
+
+            Если читатель с таким ID уже существует, будет поднята ошибка, и ни один читатель не будет добавлен.
+        """
+        raise NotImplementedError()
     
     def update_client(self: Self, client: Client) -> None:
         """
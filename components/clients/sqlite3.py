@@ -1,51 +1,80 @@
+import abc
 import sqlite3
 from typing import Self, Any
-from collections.abc import Sequence
+from collections.abc import Sequence, Iterator, Iterable
 from datetime import date
 
-from modules.view import CachingView
-from modules.events import Event, WeakSubscriber
+from modules.view import CachingView, KeysetCachingView, iter_cursor
+from modules.keyset import seek_condition, seek_order, seek_params
+from modules.events import WeakSubscriber
+from modules.invalidation import InvalidationBus
+from modules.transaction import commit, rollback
+from modules.report_cache import ReportCache
+from modules.pool import ConnectionPool
+from modules.casefold import fold, contains_pattern, fts_phrase, register_casefold
+from modules.bulk import insert_many
 
 from .client import Client
 from .repository import ClientSearchPredicate
 
 class ClientRepositorySqlite3:
     """Репозиторий читателей на SQLite3"""
-    def __init__(self, connection: sqlite3.Connection):
+    def __init__(self, connection: sqlite3.Connection, bus: InvalidationBus | None = None, cache: ReportCache | None = None,
+                 readers: ConnectionPool | None = None):
+        """
+            connection: sqlite3.Connection -- подключение к БД.
+            bus: InvalidationBus | None -- шина сброса кешей, общая с другими репозиториями той же БД.
+                                           Если не указана, то создаётся собственная шина репозитория.
+            cache: ReportCache | None -- общий кеш готовых результатов отчётов для этого подключения.
+                                         Если не указан, то результаты кешируются только внутри каждого view.
+            readers: ConnectionPool | None -- пул подключений для чтения, через которые выполняются запросы возвращаемых view.
+                                              Если не указан, то view выполняют запросы через connection.
+        """
         self._connection = connection
-        self._reset_cache_event = Event[()]()
+        self._bus = bus if bus is not None else InvalidationBus()
+        self._cache = cache
+        self._readers = readers
+
+    def _register[V: CachingView[Any]](self: Self, view: V) -> V:
+        """
+            Подготовить возвращаемый view: подписать его сброс кеша на изменения его таблиц,
+            подключить общий кеш отчётов и пул подключений для чтения.
+        """
+        self._bus.subscribe(view.tables, WeakSubscriber(view.reset_cache))
+        view.report_cache = self._cache
+        view.readers = self._readers
+        return view
 
     def get_clients(self: Self, predicate: ClientSearchPredicate | None = None) -> Sequence[Client]:
         """
             Все читатели библиотеки
         """
-        view = AllClientsView(self._connection, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(AllClientsView(self._connection, predicate))
     
     def get_last_visit_dates(self: Self, predicate: ClientSearchPredicate | None = None) -> Sequence[tuple[Client, date]]:
         """
             Дата последнего посещения библиотеки каждым читателем.
         """
-        view = LastVisitDatesView(self._connection, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(LastVisitDatesView(self._connection, predicate))
     
     def get_total_loans_per_client(self: Self, predicate: ClientSearchPredicate | None = None) -> Sequence[tuple[Client, int]]:
         """
             Общее количество взятых книг каждым читателем.
         """
-        view = TotalLoansView(self._connection, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(TotalLoansView(self._connection, predicate))
     
     def get_total_unreturned_loans_per_client(self: Self, predicate: ClientSearchPredicate | None = None) -> Sequence[tuple[Client, int]]:
         """
             Количество невозвращённых каждым читателем книг.
+            Выводятся только читатели, у которых есть книги на руках.
         """
-        view = UnreturnedLoansView(self._connection, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(UnreturnedLoansView(self._connection, predicate))
+    
+    def get_client_summaries(self: Self, predicate: ClientSearchPredicate | None = None) -> Sequence[tuple[Client, int, int, date]]:
+        """
+            Сводка по каждому читателю: общее количество взятых книг, количество книг на руках и дата последнего посещения.
+        """
+        return self._register(ClientSummariesView(self._connection, predicate))
     
     def add_client(self: Self, client: Client) -> None:
         """
@@ -58,34 +87,64 @@ class ClientRepositorySqlite3:
         try:
             if client.ID is None:
                 cur = self._connection.execute(
-                    "INSERT INTO Client (Name, Address, RegistrationDate) "
-                    "VALUES (:name, :address, :regDate) "
+                    "INSERT INTO Client (Name, Address, RegistrationDate, NameFolded) "
+                    "VALUES (:name, :address, :regDate, :nameFolded) "
                     "RETURNING ID; ",
                     {
                         "name": client.Name,
                         "address": client.Address,
-                        "regDate": client.RegistrationDate
+                        "regDate": client.RegistrationDate,
+                        "nameFolded": fold(client.Name)
                     }
                 )
                 cur.row_factory = None
                 client.ID = cur.fetchone()[0]
             else:
                 self._connection.execute(
-                    "INSERT INTO Client (ID, Name, Address, RegistrationDate) "
-                    "VALUES (:id, :name, :address, :regDate;)",
+                    "INSERT INTO Client (ID, Name, Address, RegistrationDate, NameFolded) "
+                    "VALUES (:id, :name, :address, :regDate, :nameFolded);",
                     {
                         "id": client.ID,
                         "name": client.Name,
                         "address": client.Address,
-                        "regDate": client.RegistrationDate
+                        "regDate": client.RegistrationDate,
+                        "nameFolded": fold(client.Name)
                     }
                 )
         except:
-            self._connection.rollback()
+            rollback(self._connection)
+            raise
+        else:
+            commit(self._connection, self._bus, "Client")
+
+    def add_clients(self: Self, clients: Iterable[Client]) -> None:
+        """
+            Добавить сразу несколько новых читателей одной транзакцией.
+            Читателям без ID присваиваются ID.
+            
+            clients: Iterable[Client] -- читатели.
+
+            Если читатель с таким ID уже существует, будет поднята ошибка, и ни один читатель не будет добавлен.
+        """
+        try:
+            insert_many(
+                self._connection,
+                "Client",
+                clients,
+                "INSERT INTO Client (ID, Name, Address, RegistrationDate, NameFolded) "
+                "VALUES (:id, :name, :address, :regDate, :nameFolded);",
+                lambda client: {
+                    "name": client.Name,
+                    "address": client.Address,
+                    "regDate": client.RegistrationDate,
+                    "nameFolded": fold(client.Name)
+                }
+            )
+        except:
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Client")
 
     def update_client(self: Self, client: Client) -> None:
         """
@@ -101,21 +160,21 @@ class ClientRepositorySqlite3:
         try:
             self._connection.execute(
                 "UPDATE Client SET "
-                "Name=:name,Address=:address,RegistrationDate=:regDate "
+                "Name=:name,Address=:address,RegistrationDate=:regDate,NameFolded=:nameFolded "
                 "WHERE ID=:id;",
                 {
                     "id": client.ID,
                     "name": client.Name,
                     "address": client.Address,
-                    "regDate": client.RegistrationDate
+                    "regDate": client.RegistrationDate,
+                    "nameFolded": fold(client.Name)
                 }
             )
         except:
-            self._connection.rollback()
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Client")
 
     def delete_client(self: Self, client: Client) -> None:
         """
@@ -136,26 +195,64 @@ class ClientRepositorySqlite3:
                 }
             )
         except:
-            self._connection.rollback()
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Client", "Loan")
     
+def client_from_row(row: sqlite3.Row) -> Client:
+    return Client(row['Name'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ID'])
+
+def last_visit_from_row(row: sqlite3.Row) -> tuple[Client, date]:
+    return (client_from_row(row), date.fromisoformat(row['last_visit_date']))
+
+def total_loans_from_row(row: sqlite3.Row) -> tuple[Client, int]:
+    return (client_from_row(row), row['total_loans'])
+
+def client_summary_from_row(row: sqlite3.Row) -> tuple[Client, int, int, date]:
+    return (client_from_row(row), row['total_loans'], row['open_loans'], date.fromisoformat(row['last_visit_date']))
+
+def fill_folded_columns(connection: sqlite3.Connection, bus: InvalidationBus) -> int:
+    """
+        Заполнить столбец для поиска без учёта регистра у читателей, добавленных в обход репозитория
+        (например, скриптами с тестовыми данными). Выполняется один раз при запуске приложения через пишущее подключение.
+        Возвращает число обновлённых читателей.
+
+        bus: InvalidationBus -- шина, через которую сообщается об изменении таблицы (внутри unit_of_work - после его фиксации).
+    """
+    register_casefold(connection)
+    try:
+        cur = connection.execute("UPDATE Client SET NameFolded = casefold(Name) WHERE NameFolded IS NULL;")
+    except:
+        rollback(connection)
+        raise
+    else:
+        commit(connection, bus, "Client")
+    return cur.rowcount
+
 def generate_predicate_query(predicate: ClientSearchPredicate) -> tuple[str, dict[str, Any]] | None:
     predicates : list[str] = []
     params : dict[str, Any] = {}
 
     if predicate.NameContains is not None:
-        predicates.append("Name LIKE :name")
-        params['name'] = f"%{predicate.NameContains}%"
+        #Полнотекстовый индекс ClientSearch (см. migration_14_folded_search.sql) сужает набор проверяемых читателей,
+        #а сравнение по столбцу с приведённым регистром остаётся точной проверкой
+        phrase = fts_phrase("Name", predicate.NameContains)
+        if phrase is not None:
+            predicates.append("Client.ID IN (SELECT rowid FROM ClientSearch WHERE ClientSearch MATCH :fts)")
+            params['fts'] = phrase
+        predicates.append("Client.NameFolded LIKE :name ESCAPE '\\'")
+        params['name'] = contains_pattern(predicate.NameContains)
 
     if len(predicates) < 1:
         return None
     
     return (" AND ".join(predicates), params)
 
-class AllClientsView(CachingView[Client]):
+class AllClientsView(KeysetCachingView[Client]):
+    tables = frozenset({"Client"})
+    '''Таблицы, от которых зависит содержимое view'''
+
     def __init__(self, connection: sqlite3.Connection, predicate: ClientSearchPredicate | None = None):
         self._connection = connection
         
@@ -168,30 +265,56 @@ class AllClientsView(CachingView[Client]):
         if self._predicate is None:
             query = (
                 "SELECT t.ID, t.Name, t.RegistrationDate, t.Address FROM "
-                "(SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt FROM Client ORDER BY Client.Name LIMIT :start,:precount) as t "
+                "(SELECT *, ROW_NUMBER() OVER (ORDER BY Client.Name, Client.ID) as row_cnt FROM Client ORDER BY Client.Name, Client.ID LIMIT :start,:precount) as t "
                 "WHERE row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else ( "SELECT * FROM Client ORDER BY Client.Name LIMIT :start,:count;" )
+            ) if stride > 1 else ( "SELECT * FROM Client ORDER BY Client.Name, Client.ID LIMIT :start,:count;" )
         else:
             query = (
                 "SELECT t.ID, t.Name, t.RegistrationDate, t.Address FROM "
-                f"(SELECT *, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt FROM Client WHERE {self._predicate} ORDER BY Client.Name LIMIT :start,:precount) as t "
+                f"(SELECT *, ROW_NUMBER() OVER (ORDER BY Client.Name, Client.ID) as row_cnt FROM Client WHERE {self._predicate} ORDER BY Client.Name, Client.ID LIMIT :start,:precount) as t "
                 "WHERE row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else ( f"SELECT * FROM Client WHERE {self._predicate} ORDER BY Client.Name LIMIT :start,:count;" )
-
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
+            ) if stride > 1 else ( f"SELECT * FROM Client WHERE {self._predicate} ORDER BY Client.Name, Client.ID LIMIT :start,:count;" )
 
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type:ignore
-        return [
-            Client(row["Name"], date.fromisoformat(row["RegistrationDate"]), row["Address"], row["ID"])
-            for row in cur.fetchall()
-        ]
+        return [client_from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: Client) -> tuple[Any, ...]:
+        return (item.Name, item.ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[Client]:
+        return [client_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[Client]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, client_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        conditions = [f"({self._predicate})"] if self._predicate is not None else []
+        seek = seek_condition(("Client.Name", "Client.ID"), key, backward)
+        if seek is not None:
+            conditions.append(seek)
+        where = f"WHERE {' AND '.join(conditions)} " if len(conditions) > 0 else ""
+
+        cur = self._connection.execute(
+            f"SELECT * FROM Client {where}"
+            f"ORDER BY {seek_order(('Client.Name', 'Client.ID'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type:ignore
+        return cur
 
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
@@ -202,7 +325,10 @@ class AllClientsView(CachingView[Client]):
         cur.row_factory = None
         return cur.fetchone()[0]
     
-class LastVisitDatesView(CachingView[tuple[Client, date]]):
+class LastVisitDatesView(KeysetCachingView[tuple[Client, date]]):
+    tables = frozenset({"Client", "Loan"})
+    '''Таблицы, от которых зависит содержимое view'''
+
     def __init__(self, connection: sqlite3.Connection, predicate: ClientSearchPredicate | None = None):
         self._connection = connection
         
@@ -214,59 +340,88 @@ class LastVisitDatesView(CachingView[tuple[Client, date]]):
         #Если stide равен 1, то можно упростить запрос, игнорируя row_cnt и stride
         if self._predicate is None:
             query = (
-                "SELECT t.ID, t.Name, t.RegistrationDate, t.last_visit_date, Client.Address FROM "
+                "SELECT t.ID, t.Name, t.RegistrationDate, t.last_visit_date, t.Address FROM "
                 "(SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, "
-                "COALESCE(MAX(COALESCE(Loan.ReturnDate, Loan.StartDate)), Client.RegistrationDate) as last_visit_date, "
-                "ROW_NUMBER() OVER (ORDER BY Client.Name) as row_cnt "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name LIMIT :start,:precount) AS t "
+                "COALESCE(ClientStats.LastVisitDate, Client.RegistrationDate) as last_visit_date, "
+                "ROW_NUMBER() OVER (ORDER BY Client.Name, Client.ID) as row_cnt "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+                "ORDER BY Client.Name, Client.ID LIMIT :start,:precount) AS t "
                 "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
             ) if stride > 1 else (
                 "SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, "
-                "COALESCE(MAX(COALESCE(Loan.ReturnDate, Loan.StartDate)), Client.RegistrationDate) as last_visit_date "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name LIMIT :start,:count"
+                "COALESCE(ClientStats.LastVisitDate, Client.RegistrationDate) as last_visit_date "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+                "ORDER BY Client.Name, Client.ID LIMIT :start,:count"
             )
         else:
             query = (
                 "SELECT t.ID, t.Name, t.RegistrationDate, t.last_visit_date, t.Address FROM "
                 "(SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, "
-                "COALESCE(MAX(COALESCE(Loan.ReturnDate, Loan.StartDate)), Client.RegistrationDate) as last_visit_date, "
-                "ROW_NUMBER() OVER (ORDER BY Client.Name) as row_cnt "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
+                "COALESCE(ClientStats.LastVisitDate, Client.RegistrationDate) as last_visit_date, "
+                "ROW_NUMBER() OVER (ORDER BY Client.Name, Client.ID) as row_cnt "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
                 f"WHERE {self._predicate} "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name LIMIT :start,:precount) AS t "
+                "ORDER BY Client.Name, Client.ID LIMIT :start,:precount) AS t "
                 "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
             ) if stride > 1 else (
                 "SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, "
-                "COALESCE(MAX(COALESCE(Loan.ReturnDate, Loan.StartDate)), Client.RegistrationDate) as last_visit_date "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
+                "COALESCE(ClientStats.LastVisitDate, Client.RegistrationDate) as last_visit_date "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
                 f"WHERE {self._predicate} "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name LIMIT :start,:count"
+                "ORDER BY Client.Name, Client.ID LIMIT :start,:count"
             )
 
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
-
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type: ignore
         return [
             (
-                Client(row['Name'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ID']),
+                client_from_row(row),
                 date.fromisoformat(row['last_visit_date'])
             )
             for row in cur.fetchall()
         ]
 
+    def _get_key(self: Self, item: tuple[Client, date]) -> tuple[Any, ...]:
+        return (item[0].Name, item[0].ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[tuple[Client, date]]:
+        return [last_visit_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[tuple[Client, date]]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, last_visit_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        conditions = []
+        if self._predicate is not None:
+            conditions.append(f"({self._predicate})")
+        seek = seek_condition(("Client.Name", "Client.ID"), key, backward)
+        if seek is not None:
+            conditions.append(seek)
+        where = f"WHERE {' AND '.join(conditions)} " if len(conditions) > 0 else ""
+
+        cur = self._connection.execute(
+            "SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, "
+            "COALESCE(ClientStats.LastVisitDate, Client.RegistrationDate) as last_visit_date "
+            f"FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID {where}"
+            f"ORDER BY {seek_order(('Client.Name', 'Client.ID'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return cur
+
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
             "SELECT COUNT(*) FROM Client;" if self._predicate is None
@@ -276,70 +431,93 @@ class LastVisitDatesView(CachingView[tuple[Client, date]]):
         cur.row_factory = None
         return cur.fetchone()[0]
     
-class TotalLoansView(CachingView[tuple[Client, int]]):
+class ClientStatsView[T](KeysetCachingView[T], abc.ABC):
+    '''
+    Читатели со статистикой из ClientStats в порядке имени.
+    Наследники задают столбцы статистики (_columns) и разбор строки (_from_row).
+    '''
+    tables = frozenset({"Client", "Loan"})
+    '''Таблицы, от которых зависит содержимое view'''
+
+    _columns = ""
+    '''Столбцы статистики, выбираемые вместе со столбцами читателя'''
+
     def __init__(self, connection: sqlite3.Connection, predicate: ClientSearchPredicate | None = None):
         self._connection = connection
         
         pred = generate_predicate_query(predicate) if predicate is not None else None    
         self._predicate, self._params = pred if pred is not None else (None, {})
 
-    def _get_slice(self: Self, start: int, count: int, stride: int) -> Sequence[tuple[Client, int]]:
-        #Запрос меняется в зависимости от наличия предиката
-        #Если stide равен 1, то можно упростить запрос, игнорируя row_cnt и stride
-        if self._predicate is None:
-            query = (
-                "SELECT t.ID, t.Name, t.RegistrationDate, t.last_visit_date, t.Address FROM "
-                "(SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address, "
-                "ROW_NUMBER() OVER (ORDER BY Client.Name) as row_cnt "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
-                "LIMIT :start,:precount) AS t "
-                "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else (
-                "SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
-                "LIMIT :start,:count;"
-            )
-        else:
-            query = (
-                "SELECT t.ID, t.Name, t.RegistrationDate, t.last_visit_date, t.Address FROM "
-                "(SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address, "
-                "ROW_NUMBER() OVER (ORDER BY Client.Name) as row_cnt "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                f"WHERE {self._predicate} "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
-                "LIMIT :start,:precount) AS t "
-                "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else (
-                "SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                f"WHERE {self._predicate} "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
-                "LIMIT :start,:count;"
-            )
+    @abc.abstractmethod
+    def _from_row(self: Self, row: sqlite3.Row) -> T:
+        '''Получить запись view из строки запроса'''
+        raise NotImplementedError()
 
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
+    def _get_slice(self: Self, start: int, count: int, stride: int) -> Sequence[T]:
+        #Условие меняется в зависимости от наличия предиката
+        #Если stide равен 1, то можно упростить запрос, игнорируя row_cnt и stride
+        where = f"WHERE {self._predicate} " if self._predicate is not None else ""
+        query = (
+            "SELECT t.* FROM "
+            f"(SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, {self._columns}, "
+            "ROW_NUMBER() OVER (ORDER BY Client.Name, Client.ID) as row_cnt "
+            "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+            f"{where}"
+            "ORDER BY Client.Name, Client.ID "
+            "LIMIT :start,:precount) AS t "
+            "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
+        ) if stride > 1 else (
+            f"SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, {self._columns} "
+            "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+            f"{where}"
+            "ORDER BY Client.Name, Client.ID "
+            "LIMIT :start,:count;"
+        )
 
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type: ignore
-        return [
-            (
-                Client(row['Name'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ID']),
-                row['total_loans']
-            )
-            for row in cur.fetchall()
-        ]
+        return [self._from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: T) -> tuple[Any, ...]:
+        client : Client = item[0] #type: ignore
+        return (client.Name, client.ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[T]:
+        return [self._from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[T]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, self._from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        conditions = []
+        if self._predicate is not None:
+            conditions.append(f"({self._predicate})")
+        seek = seek_condition(("Client.Name", "Client.ID"), key, backward)
+        if seek is not None:
+            conditions.append(seek)
+        where = f"WHERE {' AND '.join(conditions)} " if len(conditions) > 0 else ""
+
+        cur = self._connection.execute(
+            f"SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, {self._columns} "
+            f"FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID {where}"
+            f"ORDER BY {seek_order(('Client.Name', 'Client.ID'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return cur
 
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
@@ -349,8 +527,26 @@ class TotalLoansView(CachingView[tuple[Client, int]]):
         )
         cur.row_factory = None
         return cur.fetchone()[0]
+
+class TotalLoansView(ClientStatsView[tuple[Client, int]]):
+    _columns = "ClientStats.TotalLoans as total_loans"
+
+    def _from_row(self: Self, row: sqlite3.Row) -> tuple[Client, int]:
+        return total_loans_from_row(row)
+
+class ClientSummariesView(ClientStatsView[tuple[Client, int, int, date]]):
+    _columns = (
+        "ClientStats.TotalLoans as total_loans, ClientStats.OpenLoans as open_loans, "
+        "COALESCE(ClientStats.LastVisitDate, Client.RegistrationDate) as last_visit_date"
+    )
+
+    def _from_row(self: Self, row: sqlite3.Row) -> tuple[Client, int, int, date]:
+        return client_summary_from_row(row)
     
-class UnreturnedLoansView(CachingView[tuple[Client, int]]):
+class UnreturnedLoansView(KeysetCachingView[tuple[Client, int]]):
+    tables = frozenset({"Client", "Loan"})
+    '''Таблицы, от которых зависит содержимое view'''
+
     def __init__(self, connection: sqlite3.Connection, predicate: ClientSearchPredicate | None = None):
         self._connection = connection
         
@@ -362,65 +558,94 @@ class UnreturnedLoansView(CachingView[tuple[Client, int]]):
         #Если stide равен 1, то можно упростить запрос, игнорируя row_cnt и stride
         if self._predicate is None:
             query = (
-                "SELECT t.ID, t.Name, t.RegistrationDate, t.last_visit_date, t.Address FROM "
-                "(SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address, "
-                "ROW_NUMBER() OVER (ORDER BY Client.Name) as row_cnt "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                "WHERE Loan.ReturnDate IS NULL "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
+                "SELECT t.ID, t.Name, t.RegistrationDate, t.total_loans, t.Address FROM "
+                "(SELECT Client.ID, Client.Name, Client.RegistrationDate, ClientStats.OpenLoans as total_loans, Client.Address, "
+                "ROW_NUMBER() OVER (ORDER BY ClientStats.Name, ClientStats.ClientID) as row_cnt "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+                "WHERE ClientStats.OpenLoans > 0 "
+                "ORDER BY ClientStats.Name, ClientStats.ClientID "
                 "LIMIT :start,:precount) AS t "
                 "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
             ) if stride > 1 else (
-                "SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                "WHERE Loan.ReturnDate IS NULL "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
+                "SELECT Client.ID, Client.Name, Client.RegistrationDate, ClientStats.OpenLoans as total_loans, Client.Address "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+                "WHERE ClientStats.OpenLoans > 0 "
+                "ORDER BY ClientStats.Name, ClientStats.ClientID "
                 "LIMIT :start,:count;"
             )
         else:
             query = (
-                "SELECT t.ID, t.Name, t.RegistrationDate, t.last_visit_date, t.Address FROM "
-                "(SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address, "
-                "ROW_NUMBER() OVER (ORDER BY Client.Name) as row_cnt "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                f"WHERE Loan.ReturnDate IS NULL AND ({self._predicate}) "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
+                "SELECT t.ID, t.Name, t.RegistrationDate, t.total_loans, t.Address FROM "
+                "(SELECT Client.ID, Client.Name, Client.RegistrationDate, ClientStats.OpenLoans as total_loans, Client.Address, "
+                "ROW_NUMBER() OVER (ORDER BY ClientStats.Name, ClientStats.ClientID) as row_cnt "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+                f"WHERE ClientStats.OpenLoans > 0 AND ({self._predicate}) "
+                "ORDER BY ClientStats.Name, ClientStats.ClientID "
                 "LIMIT :start,:precount) AS t "
                 "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
             ) if stride > 1 else (
-                "SELECT Client.ID, Client.Name, Client.RegistrationDate, COUNT(Loan.ID) as total_loans, Client.Address "
-                "FROM Client LEFT JOIN Loan ON Loan.ClientID = Client.ID "
-                f"WHERE Loan.ReturnDate IS NULL AND ({self._predicate}) "
-                "GROUP BY Client.ID "
-                "ORDER BY Client.Name "
+                "SELECT Client.ID, Client.Name, Client.RegistrationDate, ClientStats.OpenLoans as total_loans, Client.Address "
+                "FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID "
+                f"WHERE ClientStats.OpenLoans > 0 AND ({self._predicate}) "
+                "ORDER BY ClientStats.Name, ClientStats.ClientID "
                 "LIMIT :start,:count;"
             )
 
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
-
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type: ignore
         return [
             (
-                Client(row['Name'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ID']),
+                client_from_row(row),
                 row['total_loans']
             )
             for row in cur.fetchall()
         ]
 
+    def _get_key(self: Self, item: tuple[Client, int]) -> tuple[Any, ...]:
+        return (item[0].Name, item[0].ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[tuple[Client, int]]:
+        return [total_loans_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[tuple[Client, int]]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, total_loans_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        conditions = ["ClientStats.OpenLoans > 0"]
+        if self._predicate is not None:
+            conditions.append(f"({self._predicate})")
+        seek = seek_condition(("ClientStats.Name", "ClientStats.ClientID"), key, backward)
+        if seek is not None:
+            conditions.append(seek)
+        where = f"WHERE {' AND '.join(conditions)} " if len(conditions) > 0 else ""
+
+        cur = self._connection.execute(
+            "SELECT Client.ID, Client.Name, Client.RegistrationDate, Client.Address, "
+            "ClientStats.OpenLoans as total_loans "
+            f"FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID {where}"
+            f"ORDER BY {seek_order(('ClientStats.Name', 'ClientStats.ClientID'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return cur
+
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
-            "SELECT COUNT(*) FROM Client;" if self._predicate is None
-            else f"SELECT COUNT(*) FROM Client WHERE {self._predicate};",
+            "SELECT COUNT(*) FROM ClientStats WHERE OpenLoans > 0;" if self._predicate is None
+            else f"SELECT COUNT(*) FROM Client JOIN ClientStats ON ClientStats.ClientID = Client.ID WHERE ClientStats.OpenLoans > 0 AND ({self._predicate});",
             self._params
         )
         cur.row_factory = None
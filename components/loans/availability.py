@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+from datetime import date
+
+@dataclass
+class AvailabilityInterval:
+    BookID: int
+    Start: date
+    End: date
+    Free: bool
+
+    LoanID: int | None = None
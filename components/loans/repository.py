@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 from typing import Self, Protocol
-from collections.abc import Sequence
+from collections.abc import Sequence, Iterable
+from concurrent.futures import Future
 from .loan import Loan
+from .availability import AvailabilityInterval
 from ..books.book import Book
 from ..clients.client import Client
 
@@ -21,6 +23,18 @@ class ILoanRepository(Protocol):
         """
         raise NotImplementedError()
 
+    def add_loans(self: Self, loans: Iterable[Loan]) -> None:
+        """
+            Добавить сразу несколько новых взятий книг одной транзакцией.
+            Взятиям без ID присваиваются ID.
+            
+            loans : Iterable[Loan] -- взятия книг.
+
+            Если взятие книги с таким ID уже существует или возникает конфликт интервалов с другим взятием книги,
+            будет поднята ошибка, и ни одно взятие не будет добавлено.
+        """
+        raise NotImplementedError()
+
     def update_loan(self: Self, loan: Loan) -> None:
         """
             Обновить существующее взятие книги.
@@ -31,6 +45,28 @@ class ILoanRepository(Protocol):
         """
         raise NotImplementedError()
     
+    def submit_loan(self: Self, loan: Loan) -> Future[int]:
+        """
+            Добавить новое взятие книги, не дожидаясь фиксации (если репозиторий поддерживает отложенную запись).
+
+            loan : Loan -- взятие книги.
+
+            Возвращает Future, который завершается ID взятия после фиксации
+            или ошибкой, если взятие книги с таким ID уже существует или возникает конфликт интервалов с другим взятием книги.
+        """
+        raise NotImplementedError()
+
+    def submit_loan_update(self: Self, loan: Loan) -> Future[int]:
+        """
+            Обновить существующее взятие книги, не дожидаясь фиксации (если репозиторий поддерживает отложенную запись).
+
+            loan : Loan -- взятие книги.
+
+            Возвращает Future, который завершается ID взятия после фиксации
+            или ошибкой, если возникает конфликт интервалов с другим взятием книги.
+        """
+        raise NotImplementedError()
+    
     def get_unreturned_loans(self: Self, predicate: LoanSearchPredicate | None = None) -> Sequence[tuple[Loan, Book, Client]]:
         """
             Вывести список всех невозвращённых книг (взятий книг), удовлетворяющих предикату
@@ -40,6 +76,7 @@ class ILoanRepository(Protocol):
     def get_expired_loans_at(self: Self, at: date, predicate: LoanSearchPredicate | None = None) -> Sequence[tuple[Loan, Book, Client, int]]:
         """
             Получить список всех просроченных на указанную дату взятий книг, удовлетворяющих предикату.
+            Взятия упорядочены по сроку возврата (сначала просроченные дольше всего).
             Аргументы:
                 at : date -- дата, для которой формируется список.
                              Книги, которые были просроченны позже этой даты, не будут отображены.
@@ -65,6 +102,34 @@ class ILoanRepository(Protocol):
         """
         raise NotImplementedError()
 
+    def get_books_loaned_during(self: Self, book_ids: Iterable[int], start: date, end: date) -> set[int]:
+        """
+            Проверить сразу несколько книг: какие из них выданы в какой-то момент на протяжении указанного промежутка времени.
+            Выполняется одним запросом независимо от числа книг.
+            
+            Аргументы:
+            book_ids: Iterable[int] - ID проверяемых книг
+            start : date - начало промежутка (включительно)
+            end: date - конец промежутка (включительно)
+
+            Возвращает множество ID книг, которые выданы в этот промежуток.
+        """
+        raise NotImplementedError()
+
+    def get_availability(self: Self, book_ids: Iterable[int], start: date, end: date) -> Sequence[AvailabilityInterval]:
+        """
+            Календарь доступности книг: чередующиеся интервалы, когда книга свободна и когда выдана, на протяжении промежутка времени.
+            Интервалы упорядочены по ID книги и дате начала, даты начала и конца входят в интервал.
+            Промежуток до добавления книги в библиотеку в календарь не входит.
+            Книга считается выданной с даты выдачи по дату возврата включительно, как и в is_book_loaned_during.
+            
+            Аргументы:
+            book_ids: Iterable[int] - ID книг
+            start : date - начало промежутка (включительно)
+            end: date - конец промежутка (включительно)
+        """
+        raise NotImplementedError()
+
 @dataclass    
 class LoanSearchPredicate:
     ClientNameContains : str | None = None
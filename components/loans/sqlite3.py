@@ -1,22 +1,59 @@
 import sqlite3
+import json
 from typing import Self, Any
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence, Iterator, Iterable
+from concurrent.futures import Future
 
-from modules.view import CachingView
-from modules.events import Event, WeakSubscriber
+from modules.view import CachingView, KeysetCachingView, iter_cursor
+from modules.keyset import seek_condition, seek_order, seek_params
+from modules.events import WeakSubscriber
+from modules.invalidation import InvalidationBus
+from modules.transaction import commit, rollback
+from modules.report_cache import ReportCache
+from modules.pool import ConnectionPool
+from modules.casefold import contains_pattern, fts_phrase
+from modules.bulk import insert_many
+from modules.write_queue import WriteQueue
 
 from datetime import date
 
 from .loan import Loan
+from .availability import AvailabilityInterval
 from ..books.book import Book
 from ..clients.client import Client
 from .repository import LoanSearchPredicate
 
 class LoanRepositorySqlite3:
     """Репозиторий взятий книг на SQLite3"""
-    def __init__(self, connection: sqlite3.Connection):
+    def __init__(self, connection: sqlite3.Connection, bus: InvalidationBus | None = None, cache: ReportCache | None = None,
+                 write_queue: WriteQueue | None = None,
+                 readers: ConnectionPool | None = None):
+        """
+            connection: sqlite3.Connection -- подключение к БД.
+            bus: InvalidationBus | None -- шина сброса кешей, общая с другими репозиториями той же БД.
+                                           Если не указана, то создаётся собственная шина репозитория.
+            cache: ReportCache | None -- общий кеш готовых результатов отчётов для этого подключения.
+                                         Если не указан, то результаты кешируются только внутри каждого view.
+            write_queue: WriteQueue | None -- очередь отложенной записи для submit_loan и submit_loan_update.
+                                              Если не указана, то эти методы записывают изменения сразу.
+            readers: ConnectionPool | None -- пул подключений для чтения, через которые выполняются запросы возвращаемых view.
+                                              Если не указан, то view выполняют запросы через connection.
+        """
         self._connection = connection
-        self._reset_cache_event = Event[()]()
+        self._bus = bus if bus is not None else InvalidationBus()
+        self._cache = cache
+        self._readers = readers
+        self._write_queue = write_queue
+
+    def _register[V: CachingView[Any]](self: Self, view: V) -> V:
+        """
+            Подготовить возвращаемый view: подписать его сброс кеша на изменения его таблиц,
+            подключить общий кеш отчётов и пул подключений для чтения.
+        """
+        self._bus.subscribe(view.tables, WeakSubscriber(view.reset_cache))
+        view.report_cache = self._cache
+        view.readers = self._readers
+        return view
     
     def add_loan(self: Self, loan: Loan) -> None:
         """
@@ -27,59 +64,43 @@ class LoanRepositorySqlite3:
             Если взятие книги с таким ID уже существует или возникает конфликт интервалов с другим взятием книги, будет поднята ошибка.
         """
         try:
-            if loan.ID is None:
-                cur = self._connection.execute(
-                    "INSERT INTO Loan (StartDate, EndDate, ReturnDate, BookID, ClientID) "
-                    "VALUES (:startDate, :endDate, :returnDate, :bookID, :clientID)"
-                    "RETURNING ID; ",
-                    {
-                        "startDate": loan.StartDate,
-                        "returnDate": loan.ReturnDate,
-                        "endDate": loan.EndDate,
-                        "bookID": loan.BookID,
-                        "clientID": loan.ClientID
-                    }
-                )
-                cur.row_factory = None
-                loan.ID = cur.fetchone()[0]
-            else:
-                self._connection.execute(
-                    "INSERT INTO Loan (ID, StartDate, EndDate, ReturnDate, BookID, ClientID) "
-                    "VALUES (:id, :startDate, :endDate, :returnDate, :bookID, :clientID); ",
-                    {
-                        "id": loan.ID,
-                        "startDate": loan.StartDate,
-                        "returnDate": loan.ReturnDate,
-                        "endDate": loan.EndDate,
-                        "bookID": loan.BookID,
-                        "clientID": loan.ClientID
-                    }
-                )
+            _insert_loan(self._connection, loan)
         except:
-            self._connection.rollback()
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Loan")
 
-    def update_loan(self: Self, loan: Loan) -> None:
+    def submit_loan(self: Self, loan: Loan) -> Future[int]:
         """
-            Обновить существующее взятие книги.
-            
+            Добавить новое взятие книги через очередь записи (см. WriteQueue).
+            Если очередь записи не задана, то взятие добавляется сразу, как в add_loan.
+
             loan : Loan -- взятие книги.
 
-            Если взятие книги с таким ID не существует или возникает конфликт интервалов с другим взятием книги, будет поднята ошибка.
+            Возвращает Future, который завершается ID взятия после фиксации
+            или ошибкой, если взятие книги с таким ID уже существует или возникает конфликт интервалов с другим взятием книги.
+        """
+        return self._submit(lambda connection: _insert_loan(connection, loan), self.add_loan, loan)
+
+    def add_loans(self: Self, loans: Iterable[Loan]) -> None:
+        """
+            Добавить сразу несколько новых взятий книг одной транзакцией.
+            Взятиям без ID присваиваются ID.
+            
+            loans : Iterable[Loan] -- взятия книг.
+
+            Если взятие книги с таким ID уже существует или возникает конфликт интервалов с другим взятием книги,
+            будет поднята ошибка, и ни одно взятие не будет добавлено.
         """
-        if loan.ID is None:
-            raise ValueError("The loan's ID is not set.")
-        
         try:
-            self._connection.execute(
-                "UPDATE Loan SET "
-                "StartDate=:startDate,EndDate=:endDate,ReturnDate=:returnDate,BookID=:bookID,ClientID=:clientID "
-                "WHERE ID=:id;",
-                {
-                    "id": loan.ID,
+            insert_many(
+                self._connection,
+                "Loan",
+                loans,
+                "INSERT INTO Loan (ID, StartDate, EndDate, ReturnDate, BookID, ClientID) "
+                "VALUES (:id, :startDate, :endDate, :returnDate, :bookID, :clientID);",
+                lambda loan: {
                     "startDate": loan.StartDate,
                     "returnDate": loan.ReturnDate,
                     "endDate": loan.EndDate,
@@ -88,32 +109,133 @@ class LoanRepositorySqlite3:
                 }
             )
         except:
-            self._connection.rollback()
+            rollback(self._connection)
             raise
         else:
-            self._connection.commit()
-            self._reset_cache_event()
+            commit(self._connection, self._bus, "Loan")
+
+    def update_loan(self: Self, loan: Loan) -> None:
+        """
+            Обновить существующее взятие книги.
+            
+            loan : Loan -- взятие книги.
+
+            Если взятие книги с таким ID не существует или возникает конфликт интервалов с другим взятием книги, будет поднята ошибка.
+        """
+        if loan.ID is None:
+            raise ValueError("The loan's ID is not set.")
+        
+        try:
+            _update_loan(self._connection, loan)
+        except:
+            rollback(self._connection)
+            raise
+        else:
+            commit(self._connection, self._bus, "Loan")
+
+    def submit_loan_update(self: Self, loan: Loan) -> Future[int]:
+        """
+            Обновить существующее взятие книги через очередь записи (см. WriteQueue), например зафиксировать возврат.
+            Если очередь записи не задана, то взятие обновляется сразу, как в update_loan.
+
+            loan : Loan -- взятие книги.
+
+            Возвращает Future, который завершается ID взятия после фиксации
+            или ошибкой, если возникает конфликт интервалов с другим взятием книги.
+        """
+        if loan.ID is None:
+            raise ValueError("The loan's ID is not set.")
+        return self._submit(lambda connection: _update_loan(connection, loan), self.update_loan, loan)
+
+    def _submit(self: Self, operation: Callable[[sqlite3.Connection], int], fallback: Callable[[Loan], None], loan: Loan) -> Future[int]:
+        """
+            Поставить операцию в очередь записи, а если очереди нет - выполнить fallback сразу и вернуть завершённый Future.
+        """
+        if self._write_queue is not None:
+            return self._write_queue.submit(operation, "Loan")
+        future : Future[int] = Future()
+        try:
+            fallback(loan)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(loan.ID) #type: ignore
+        return future
 
     def get_unreturned_loans(self: Self, predicate: LoanSearchPredicate | None = None) -> Sequence[tuple[Loan, Book, Client]]:
         """
             Вывести список всех невозвращённых книг (взятий книг), удовлетворяющих предикату
         """
-        view = UnreturnedLoansView(self._connection, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(UnreturnedLoansView(self._connection, predicate))
     
     def get_expired_loans_at(self: Self, at: date, predicate: LoanSearchPredicate | None = None) -> Sequence[tuple[Loan, Book, Client, int]]:
         """
             Получить список всех просроченных на указанную дату взятий книг, удовлетворяющих предикату.
+            Взятия упорядочены по сроку возврата (сначала просроченные дольше всего).
             Аргументы:
                 at : date -- дата, для которой формируется список.
                              Книги, которые были просроченны позже этой даты, не будут отображены.
                              Число дней, на которое книги были просрочены, будет отсчитываться до этой даты.
                 predicate: LoanSearchPredicate -- предикат для фильтрации взятых книг.
         """
-        view = ExpiredLoansView(self._connection, at, predicate)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        #Если на эту дату есть снимок отчёта, то читаем отчёт из него
+        cur = self._connection.execute(
+            "SELECT EXISTS (SELECT 1 FROM OverdueSnapshot WHERE SnapshotDate = :at);",
+            { "at": at.isoformat() }
+        )
+        cur.row_factory = None
+        view_class = SnapshotExpiredLoansView if cur.fetchone()[0] else ExpiredLoansView
+        return self._register(view_class(self._connection, at, predicate))
+
+    def snapshot_expired_loans(self: Self, at: date) -> int:
+        """
+            Сохранить снимок отчёта о просроченных на указанную дату взятиях.
+            Пока снимок существует, get_expired_loans_at читает отчёт на эту дату из него.
+            Снимок поддерживается триггерами при изменении взятий, повторное создание снимка пересоздаёт его.
+
+            Возвращает количество взятий в снимке.
+        """
+        try:
+            self._connection.execute(
+                "DELETE FROM OverdueSnapshot WHERE SnapshotDate = :at;",
+                { "at": at.isoformat() }
+            )
+            self._connection.execute(
+                "INSERT INTO OverdueSnapshot (SnapshotDate, CreatedAt) VALUES (:at, datetime('now'));",
+                { "at": at.isoformat() }
+            )
+            cur = self._connection.execute(
+                "INSERT INTO OverdueSnapshotLoan (SnapshotDate, EndDate, LoanID) "
+                f"SELECT :at, Loan.EndDate, Loan.ID FROM Loan WHERE {ExpiredLoansView._condition};",
+                { "at": at.isoformat() }
+            )
+            count = cur.rowcount
+        except:
+            rollback(self._connection)
+            raise
+        else:
+            commit(self._connection, self._bus, "OverdueSnapshot")
+            return count
+
+    def delete_expired_loans_snapshots(self: Self, before: date) -> int:
+        """
+            Удалить снимки отчёта о просроченных взятиях на даты раньше указанной.
+            Каждый снимок обновляется триггерами при изменении взятий, поэтому старые снимки стоит удалять.
+
+            Возвращает количество удалённых снимков.
+        """
+        try:
+            cur = self._connection.execute(
+                "DELETE FROM OverdueSnapshot WHERE SnapshotDate < :before;",
+                { "before": before.isoformat() }
+            )
+            count = cur.rowcount
+        except:
+            rollback(self._connection)
+            raise
+        else:
+            commit(self._connection, self._bus, "OverdueSnapshot")
+            return count
 
     def get_book_history(self: Self, book: Book) -> Sequence[tuple[Loan, Client]]:
         """
@@ -122,9 +244,7 @@ class LoanRepositorySqlite3:
         if book.ID is None:
             raise ValueError("The book's ID is not set")
 
-        view = BookHistoryView(self._connection, book.ID)
-        self._reset_cache_event += WeakSubscriber(view.reset_cache)
-        return view
+        return self._register(BookHistoryView(self._connection, book.ID))
     
     def is_book_loaned_during(self: Self, book: Book, start: date, end: date) -> bool:
         """
@@ -135,41 +255,99 @@ class LoanRepositorySqlite3:
             start : date - начало промежутка (включительно)
             end: date - конец промежутка (включительно)
         """
+        #Пересечение интервала взятия (с выдачи по возврат включительно) с промежутком ищется по R*Tree-индексу LoanInterval
         cur = self._connection.execute(
             "SELECT EXISTS( "
-            "SELECT * FROM Loan WHERE "
-            "Loan.BookID = :id AND "
-            "Loan.StartDate <= :rangeEnd AND "
-	        "(:rangeStart <= Loan.ReturnDate OR Loan.ReturnDate IS NULL) "
+            "SELECT * FROM LoanInterval WHERE "
+            "LoanInterval.MinBook <= :id AND LoanInterval.MaxBook >= :id AND "
+            "LoanInterval.MinDay <= CAST(julianday(:rangeEnd) AS INTEGER) AND "
+            "LoanInterval.MaxDay >= CAST(julianday(:rangeStart) AS INTEGER) "
             ")",
             {
                 "id": book.ID,
-                "rangeStart": start,
-                "rangeEnd": end
+                "rangeStart": start.isoformat(),
+                "rangeEnd": end.isoformat()
             }
         )
         cur.row_factory = None
         return bool(cur.fetchone()[0])
 
+    def get_books_loaned_during(self: Self, book_ids: Iterable[int], start: date, end: date) -> set[int]:
+        """
+            Проверить сразу несколько книг: какие из них выданы в какой-то момент на протяжении указанного промежутка времени.
+            Выполняется одним запросом независимо от числа книг.
+            
+            Аргументы:
+            book_ids: Iterable[int] - ID проверяемых книг
+            start : date - начало промежутка (включительно)
+            end: date - конец промежутка (включительно)
+
+            Возвращает множество ID книг, которые выданы в этот промежуток.
+        """
+        #Список ID передаётся одним параметром в виде JSON-массива, и для каждого ID выполняется поиск по R*Tree-индексу LoanInterval
+        cur = self._connection.execute(
+            "SELECT DISTINCT Ids.value FROM json_each(:ids) AS Ids "
+            "WHERE EXISTS( "
+            "SELECT * FROM LoanInterval WHERE "
+            "LoanInterval.MinBook <= Ids.value AND LoanInterval.MaxBook >= Ids.value AND "
+            "LoanInterval.MinDay <= CAST(julianday(:rangeEnd) AS INTEGER) AND "
+            "LoanInterval.MaxDay >= CAST(julianday(:rangeStart) AS INTEGER) "
+            ")",
+            {
+                "ids": json.dumps([int(id) for id in book_ids]),
+                "rangeStart": start.isoformat(),
+                "rangeEnd": end.isoformat()
+            }
+        )
+        cur.row_factory = None
+        return { row[0] for row in cur.fetchall() }
+
+    def get_availability(self: Self, book_ids: Iterable[int], start: date, end: date) -> Sequence[AvailabilityInterval]:
+        """
+            Календарь доступности книг: чередующиеся интервалы, когда книга свободна и когда выдана, на протяжении промежутка времени.
+            Интервалы упорядочены по ID книги и дате начала, даты начала и конца входят в интервал.
+            Промежуток до добавления книги в библиотеку в календарь не входит.
+            Книга считается выданной с даты выдачи по дату возврата включительно, как и в is_book_loaned_during.
+            
+            Аргументы:
+            book_ids: Iterable[int] - ID книг
+            start : date - начало промежутка (включительно)
+            end: date - конец промежутка (включительно)
+        """
+        return self._register(AvailabilityView(self._connection, book_ids, start, end))
+
 def generate_predicate_query(predicate: LoanSearchPredicate) -> tuple[str, dict[str, Any]] | None:
     predicates : list[str] = []
     params : dict[str, Any] = {}
 
-    if predicate.AuthorContains is not None:
-        predicates.append("Book.Author LIKE :author")
-        params['author'] = f"%{predicate.AuthorContains}%"
+    #Фразы для поиска по полнотекстовым индексам BookSearch и ClientSearch: индексы сужают набор книг и читателей,
+    #а сравнения по столбцам с приведённым регистром остаются точной проверкой
+    book_phrases : list[str] = []
 
-    if predicate.BookNameContains is not None:
-        predicates.append("Book.Name LIKE :bookName")
-        params['bookName'] = f"%{predicate.BookNameContains}%"
+    for column, param, value in (
+        ("Author", "author", predicate.AuthorContains),
+        ("Name", "bookName", predicate.BookNameContains),
+        ("Genre", "genre", predicate.GenreContains)
+    ):
+        if value is None:
+            continue
+        predicates.append(f"Book.{column}Folded LIKE :{param} ESCAPE '\\'")
+        params[param] = contains_pattern(value)
+        phrase = fts_phrase(column, value)
+        if phrase is not None:
+            book_phrases.append(phrase)
 
-    if predicate.GenreContains is not None:
-        predicates.append("Book.Genre LIKE :genre")
-        params['genre'] = f"%{predicate.GenreContains}%"
+    if len(book_phrases) > 0:
+        predicates.insert(0, "Book.ID IN (SELECT rowid FROM BookSearch WHERE BookSearch MATCH :bookFts)")
+        params['bookFts'] = " AND ".join(book_phrases)
 
     if predicate.ClientNameContains is not None:
-        predicates.append("Client.Name LIKE :clientName")
-        params['clientName'] = f"%{predicate.ClientNameContains}%"
+        phrase = fts_phrase("Name", predicate.ClientNameContains)
+        if phrase is not None:
+            predicates.append("Client.ID IN (SELECT rowid FROM ClientSearch WHERE ClientSearch MATCH :clientFts)")
+            params['clientFts'] = phrase
+        predicates.append("Client.NameFolded LIKE :clientName ESCAPE '\\'")
+        params['clientName'] = contains_pattern(predicate.ClientNameContains)
 
     if predicate.PublicationYearMin is not None:
         predicates.append("Book.PublicationYear >= :yearmin")
@@ -192,7 +370,98 @@ def generate_predicate_query(predicate: LoanSearchPredicate) -> tuple[str, dict[
     
     return (" AND ".join(predicates), params)
 
-class UnreturnedLoansView(CachingView[tuple[Loan, Book, Client]]):
+def unreturned_loan_from_row(row: sqlite3.Row) -> tuple[Loan, Book, Client]:
+    return (
+        Loan(date.fromisoformat(row["StartDate"]), date.fromisoformat(row["EndDate"]), row["ClientID"], row["BookID"], row["ID"]),
+        Book(row["BookName"], row["PublicationYear"], row["Author"], row["Genre"], date.fromisoformat(row["AddedAtDate"]), row["BookID"]),
+        Client(row['ClientName'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ClientID'])
+    )
+
+def expired_loan_from_row(row: sqlite3.Row) -> tuple[Loan, Book, Client, int]:
+    return (
+        Loan(date.fromisoformat(row["StartDate"]), date.fromisoformat(row["EndDate"]), row["ClientID"], row["BookID"], row["ID"], date.fromisoformat(row["ReturnDate"]) if row["ReturnDate"] is not None else None),
+        Book(row["BookName"], row["PublicationYear"], row["Author"], row["Genre"], date.fromisoformat(row["AddedAtDate"]), row["BookID"]),
+        Client(row['ClientName'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ClientID']),
+        (date.fromisoformat(row["ExpiredUntil"]) - date.fromisoformat(row["EndDate"])).days
+    )
+
+def history_entry_from_row(row: sqlite3.Row) -> tuple[Loan, Client]:
+    return (
+        Loan(
+            date.fromisoformat(row["StartDate"]),
+            date.fromisoformat(row["EndDate"]),
+            row["ClientID"],
+            row["BookID"],
+            row["ID"],
+            date.fromisoformat(row["ReturnDate"]) if row["ReturnDate"] is not None else None
+        ),
+        Client(row['Name'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ClientID'])
+    )
+
+def _insert_loan(connection: sqlite3.Connection, loan: Loan) -> int:
+    """Выполнить вставку взятия без фиксации транзакции. Взятию без ID присваивается ID."""
+    if loan.ID is None:
+        cur = connection.execute(
+            "INSERT INTO Loan (StartDate, EndDate, ReturnDate, BookID, ClientID) "
+            "VALUES (:startDate, :endDate, :returnDate, :bookID, :clientID)"
+            "RETURNING ID; ",
+            {
+                "startDate": loan.StartDate,
+                "returnDate": loan.ReturnDate,
+                "endDate": loan.EndDate,
+                "bookID": loan.BookID,
+                "clientID": loan.ClientID
+            }
+        )
+        cur.row_factory = None
+        loan.ID = cur.fetchone()[0]
+    else:
+        connection.execute(
+            "INSERT INTO Loan (ID, StartDate, EndDate, ReturnDate, BookID, ClientID) "
+            "VALUES (:id, :startDate, :endDate, :returnDate, :bookID, :clientID); ",
+            {
+                "id": loan.ID,
+                "startDate": loan.StartDate,
+                "returnDate": loan.ReturnDate,
+                "endDate": loan.EndDate,
+                "bookID": loan.BookID,
+                "clientID": loan.ClientID
+            }
+        )
+    return loan.ID
+
+def _update_loan(connection: sqlite3.Connection, loan: Loan) -> int:
+    """Выполнить обновление взятия без фиксации транзакции"""
+    connection.execute(
+        "UPDATE Loan SET "
+        "StartDate=:startDate,EndDate=:endDate,ReturnDate=:returnDate,BookID=:bookID,ClientID=:clientID "
+        "WHERE ID=:id;",
+        {
+            "id": loan.ID,
+            "startDate": loan.StartDate,
+            "returnDate": loan.ReturnDate,
+            "endDate": loan.EndDate,
+            "bookID": loan.BookID,
+            "clientID": loan.ClientID
+        }
+    )
+    return loan.ID #type: ignore
+
+class UnreturnedLoansView(KeysetCachingView[tuple[Loan, Book, Client]]):
+    tables = frozenset({"Loan", "Book", "Client"})
+    '''Таблицы, от которых зависит содержимое view'''
+
+    #Невозвращённые взятия читаются из CurrentLoan: индекс IDX_CurrentLoan_BookName совпадает с порядком списка.
+    #CROSS JOIN оставляет CurrentLoan внешней таблицей и при поиске: невозвращённых взятий немного, и проверить предикат
+    #для взятий по порядку дешевле, чем сортировать все взятия найденных книг
+    _source = (
+        "CurrentLoan CROSS JOIN Loan ON Loan.ID = CurrentLoan.LoanID "
+        "INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID"
+    )
+    '''Источник строк списка'''
+    _order = ("CurrentLoan.BookName", "CurrentLoan.LoanID")
+    '''Столбцы сортировки списка (они же - ключ постраничного вывода)'''
+
     def __init__(self, connection: sqlite3.Connection, predicate: LoanSearchPredicate | None = None):
         self._connection = connection
         
@@ -207,19 +476,17 @@ class UnreturnedLoansView(CachingView[tuple[Loan, Book, Client]]):
                 "SELECT t.ID, t.ClientName, t.RegistrationDate,  "
                 "t.BookName, t.Author, t.Genre, t.PublicationYear, t.AddedAtDate, "
                 "t.StartDate, t.EndDate, t.BookID, t.ClientID, t.Address "
-                "FROM (SELECT *, Client.Name as ClientName, Book.Name as BookName, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                "WHERE Loan.ReturnDate IS NULL "
-                "ORDER BY Book.Name "
+                "FROM (SELECT Loan.*, Book.*, Client.*, Client.Name as ClientName, Book.Name as BookName, ROW_NUMBER() OVER (ORDER BY CurrentLoan.BookName, CurrentLoan.LoanID) as row_cnt "
+                f"FROM {self._source} "
+                "ORDER BY CurrentLoan.BookName, CurrentLoan.LoanID "
                 "LIMIT :start,:precount) as t "
                 "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
             ) if stride > 1 else (
                 "SELECT Client.Name as ClientName, Client.RegistrationDate,  "
                 "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
                 "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Client.Address "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                "WHERE Loan.ReturnDate IS NULL "
-                "ORDER BY Book.Name "
+                f"FROM {self._source} "
+                "ORDER BY CurrentLoan.BookName, CurrentLoan.LoanID "
                 "LIMIT :start,:count;"
             )
         else:
@@ -227,51 +494,87 @@ class UnreturnedLoansView(CachingView[tuple[Loan, Book, Client]]):
                 "SELECT t.ID, t.ClientName, t.RegistrationDate,  "
                 "t.BookName, t.Author, t.Genre, t.PublicationYear, t.AddedAtDate, "
                 "t.StartDate, t.EndDate, t.BookID, t.ClientID, t.Address "
-                "FROM (SELECT *, Client.Name as ClientName, Book.Name as BookName, ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                f"WHERE Loan.ReturnDate IS NULL AND ({self._predicate}) "
-                "ORDER BY Book.Name "
+                "FROM (SELECT Loan.*, Book.*, Client.*, Client.Name as ClientName, Book.Name as BookName, ROW_NUMBER() OVER (ORDER BY CurrentLoan.BookName, CurrentLoan.LoanID) as row_cnt "
+                f"FROM {self._source} "
+                f"WHERE {self._predicate} "
+                "ORDER BY CurrentLoan.BookName, CurrentLoan.LoanID "
                 "LIMIT :start,:precount) as t "
                 "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
             ) if stride > 1 else (
                 "SELECT Client.Name as ClientName, Client.RegistrationDate,  "
                 "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
                 "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Client.Address "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                f"WHERE Loan.ReturnDate IS NULL AND ({self._predicate}) "
-                "ORDER BY Book.Name "
+                f"FROM {self._source} "
+                f"WHERE {self._predicate} "
+                "ORDER BY CurrentLoan.BookName, CurrentLoan.LoanID "
                 "LIMIT :start,:count;"
             )
 
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
-
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type: ignore
-        return [
-            (
-                Loan(date.fromisoformat(row["StartDate"]), date.fromisoformat(row["EndDate"]), row["ClientID"], row["BookID"], row["ID"]),
-                Book(row["BookName"], row["PublicationYear"], row["Author"], row["Genre"], date.fromisoformat(row["AddedAtDate"]), row["BookID"]),
-                Client(row['ClientName'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ClientID'])
-            )
-            for row in cur.fetchall()
-        ]
+        return [unreturned_loan_from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: tuple[Loan, Book, Client]) -> tuple[Any, ...]:
+        return (item[1].Name, item[0].ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[tuple[Loan, Book, Client]]:
+        return [unreturned_loan_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[tuple[Loan, Book, Client]]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, unreturned_loan_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        conditions = [f"({self._predicate})"] if self._predicate is not None else []
+        seek = seek_condition(self._order, key, backward)
+        if seek is not None:
+            conditions.append(seek)
+        where = f"WHERE {' AND '.join(conditions)} " if len(conditions) > 0 else ""
+
+        cur = self._connection.execute(
+            "SELECT Client.Name as ClientName, Client.RegistrationDate,  "
+            "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
+            "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Client.Address "
+            f"FROM {self._source} "
+            f"{where}"
+            f"ORDER BY {seek_order(self._order, backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return cur
 
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
-            "SELECT COUNT(*) FROM Loan WHERE Loan.ReturnDate IS NULL;" if self._predicate is None
-            else f"SELECT COUNT(*) FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID WHERE Loan.ReturnDate IS NULL AND ({self._predicate});",
+            "SELECT COUNT(*) FROM CurrentLoan;" if self._predicate is None
+            else f"SELECT COUNT(*) FROM {self._source} WHERE {self._predicate};",
             self._params
         )
         cur.row_factory = None
         return cur.fetchone()[0]
     
-class ExpiredLoansView(CachingView[tuple[Loan, Book, Client, int]]):
+class ExpiredLoansView(KeysetCachingView[tuple[Loan, Book, Client, int]]):
+    tables = frozenset({"Loan", "Book", "Client"})
+    '''Таблицы, от которых зависит содержимое view'''
+
+    _source = "Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID"
+    '''Источник строк отчёта'''
+    _condition = "(Loan.ReturnDate IS NULL OR Loan.ReturnDate > Loan.EndDate) AND Loan.EndDate < :at"
+    '''Условие попадания взятия в отчёт'''
+    _order = ("Loan.EndDate", "Loan.ID")
+    '''Столбцы сортировки отчёта (они же - ключ постраничного вывода): страница от ключа читается по индексу IDX_Loan_Overdue'''
+
     def __init__(self, connection: sqlite3.Connection, at: date, predicate: LoanSearchPredicate | None = None):
         self._connection = connection
         
@@ -279,96 +582,123 @@ class ExpiredLoansView(CachingView[tuple[Loan, Book, Client, int]]):
         self._predicate, self._params = pred if pred is not None else (None, {})
         self._params["at"] = at.isoformat()
 
+    def _get_key(self: Self, item: tuple[Loan, Book, Client, int]) -> tuple[Any, ...]:
+        return (item[0].EndDate.isoformat(), item[0].ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[tuple[Loan, Book, Client, int]]:
+        return [expired_loan_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[tuple[Loan, Book, Client, int]]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, expired_loan_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        conditions = [self._condition]
+        if self._predicate is not None:
+            conditions.append(f"({self._predicate})")
+        seek = seek_condition(self._order, key, backward)
+        if seek is not None:
+            conditions.append(seek)
+
+        cur = self._connection.execute(
+            "SELECT Client.Name as ClientName, Client.RegistrationDate, Client.Address,  "
+            "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
+            "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate, "
+            "(CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > :at THEN :at "
+            "ELSE Loan.ReturnDate END) AS ExpiredUntil "
+            f"FROM {self._source} "
+            f"WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {seek_order(self._order, backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return cur
+
     def _get_len(self: Self) -> int:
         cur = self._connection.execute(
-            "SELECT COUNT(*) FROM Loan WHERE (Loan.ReturnDate IS NULL OR Loan.ReturnDate > Loan.EndDate) AND Loan.EndDate < :at;" if self._predicate is None
-            else f"SELECT COUNT(*) FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID WHERE (Loan.ReturnDate IS NULL OR Loan.ReturnDate > Loan.EndDate) AND Loan.EndDate < :at AND ({self._predicate});",
+            f"SELECT COUNT(*) FROM Loan WHERE {self._condition};" if self._predicate is None
+            else f"SELECT COUNT(*) FROM {self._source} WHERE {self._condition} AND ({self._predicate});",
             self._params
         )
         cur.row_factory = None
         return cur.fetchone()[0]
     
     def _get_slice(self: Self, start: int, count: int, stride: int) -> Sequence[tuple[Loan, Book, Client, int]]:
-        #Запрос меняется в зависимости от наличия предиката
+        #Условие меняется в зависимости от наличия предиката
         #Если stide равен 1, то можно упростить запрос, игнорируя row_cnt и stride
-        if self._predicate is None:
-            query = (
-                "SELECT t.ID, t.ClientName, t.RegistrationDate, t.Address,  "
-                "t.BookName, t.Author, t.Genre, t.PublicationYear, t.AddedAtDate, "
-                "t.StartDate, t.EndDate, t.BookID, t.ClientID, t.ExpiredUntil, t.ReturnDate "
-                "FROM (SELECT Client.Name as ClientName, Client.RegistrationDate, Client.Address,  "
-                "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
-                "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate, "
-                "(CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > :at THEN :at "
-	            "ELSE Loan.ReturnDate END) AS ExpiredUntil, "
-                "ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                "WHERE (Loan.ReturnDate IS NULL OR Loan.ReturnDate > Loan.EndDate) AND Loan.EndDate < :at "
-                "ORDER BY Book.Name "
-                "LIMIT :start,:precount) as t"
-                "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else (
-                "SELECT Client.Name as ClientName, Client.RegistrationDate, Client.Address,  "
-                "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
-                "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate, "
-                "(CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > :at THEN :at "
-	            "ELSE Loan.ReturnDate END) AS ExpiredUntil "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                "WHERE (Loan.ReturnDate IS NULL OR Loan.ReturnDate > Loan.EndDate) AND Loan.EndDate < :at "
-                "ORDER BY Book.Name "
-                "LIMIT :start,:count;"
-            )
-        else:
-            query = (
-                "SELECT t.ID, t.ClientName, t.RegistrationDate, t.Address,  "
-                "t.BookName, t.Author, t.Genre, t.PublicationYear, t.AddedAtDate, "
-                "t.StartDate, t.EndDate, t.BookID, t.ClientID, t.ExpiredUntil, t.ReturnDate "
-                "FROM (SELECT Client.Name as ClientName, Client.RegistrationDate, Client.Address,  "
-                "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
-                "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate, "
-                "(CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > :at THEN :at "
-	            "ELSE Loan.ReturnDate END) AS ExpiredUntil, "
-                "ROW_NUMBER() OVER (ORDER BY Book.Name) as row_cnt "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                "WHERE (Loan.ReturnDate IS NULL OR Loan.ReturnDate > Loan.EndDate) AND Loan.EndDate < :at "
-                f"AND {self._predicate} "
-                "ORDER BY Book.Name "
-                "LIMIT :start,:precount) as t"
-                "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
-            ) if stride > 1 else (
-                "SELECT Client.Name as ClientName, Client.RegistrationDate, Client.Address,  "
-                "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
-                "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate, "
-                "(CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > :at THEN :at "
-	            "ELSE Loan.ReturnDate END) AS ExpiredUntil "
-                "FROM Loan INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID "
-                "WHERE (Loan.ReturnDate IS NULL OR Loan.ReturnDate > Loan.EndDate) AND Loan.EndDate < :at "
-                f"AND {self._predicate} "
-                "ORDER BY Book.Name "
-                "LIMIT :start,:count;"
-            )
-
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
+        condition = self._condition if self._predicate is None else f"{self._condition} AND {self._predicate}"
+        order = ", ".join(self._order)
+        query = (
+            "SELECT t.ID, t.ClientName, t.RegistrationDate, t.Address,  "
+            "t.BookName, t.Author, t.Genre, t.PublicationYear, t.AddedAtDate, "
+            "t.StartDate, t.EndDate, t.BookID, t.ClientID, t.ExpiredUntil, t.ReturnDate "
+            "FROM (SELECT Client.Name as ClientName, Client.RegistrationDate, Client.Address,  "
+            "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
+            "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate, "
+            "(CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > :at THEN :at "
+            "ELSE Loan.ReturnDate END) AS ExpiredUntil, "
+            f"ROW_NUMBER() OVER (ORDER BY {order}) as row_cnt "
+            f"FROM {self._source} "
+            f"WHERE {condition} "
+            f"ORDER BY {order} "
+            "LIMIT :start,:precount) as t "
+            "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
+        ) if stride > 1 else (
+            "SELECT Client.Name as ClientName, Client.RegistrationDate, Client.Address,  "
+            "Book.Name as BookName, Book.Author, Book.Genre, Book.PublicationYear, Book.AddedAtDate, "
+            "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate, "
+            "(CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > :at THEN :at "
+            "ELSE Loan.ReturnDate END) AS ExpiredUntil "
+            f"FROM {self._source} "
+            f"WHERE {condition} "
+            f"ORDER BY {order} "
+            "LIMIT :start,:count;"
+        )
 
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type: ignore
-        return [
-            (
-                Loan(date.fromisoformat(row["StartDate"]), date.fromisoformat(row["EndDate"]), row["ClientID"], row["BookID"], row["ID"], date.fromisoformat(row["ReturnDate"]) if row["ReturnDate"] is not None else None),
-                Book(row["BookName"], row["PublicationYear"], row["Author"], row["Genre"], date.fromisoformat(row["AddedAtDate"]), row["BookID"]),
-                Client(row['ClientName'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ClientID']),
-                (date.fromisoformat(row["ExpiredUntil"]) - date.fromisoformat(row["EndDate"])).days
-            )
-            for row in cur.fetchall()
-        ]
+        return [expired_loan_from_row(row) for row in cur.fetchall()]
+
+class SnapshotExpiredLoansView(ExpiredLoansView):
+    '''
+    Отчёт о просроченных взятиях, построенный по снимку на дату отчёта.
+    Строки снимка уже упорядочены по сроку возврата и ID взятия, поэтому страница читается по первичному ключу снимка.
+    '''
+    tables = frozenset({"Loan", "Book", "Client", "OverdueSnapshot"})
+    '''Таблицы, от которых зависит содержимое view'''
+
+    _source = (
+        "OverdueSnapshotLoan INNER JOIN Loan ON Loan.ID = OverdueSnapshotLoan.LoanID "
+        "INNER JOIN Book ON Loan.BookID = Book.ID INNER JOIN Client ON Loan.ClientID = Client.ID"
+    )
+    _condition = "OverdueSnapshotLoan.SnapshotDate = :at"
+    _order = ("OverdueSnapshotLoan.EndDate", "OverdueSnapshotLoan.LoanID")
+
+    def _get_len(self: Self) -> int:
+        cur = self._connection.execute(
+            "SELECT COUNT(*) FROM OverdueSnapshotLoan WHERE SnapshotDate = :at;" if self._predicate is None
+            else f"SELECT COUNT(*) FROM {self._source} WHERE {self._condition} AND ({self._predicate});",
+            self._params
+        )
+        cur.row_factory = None
+        return cur.fetchone()[0]
     
-class BookHistoryView(CachingView[tuple[Loan, Client]]):
+class BookHistoryView(KeysetCachingView[tuple[Loan, Client]]):
+    tables = frozenset({"Loan", "Client"})
+    '''Таблицы, от которых зависит содержимое view'''
+
     def __init__(self, connection: sqlite3.Connection, book: int):
         self._connection = connection
         self._params = { "id": book }
@@ -387,10 +717,10 @@ class BookHistoryView(CachingView[tuple[Loan, Client]]):
         query = (
             "SELECT t.Name, t.RegistrationDate, t.Address,  "
             "t.ID, t.StartDate, t.EndDate, t.BookID, t.ClientID, t.ReturnDate "
-            "FROM (SELECT *, ROW_NUMBER() OVER (ORDER BY Loan.StartDate) as row_cnt "
+            "FROM (SELECT *, ROW_NUMBER() OVER (ORDER BY Loan.StartDate, Loan.ID) as row_cnt "
             "FROM Loan INNER JOIN Client ON Loan.ClientID = Client.ID "
             "WHERE Loan.BookID = :id "
-            "ORDER BY Loan.StartDate "
+            "ORDER BY Loan.StartDate, Loan.ID "
             "LIMIT :start,:precount) as t "
             "WHERE t.row_cnt % :stride = 1 LIMIT :count;"
         ) if stride > 1 else (
@@ -398,31 +728,148 @@ class BookHistoryView(CachingView[tuple[Loan, Client]]):
             "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate "
             "FROM Loan INNER JOIN Client ON Loan.ClientID = Client.ID "
             "WHERE Loan.BookID = :id "
-            "ORDER BY Loan.StartDate "
+            "ORDER BY Loan.StartDate, Loan.ID "
             "LIMIT :start,:count;"
         )
 
-        self._params["start"] = start
-        self._params["precount"] = count*stride - 1
-        self._params["count"] = count
-        self._params["stride"] = stride
-
         cur = self._connection.execute(
             query,
-            self._params
+            {
+                **self._params,
+                "start": start,
+                "precount": count*stride - 1,
+                "count": count,
+                "stride": stride
+            }
         )
         cur.row_factory = sqlite3.Row #type: ignore
-        return [
-            (
-                Loan(
-                    date.fromisoformat(row["StartDate"]),
-                    date.fromisoformat(row["EndDate"]),
-                    row["ClientID"],
-                    row["BookID"],
-                    row["ID"],
-                    date.fromisoformat(row["ReturnDate"]) if row["ReturnDate"] is not None else None
-                ),
-                Client(row['Name'], date.fromisoformat(row['RegistrationDate']), row['Address'], row['ClientID'])
-            )
-            for row in cur.fetchall()
-        ]
\ No newline at end of file
+        return [history_entry_from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: tuple[Loan, Client]) -> tuple[Any, ...]:
+        return (item[0].StartDate.isoformat(), item[0].ID)
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[tuple[Loan, Client]]:
+        return [history_entry_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[tuple[Loan, Client]]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, history_entry_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        seek = seek_condition(("Loan.StartDate", "Loan.ID"), key, backward)
+
+        cur = self._connection.execute(
+            "SELECT Client.Name, Client.RegistrationDate, Client.Address, "
+            "Loan.ID, Loan.StartDate, Loan.EndDate, Loan.BookID, Loan.ClientID, Loan.ReturnDate "
+            "FROM Loan INNER JOIN Client ON Loan.ClientID = Client.ID "
+            "WHERE Loan.BookID = :id "
+            f"{f'AND {seek} ' if seek is not None else ''}"
+            f"ORDER BY {seek_order(('Loan.StartDate', 'Loan.ID'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return cur
+
+def availability_from_row(row: sqlite3.Row) -> AvailabilityInterval:
+    return AvailabilityInterval(row["BookID"], date.fromisoformat(row["IntervalStart"]), date.fromisoformat(row["IntervalEnd"]), bool(row["Free"]), row["LoanID"])
+
+class AvailabilityView(KeysetCachingView[AvailabilityInterval]):
+    tables = frozenset({"Loan", "Book"})
+    '''Таблицы, от которых зависит содержимое view'''
+
+    #Интервалы строятся за один проход по взятиям каждой книги в порядке дат (индекс IDX_Loan_BookID):
+    #интервалы занятости обрезаются по промежутку, а свободные интервалы -- промежутки между соседними
+    #интервалами занятости (LAG/LEAD), перед первым и после последнего из них или весь промежуток, если взятий нет.
+    #Книга занята с даты выдачи по день возврата включительно, как и в is_book_loaned_during и get_books_loaned_during;
+    #если следующее взятие начинается в день возврата, этот день относится к следующему взятию, чтобы интервалы не пересекались.
+    _intervals = (
+        "WITH Requested AS ( "
+            "SELECT Book.ID AS BookID, MAX(Book.AddedAtDate, :start) AS RangeStart, :end AS RangeEnd FROM Book "
+            "WHERE Book.ID IN (SELECT value FROM json_each(:ids)) AND MAX(Book.AddedAtDate, :start) <= :end "
+        "), Busy AS ( "
+            "SELECT Requested.BookID, Loan.ID AS LoanID, Requested.RangeStart, Requested.RangeEnd, "
+            "MAX(Loan.StartDate, Requested.RangeStart) AS BusyStart, "
+            "CASE WHEN Loan.ReturnDate IS NULL OR Loan.ReturnDate > Requested.RangeEnd THEN Requested.RangeEnd "
+            "ELSE Loan.ReturnDate END AS BusyEnd "
+            "FROM Requested INNER JOIN Loan ON Loan.BookID = Requested.BookID "
+            "WHERE Loan.StartDate <= Requested.RangeEnd "
+            "AND (Loan.ReturnDate IS NULL OR Loan.ReturnDate >= Requested.RangeStart) "
+        "), Neighbours AS ( "
+            "SELECT *, LAG(BusyEnd) OVER w AS PrevEnd, LEAD(BusyStart) OVER w AS NextStart FROM Busy "
+            "WINDOW w AS (PARTITION BY BookID ORDER BY BusyStart, LoanID) "
+        "), Intervals AS ( "
+            "SELECT BookID, BusyStart AS IntervalStart, "
+            "CASE WHEN NextStart <= BusyEnd THEN date(NextStart, '-1 day') ELSE BusyEnd END AS IntervalEnd, 0 AS Free, LoanID FROM Neighbours "
+            "WHERE NextStart IS NULL OR NextStart > BusyStart "
+            "UNION ALL "
+            "SELECT BookID, COALESCE(date(PrevEnd, '+1 day'), RangeStart), date(BusyStart, '-1 day'), 1, NULL FROM Neighbours "
+            "WHERE COALESCE(date(PrevEnd, '+1 day'), RangeStart) <= date(BusyStart, '-1 day') "
+            "UNION ALL "
+            "SELECT BookID, date(BusyEnd, '+1 day'), RangeEnd, 1, NULL FROM Neighbours "
+            "WHERE NextStart IS NULL AND date(BusyEnd, '+1 day') <= RangeEnd "
+            "UNION ALL "
+            "SELECT BookID, RangeStart, RangeEnd, 1, NULL FROM Requested "
+            "WHERE NOT EXISTS (SELECT * FROM Busy WHERE Busy.BookID = Requested.BookID) "
+        ") "
+    )
+
+    def __init__(self, connection: sqlite3.Connection, book_ids: Iterable[int], start: date, end: date):
+        self._connection = connection
+        self._params = {
+            "ids": json.dumps([int(id) for id in book_ids]),
+            "start": start.isoformat(),
+            "end": end.isoformat()
+        }
+
+    def _get_slice(self: Self, start: int, count: int, stride: int) -> Sequence[AvailabilityInterval]:
+        cur = self._connection.execute(
+            f"{self._intervals}"
+            "SELECT * FROM (SELECT *, ROW_NUMBER() OVER (ORDER BY BookID, IntervalStart) - 1 AS RowIndex FROM Intervals) "
+            "WHERE RowIndex >= :rowStart AND (RowIndex - :rowStart) % :stride = 0 "
+            "ORDER BY RowIndex LIMIT :count;",
+            {
+                **self._params,
+                "rowStart": start,
+                "count": count,
+                "stride": stride
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return [availability_from_row(row) for row in cur.fetchall()]
+
+    def _get_key(self: Self, item: AvailabilityInterval) -> tuple[Any, ...]:
+        return (item.BookID, item.Start.isoformat())
+
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[AvailabilityInterval]:
+        return [availability_from_row(row) for row in self._seek_cursor(key, count, backward).fetchall()]
+
+    def _iter_items(self: Self, batch_size: int) -> Iterator[AvailabilityInterval]:
+        return iter_cursor(self._seek_cursor(None, -1, False), batch_size, availability_from_row)
+
+    def _seek_cursor(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> sqlite3.Cursor:
+        seek = seek_condition(("BookID", "IntervalStart"), key, backward)
+
+        cur = self._connection.execute(
+            f"{self._intervals}"
+            "SELECT * FROM Intervals "
+            f"{f'WHERE {seek} ' if seek is not None else ''}"
+            f"ORDER BY {seek_order(('BookID', 'IntervalStart'), backward)} LIMIT :count;",
+            {
+                **self._params,
+                **seek_params(key),
+                "count": count
+            }
+        )
+        cur.row_factory = sqlite3.Row #type: ignore
+        return cur
+
+    def _get_len(self: Self) -> int:
+        cur = self._connection.execute(
+            f"{self._intervals}SELECT COUNT(*) FROM Intervals;",
+            self._params
+        )
+        cur.row_factory = None
+        return cur.fetchone()[0]
@@ -1,21 +1,24 @@
 from datetime import date
 from typing import Self
 
+from components.books.book import Book
 from components.books.repository import BookSearchPredicate, IBookRepository
-from components.books.sqlite3 import BookRepositorySqlite3
+from components.books.sqlite3 import BookRepositorySqlite3, fill_folded_columns as fill_book_folded_columns
 
 from components.clients.repository import IClientRepository, ClientSearchPredicate
-from components.clients.sqlite3 import ClientRepositorySqlite3
+from components.clients.sqlite3 import ClientRepositorySqlite3, fill_folded_columns as fill_client_folded_columns
 
 from components.loans.sqlite3 import LoanRepositorySqlite3
 from components.loans.repository import ILoanRepository
 
-from sqlite3 import connect
-
+from modules.database import open_database
+from modules.pool import ConnectionPool
+from modules.invalidation import InvalidationBus
+from modules.report_cache import ReportCache
 from modules.menu.hosts import SimpleConsoleMenuHost
 from modules.menu.core import MenuHostBase
 from modules.menu.static import StaticMenu, StaticMenuEntry, MenuEntryBack, SubmenuEntry
-from modules.menu.pagination import PaginationMenu
+from modules.menu.pagination import PaginationMenu, PagePrefetcher
 from modules.menu.input import validator_always
 
 
@@ -33,7 +36,7 @@ from menus.AddClientMenu import AddClientMenu
 from menus.ClientMenu import ClientMenu
 from menus.FindClientMenu import FindClientMenu
 
-from menus.common import book_to_text, client_to_text
+from menus.common import book_to_text, client_to_text, availability_to_text
 
 def unloaned_books_at(host: MenuHostBase, bookRepo: IBookRepository):
     """
@@ -62,6 +65,27 @@ def expired_loans_at(host: MenuHostBase, repo: ILoanRepository):
         return
     host.push(FilteredExpiredLoansMenu(repo, when))
 
+def book_availability(host: MenuHostBase, repo: ILoanRepository, book: Book):
+    """
+        Запрашиваем у пользователя промежуток времени и отображаем календарь доступности книги на этом промежутке.
+    """
+    start = host.input("Введите дату начала в формате 'ГГГГ-ММ-ДД' (или используйте Ctrl + C, чтобы отменить ввод): ",
+                       date.fromisoformat,
+                       validator_always,
+                       "Неверный формат даты!")
+    if start is None:
+        return
+    end = host.input("Введите дату конца в формате 'ГГГГ-ММ-ДД' (или используйте Ctrl + C, чтобы отменить ввод): ",
+                     date.fromisoformat,
+                     lambda x: x >= start,
+                     "Неверный формат даты или дата конца раньше даты начала!")
+    if end is None:
+        return
+    host.push(PaginationMenu(
+        repo.get_availability([book.ID], start, end),
+        text_generator=availability_to_text
+    ))
+
 class FilteredBooksListMenu(FindBookMenu):
     """
         Меню на базе меню поиска книги, которое отобразит многостраничный список со всеми найденными книгами.
@@ -82,6 +106,7 @@ class FilteredBooksListMenu(FindBookMenu):
                         self._loanRepo.get_book_history(x),
                         text_generator=lambda h: f'{client_to_text(h[1])} - с {h[0].StartDate}{(f' по {h[0].ReturnDate}' if h[0].ReturnDate is not None else '')}'
                     )),
+                    StaticMenuEntry('Календарь доступности', lambda host: book_availability(host, self._loanRepo, x)),
                     MenuEntryBack()
                 ]))
             )
@@ -118,12 +143,22 @@ class DummyGeocoder:
             return (0, 0)
 
 if __name__ == "__main__":
-    with connect("library.db") as connection:
-        #Внешние ключи активируются для каждого подключения, а не для БД в целом.
-        connection.execute("PRAGMA foreign_keys = ON;")
-        bookRepo = BookRepositorySqlite3(connection)
-        clientRepo = ClientRepositorySqlite3(connection)
-        loanRepo = LoanRepositorySqlite3(connection)
+    #Изменения записываются через одно подключение, а списки и отчёты читаются через подключения только для чтения
+    with ConnectionPool("library.db", max_readers=2) as pool:
+        connection = pool.writer
+        #Общая шина: изменение взятий сбрасывает и зависящие от них списки книг и читателей
+        bus = InvalidationBus()
+        #Столбцы для поиска без учёта регистра у записей, добавленных в обход приложения, заполняются один раз при запуске
+        fill_book_folded_columns(connection, bus)
+        fill_client_folded_columns(connection, bus)
+        #Общий кеш отчётов: повторно открытый отчёт не выполняет запросов, пока БД не изменится (в том числе из другого процесса)
+        cache = ReportCache(connection)
+        bookRepo = BookRepositorySqlite3(connection, bus, cache, pool)
+        clientRepo = ClientRepositorySqlite3(connection, bus, cache, pool)
+        #Взятия и возвраты записываются отдельным потоком, который фиксирует одновременные изменения одной транзакцией.
+        #Поток пишет через то же подключение пула и закрывается вместе с пулом (с фиксацией оставшихся операций)
+        writeQueue = pool.write_queue(bus)
+        loanRepo = LoanRepositorySqlite3(connection, bus, cache, writeQueue, pool)
         rootMenu = StaticMenu("АРМ Помощник библиотекаря", [
             SubmenuEntry("Добавить взятие/возврат книги.", StaticMenu("Взятие/возврат книги", [
                 SubmenuEntry("Добавить взятие книги", lambda: AddLoanMenu(bookRepo, clientRepo, loanRepo)),
@@ -185,6 +220,15 @@ if __name__ == "__main__":
                         )
                     )
                 ),
+                StaticMenuEntry(
+                    "Сводка по читателям",
+                    lambda host: host.push(
+                        PaginationMenu(
+                            clientRepo.get_client_summaries(),
+                            text_generator=lambda x: f'{client_to_text(x[0])} - взято: {x[1]}, на руках: {x[2]}, последнее посещение: {x[3].isoformat()}'
+                        )
+                    )
+                ),
                 StaticMenuEntry(
                     "Популярные жанры (по числу взятых книг жанра)",
                     lambda host: host.push(
@@ -207,4 +251,9 @@ if __name__ == "__main__":
         ])
 
         host = SimpleConsoleMenuHost()
-        host.run(rootMenu)
\ No newline at end of file
+        #Соседние страницы списков загружаются в фоне через отдельное подключение только для чтения
+        PaginationMenu.prefetcher = PagePrefetcher(lambda: open_database("library.db", "desk", read_only=True))
+        try:
+            host.run(rootMenu)
+        finally:
+            PaginationMenu.prefetcher.close()
\ No newline at end of file
@@ -21,6 +21,8 @@ class AddLoanReturnMenu(MenuBase):
     """
         Меню добавления факта возврата книги
     """
+    write_timeout : float = 30.0
+    '''Сколько секунд ждать фиксации возврата очередью записи'''
 
     def __init__(self, loanRepo : ILoanRepository) -> None:
         self._loan : tuple[Loan, Book, Client] | None = None
@@ -76,6 +78,16 @@ class AddLoanReturnMenu(MenuBase):
 
     def _return_loan(self: Self, host: MenuHostBase):
         loan = self._loan[0] #type: ignore
+        returnDate = loan.ReturnDate
         loan.ReturnDate = self._returnDate
-        self._loanRepo.update_loan(loan) #type: ignore
+        #Возврат проходит через очередь записи (если она включена) и фиксируется вместе с возвратами с других мест выдачи
+        try:
+            self._loanRepo.submit_loan_update(loan).result(timeout=self.write_timeout) #type: ignore
+        except TimeoutError:
+            host.message(f'Возврат книги не был зафиксирован за {self.write_timeout:g} с. Он может быть сохранён позже, проверьте список невозвращённых книг.')
+            return
+        except Exception as e:
+            loan.ReturnDate = returnDate
+            host.message(f'Не удалось зафиксировать возврат книги. Текст ошибки:\n{e}')
+            return
         host.pop()
\ No newline at end of file
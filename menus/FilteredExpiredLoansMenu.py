@@ -1,6 +1,5 @@
 from datetime import date
 from typing import Self
-import math
 
 from menus.common import loan_to_text
 
@@ -46,25 +45,22 @@ class FilteredExpiredLoansMenu(FindLoanMenu):
             return
         
         dataset = self._repo.get_expired_loans_at(self._at, predicate)
-        chunkSize = 100
 
         def escape_tsv_string(val: str) -> str:
             return val.replace('"', '""')
 
         with open(f'{filename}.tab', "w", encoding="utf-8") as report:
             print("BookName\tAuthor\tGenre\tPublicationYear\tClientName\tClientRegDate\tLoanStartDate\tLoanEndDate\tExpiredByDays", file=report)
-            chunkCount =  math.ceil(len(dataset) / chunkSize)
-            for chunkIndex in range(chunkCount):
-                for loan in dataset[chunkIndex*chunkSize:(chunkIndex+1)*chunkSize]:
-                    print(
-                        f'"{escape_tsv_string(loan[1].Name)}"\t'
-                        f'"{escape_tsv_string(loan[1].Author)}"\t'
-                        f'"{escape_tsv_string(loan[1].Genre)}"\t'
-                        f'{loan[1].PublicationYear}\t'
-                        f'"{escape_tsv_string(loan[2].Name)}"\t'
-                        f'{loan[2].RegistrationDate.isoformat()}\t'
-                        f'{loan[0].StartDate}\t'
-                        f'{loan[0].EndDate}\t'
-                        f'{loan[3]}',
-                        file=report
-                    )
\ No newline at end of file
+            for loan in dataset:
+                print(
+                    f'"{escape_tsv_string(loan[1].Name)}"\t'
+                    f'"{escape_tsv_string(loan[1].Author)}"\t'
+                    f'"{escape_tsv_string(loan[1].Genre)}"\t'
+                    f'{loan[1].PublicationYear}\t'
+                    f'"{escape_tsv_string(loan[2].Name)}"\t'
+                    f'{loan[2].RegistrationDate.isoformat()}\t'
+                    f'{loan[0].StartDate}\t'
+                    f'{loan[0].EndDate}\t'
+                    f'{loan[3]}',
+                    file=report
+                )
\ No newline at end of file
@@ -1,5 +1,4 @@
 from typing import Self, Protocol
-import math
 
 from components.loans.repository import LoanSearchPredicate, ILoanRepository
 
@@ -51,40 +50,37 @@ class FilteredLoansListMenu(FindLoanMenu):
             return
         
         dataset = self._repo.get_unreturned_loans(predicate)
-        chunkSize = 100
 
         #Т.к. размер данных в БД неизвестен, будем стримить генерируемый geojson прямо в файл, поэтому без отдельной библиотеки, просто форматированием строк.
         with open(f'{filename}.json', "w", encoding="utf-8") as report:
             first = True
             print('{"type": "FeatureCollection","features": [', file=report, end='')
-            chunkCount =  math.ceil(len(dataset) / chunkSize)
-            for chunkIndex in range(chunkCount):
-                for loan in dataset[chunkIndex*chunkSize:(chunkIndex+1)*chunkSize]:
-                    coords = self._geoprovider.address_to_coordinates(loan[2].Address)
+            for loan in dataset:
+                coords = self._geoprovider.address_to_coordinates(loan[2].Address)
 
-                    if coords is None:
-                        continue
+                if coords is None:
+                    continue
 
-                    if first:
-                        first = False
-                    else:
-                        print(',', file=report,end='')
+                if first:
+                    first = False
+                else:
+                    print(',', file=report,end='')
 
-                    print(
+                print(
+                    '{'
+                        '"type": "Feature",'
+                        '"geometry":'
                         '{'
-                            '"type": "Feature",'
-                            '"geometry":'
-                            '{'
-                                '"type": "Point",'
-                                f'"coordinates": [{coords[0]},{coords[1]}]'
-                            '},'
-                            '"properties":'
-                            '{'
-                                f'"book": "{book_to_text(loan[1])}",'
-                                f'"client": "{client_to_text(loan[2])}"'
-                            '}'
-                        '}',
-                        file=report,
-                        end=''
-                    )
+                            '"type": "Point",'
+                            f'"coordinates": [{coords[0]},{coords[1]}]'
+                        '},'
+                        '"properties":'
+                        '{'
+                            f'"book": "{book_to_text(loan[1])}",'
+                            f'"client": "{client_to_text(loan[2])}"'
+                        '}'
+                    '}',
+                    file=report,
+                    end=''
+                )
             print(']}', file=report, end='')
\ No newline at end of file
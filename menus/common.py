@@ -1,6 +1,7 @@
 from components.books.book import Book
 from components.clients.client import Client
 from components.loans.loan import Loan
+from components.loans.availability import AvailabilityInterval
 
 def book_to_text(book: Book) -> str:
     return f'{book.Name} ({book.Author}, {book.PublicationYear} г.) [{book.Genre}]'
@@ -12,4 +13,7 @@ def loan_to_text(loan: tuple[Loan, Book, Client]) -> str:
     res = f'{book_to_text(loan[1])} - {client_to_text(loan[2])} - c {loan[0].StartDate.isoformat()} по {loan[0].EndDate.isoformat()}'
     if loan[0].ReturnDate is not None:
         res += f" - Дата возврата {loan[0].ReturnDate.isoformat()}"
-    return res
\ No newline at end of file
+    return res
+
+def availability_to_text(interval: AvailabilityInterval) -> str:
+    return f'c {interval.Start.isoformat()} по {interval.End.isoformat()} - {"свободна" if interval.Free else "выдана"}'
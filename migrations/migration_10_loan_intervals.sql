@@ -0,0 +1,54 @@
+/*
+    Создать R*Tree-индекс интервалов взятий для запросов "на дату" и "за период", поддерживаемый триггерами.
+    Интервал взятия -- дни с даты выдачи по дату возврата включительно (номера дней по julianday),
+    у невозвращённого взятия конец интервала -- максимальное значение (2147483647).
+    Второе измерение -- ID книги (интервал из одной точки), чтобы искать взятия отдельной книги.
+*/
+
+BEGIN TRANSACTION;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS LoanInterval USING rtree_i32(
+    LoanID,
+    MinDay, MaxDay,
+    MinBook, MaxBook
+);
+
+CREATE TRIGGER IF NOT EXISTS TRG_LoanInterval_Insert
+AFTER INSERT ON Loan
+BEGIN
+    INSERT INTO LoanInterval (LoanID, MinDay, MaxDay, MinBook, MaxBook) VALUES (
+        NEW.ID,
+        CAST(julianday(NEW.StartDate) AS INTEGER),
+        CASE WHEN NEW.ReturnDate IS NULL THEN 2147483647 ELSE CAST(julianday(NEW.ReturnDate) AS INTEGER) END,
+        NEW.BookID, NEW.BookID
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_LoanInterval_Update
+AFTER UPDATE OF ID, BookID, StartDate, ReturnDate ON Loan
+BEGIN
+    DELETE FROM LoanInterval WHERE LoanID = OLD.ID;
+    INSERT INTO LoanInterval (LoanID, MinDay, MaxDay, MinBook, MaxBook) VALUES (
+        NEW.ID,
+        CAST(julianday(NEW.StartDate) AS INTEGER),
+        CASE WHEN NEW.ReturnDate IS NULL THEN 2147483647 ELSE CAST(julianday(NEW.ReturnDate) AS INTEGER) END,
+        NEW.BookID, NEW.BookID
+    );
+END;
+
+-- Срабатывает и при каскадном удалении взятий вместе с книгой или читателем
+CREATE TRIGGER IF NOT EXISTS TRG_LoanInterval_Delete
+AFTER DELETE ON Loan
+BEGIN
+    DELETE FROM LoanInterval WHERE LoanID = OLD.ID;
+END;
+
+INSERT INTO LoanInterval (LoanID, MinDay, MaxDay, MinBook, MaxBook)
+SELECT
+    ID,
+    CAST(julianday(StartDate) AS INTEGER),
+    CASE WHEN ReturnDate IS NULL THEN 2147483647 ELSE CAST(julianday(ReturnDate) AS INTEGER) END,
+    BookID, BookID
+FROM Loan;
+
+END TRANSACTION;
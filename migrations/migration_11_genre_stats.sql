@@ -0,0 +1,75 @@
+/*
+    Создать таблицу популярности жанров, поддерживаемую триггерами.
+    Популярные жанры читаются из неё постранично по индексу, без соединения всех книг со всеми взятиями.
+*/
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS GenreStats (
+    Genre TEXT PRIMARY KEY COLLATE NOCASE, -- Сравнение без регистра, как у Book.Genre
+    Score INTEGER NOT NULL, -- Количество взятий книг жанра
+    BookCount INTEGER NOT NULL -- Количество книг жанра, строка удаляется вместе с последней книгой
+);
+
+CREATE INDEX IDX_GenreStats_Score ON GenreStats(Score DESC, Genre ASC);
+
+CREATE TRIGGER IF NOT EXISTS TRG_GenreStats_BookInsert
+AFTER INSERT ON Book
+BEGIN
+    INSERT INTO GenreStats (Genre, Score, BookCount) VALUES (NEW.Genre, 0, 1)
+    ON CONFLICT(Genre) DO UPDATE SET BookCount = BookCount + 1;
+END;
+
+-- Взятия книги переносятся в новый жанр вместе с ней
+CREATE TRIGGER IF NOT EXISTS TRG_GenreStats_BookUpdate
+AFTER UPDATE OF Genre ON Book
+WHEN NEW.Genre <> OLD.Genre
+BEGIN
+    UPDATE GenreStats SET
+        Score = Score - (SELECT COUNT(*) FROM Loan WHERE Loan.BookID = OLD.ID),
+        BookCount = BookCount - 1
+    WHERE Genre = OLD.Genre;
+    DELETE FROM GenreStats WHERE Genre = OLD.Genre AND BookCount = 0;
+    INSERT INTO GenreStats (Genre, Score, BookCount) VALUES (NEW.Genre, (SELECT COUNT(*) FROM Loan WHERE Loan.BookID = NEW.ID), 1)
+    ON CONFLICT(Genre) DO UPDATE SET Score = Score + excluded.Score, BookCount = BookCount + 1;
+END;
+
+-- BEFORE, потому что при каскадном удалении взятий книги уже нет и их жанр не найти
+CREATE TRIGGER IF NOT EXISTS TRG_GenreStats_BookDelete
+BEFORE DELETE ON Book
+BEGIN
+    UPDATE GenreStats SET
+        Score = Score - (SELECT COUNT(*) FROM Loan WHERE Loan.BookID = OLD.ID),
+        BookCount = BookCount - 1
+    WHERE Genre = OLD.Genre;
+    DELETE FROM GenreStats WHERE Genre = OLD.Genre AND BookCount = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_GenreStats_LoanInsert
+AFTER INSERT ON Loan
+BEGIN
+    UPDATE GenreStats SET Score = Score + 1 WHERE Genre = (SELECT Genre FROM Book WHERE ID = NEW.BookID);
+END;
+
+-- При каскадном изменении ID книги старой книги уже нет, а жанр взятия не меняется
+CREATE TRIGGER IF NOT EXISTS TRG_GenreStats_LoanUpdate
+AFTER UPDATE OF BookID ON Loan
+WHEN OLD.BookID <> NEW.BookID AND EXISTS (SELECT 1 FROM Book WHERE ID = OLD.BookID)
+BEGIN
+    UPDATE GenreStats SET Score = Score - 1 WHERE Genre = (SELECT Genre FROM Book WHERE ID = OLD.BookID);
+    UPDATE GenreStats SET Score = Score + 1 WHERE Genre = (SELECT Genre FROM Book WHERE ID = NEW.BookID);
+END;
+
+-- При каскадном удалении вместе с книгой книги уже нет: её взятия вычтены в TRG_GenreStats_BookDelete
+CREATE TRIGGER IF NOT EXISTS TRG_GenreStats_LoanDelete
+AFTER DELETE ON Loan
+BEGIN
+    UPDATE GenreStats SET Score = Score - 1 WHERE Genre = (SELECT Genre FROM Book WHERE ID = OLD.BookID);
+END;
+
+INSERT INTO GenreStats (Genre, Score, BookCount)
+SELECT Book.Genre, COUNT(Loan.ID), COUNT(DISTINCT Book.ID) FROM
+Book LEFT JOIN Loan ON Book.ID = Loan.BookID
+GROUP BY Book.Genre;
+
+END TRANSACTION;
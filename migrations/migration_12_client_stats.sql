@@ -0,0 +1,74 @@
+/*
+    Создать таблицу статистики читателей, поддерживаемую триггерами:
+    общее число взятий, число книг на руках и дата последнего посещения.
+    Отчёты по читателям читают её по ключу, не агрегируя всю историю взятий.
+*/
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS ClientStats (
+    ClientID INTEGER PRIMARY KEY,
+    Name TEXT NOT NULL COLLATE NOCASE, -- Копия Client.Name для сортировки читателей с книгами на руках
+    TotalLoans INTEGER NOT NULL, -- Количество взятий за всё время
+    OpenLoans INTEGER NOT NULL, -- Количество невозвращённых взятий
+    LastVisitDate TEXT, -- Последняя дата выдачи или возврата книги, NULL если взятий не было
+
+    FOREIGN KEY(ClientID) REFERENCES Client(ID) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Читатели с книгами на руках (обычно их намного меньше, чем всех читателей) в порядке отчёта
+CREATE INDEX IDX_ClientStats_Open ON ClientStats(Name, ClientID) WHERE OpenLoans > 0;
+
+CREATE TRIGGER IF NOT EXISTS TRG_ClientStats_ClientInsert
+AFTER INSERT ON Client
+BEGIN
+    INSERT INTO ClientStats (ClientID, Name, TotalLoans, OpenLoans, LastVisitDate) VALUES (NEW.ID, NEW.Name, 0, 0, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_ClientStats_ClientUpdate
+AFTER UPDATE OF Name ON Client
+BEGIN
+    UPDATE ClientStats SET Name = NEW.Name WHERE ClientID = NEW.ID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_ClientStats_LoanInsert
+AFTER INSERT ON Loan
+BEGIN
+    UPDATE ClientStats SET
+        TotalLoans = TotalLoans + 1,
+        OpenLoans = OpenLoans + (NEW.ReturnDate IS NULL),
+        LastVisitDate = CASE
+            WHEN LastVisitDate IS NULL OR LastVisitDate < COALESCE(NEW.ReturnDate, NEW.StartDate) THEN COALESCE(NEW.ReturnDate, NEW.StartDate)
+            ELSE LastVisitDate
+        END
+    WHERE ClientID = NEW.ClientID;
+END;
+
+-- Изменение взятия (в том числе возврат книги) пересчитывает статистику затронутых читателей по индексу IDX_Loan_ClientID
+CREATE TRIGGER IF NOT EXISTS TRG_ClientStats_LoanUpdate
+AFTER UPDATE OF ClientID, StartDate, ReturnDate ON Loan
+BEGIN
+    UPDATE ClientStats SET
+        TotalLoans = (SELECT COUNT(*) FROM Loan WHERE Loan.ClientID = ClientStats.ClientID),
+        OpenLoans = (SELECT COUNT(*) FROM Loan WHERE Loan.ClientID = ClientStats.ClientID AND Loan.ReturnDate IS NULL),
+        LastVisitDate = (SELECT MAX(COALESCE(Loan.ReturnDate, Loan.StartDate)) FROM Loan WHERE Loan.ClientID = ClientStats.ClientID)
+    WHERE ClientID IN (OLD.ClientID, NEW.ClientID);
+END;
+
+-- Срабатывает и при каскадном удалении взятий вместе с книгой
+CREATE TRIGGER IF NOT EXISTS TRG_ClientStats_LoanDelete
+AFTER DELETE ON Loan
+BEGIN
+    UPDATE ClientStats SET
+        TotalLoans = TotalLoans - 1,
+        OpenLoans = OpenLoans - (OLD.ReturnDate IS NULL),
+        LastVisitDate = (SELECT MAX(COALESCE(Loan.ReturnDate, Loan.StartDate)) FROM Loan WHERE Loan.ClientID = ClientStats.ClientID)
+    WHERE ClientID = OLD.ClientID;
+END;
+
+INSERT INTO ClientStats (ClientID, Name, TotalLoans, OpenLoans, LastVisitDate)
+SELECT Client.ID, Client.Name, COUNT(Loan.ID), COUNT(Loan.ID) - COUNT(Loan.ReturnDate), MAX(COALESCE(Loan.ReturnDate, Loan.StartDate)) FROM
+Client LEFT JOIN Loan ON Loan.ClientID = Client.ID
+GROUP BY Client.ID;
+
+END TRANSACTION;
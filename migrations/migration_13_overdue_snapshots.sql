@@ -0,0 +1,68 @@
+/*
+    Ускорить отчёт о просроченных книгах:
+    частичный индекс по сроку возврата для взятий, которые могут оказаться просроченными,
+    и снимки отчёта на выбранные даты (их создаёт ночная задача tools/snapshot_overdue.py).
+    Снимки поддерживаются триггерами, поэтому всегда совпадают с отчётом, построенным по Loan.
+*/
+
+BEGIN TRANSACTION;
+
+-- Условие совпадает с условием отчёта, чтобы SQLite мог использовать частичный индекс
+CREATE INDEX IDX_Loan_Overdue ON Loan(EndDate) WHERE ReturnDate IS NULL OR ReturnDate > EndDate;
+
+CREATE TABLE IF NOT EXISTS OverdueSnapshot (
+    SnapshotDate TEXT PRIMARY KEY, -- Дата, на которую построен отчёт
+    CreatedAt TEXT NOT NULL -- Момент создания снимка
+);
+
+-- Взятия, просроченные на дату снимка, в порядке отчёта (название книги, ID взятия)
+CREATE TABLE IF NOT EXISTS OverdueSnapshotLoan (
+    SnapshotDate TEXT NOT NULL,
+    BookName TEXT NOT NULL, -- Копия Book.Name для сортировки
+    LoanID INTEGER NOT NULL,
+
+    PRIMARY KEY(SnapshotDate, BookName, LoanID),
+    FOREIGN KEY(SnapshotDate) REFERENCES OverdueSnapshot(SnapshotDate) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IDX_OverdueSnapshotLoan_LoanID ON OverdueSnapshotLoan(LoanID);
+
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_Delete
+AFTER DELETE ON OverdueSnapshot
+BEGIN
+    DELETE FROM OverdueSnapshotLoan WHERE SnapshotDate = OLD.SnapshotDate;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_LoanInsert
+AFTER INSERT ON Loan
+WHEN NEW.ReturnDate IS NULL OR NEW.ReturnDate > NEW.EndDate
+BEGIN
+    INSERT INTO OverdueSnapshotLoan (SnapshotDate, BookName, LoanID)
+    SELECT OverdueSnapshot.SnapshotDate, Book.Name, NEW.ID FROM OverdueSnapshot, Book
+    WHERE Book.ID = NEW.BookID AND OverdueSnapshot.SnapshotDate > NEW.EndDate;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_LoanUpdate
+AFTER UPDATE OF ID, BookID, EndDate, ReturnDate ON Loan
+BEGIN
+    DELETE FROM OverdueSnapshotLoan WHERE LoanID = OLD.ID;
+    INSERT INTO OverdueSnapshotLoan (SnapshotDate, BookName, LoanID)
+    SELECT OverdueSnapshot.SnapshotDate, Book.Name, NEW.ID FROM OverdueSnapshot, Book
+    WHERE Book.ID = NEW.BookID AND OverdueSnapshot.SnapshotDate > NEW.EndDate
+    AND (NEW.ReturnDate IS NULL OR NEW.ReturnDate > NEW.EndDate);
+END;
+
+-- Срабатывает и при каскадном удалении взятий вместе с книгой или читателем
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_LoanDelete
+AFTER DELETE ON Loan
+BEGIN
+    DELETE FROM OverdueSnapshotLoan WHERE LoanID = OLD.ID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_BookUpdate
+AFTER UPDATE OF Name ON Book
+BEGIN
+    UPDATE OverdueSnapshotLoan SET BookName = NEW.Name WHERE LoanID IN (SELECT ID FROM Loan WHERE Loan.BookID = NEW.ID);
+END;
+
+END TRANSACTION;
@@ -0,0 +1,45 @@
+/*
+    Удалить индексы по столбцам с приведённым регистром: поиск подстроки (LIKE '%...%') не может их использовать,
+    а поддерживать их приходится при каждой записи.
+    Поиск по имени читателя, как и поиск книг, сужается полнотекстовым индексом (FTS5, триграммы)
+    по столбцу с приведённым регистром.
+    Требует SQLite 3.34 или новее (токенизатор trigram).
+*/
+
+BEGIN TRANSACTION;
+
+DROP INDEX IF EXISTS IDX_Book_NameFolded;
+DROP INDEX IF EXISTS IDX_Book_AuthorFolded;
+DROP INDEX IF EXISTS IDX_Book_GenreFolded;
+DROP INDEX IF EXISTS IDX_Client_NameFolded;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ClientSearch USING fts5(
+    NameFolded,
+    content='Client',
+    content_rowid='ID',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS TRG_ClientSearch_Insert
+AFTER INSERT ON Client
+BEGIN
+    INSERT INTO ClientSearch(rowid, NameFolded) VALUES (NEW.ID, NEW.NameFolded);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_ClientSearch_Delete
+AFTER DELETE ON Client
+BEGIN
+    INSERT INTO ClientSearch(ClientSearch, rowid, NameFolded) VALUES ('delete', OLD.ID, OLD.NameFolded);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_ClientSearch_Update
+AFTER UPDATE OF ID, NameFolded ON Client
+BEGIN
+    INSERT INTO ClientSearch(ClientSearch, rowid, NameFolded) VALUES ('delete', OLD.ID, OLD.NameFolded);
+    INSERT INTO ClientSearch(rowid, NameFolded) VALUES (NEW.ID, NEW.NameFolded);
+END;
+
+-- Заполнить индекс уже существующими читателями (читатели с незаполненным NameFolded попадут в него при заполнении)
+INSERT INTO ClientSearch(ClientSearch) VALUES ('rebuild');
+
+END TRANSACTION;
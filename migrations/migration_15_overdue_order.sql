@@ -0,0 +1,68 @@
+/*
+    Упорядочить отчёт о просроченных книгах по сроку возврата (EndDate, ID взятия) вместо названия книги:
+    страница отчёта от ключа читается по частичному индексу IDX_Loan_Overdue, а не обходом всех книг по названию.
+    Снимки отчёта хранят срок возврата вместо названия книги, поэтому переименование книги их больше не затрагивает.
+*/
+
+BEGIN TRANSACTION;
+
+DROP TRIGGER IF EXISTS TRG_OverdueSnapshot_LoanInsert;
+DROP TRIGGER IF EXISTS TRG_OverdueSnapshot_LoanUpdate;
+DROP TRIGGER IF EXISTS TRG_OverdueSnapshot_LoanDelete;
+DROP TRIGGER IF EXISTS TRG_OverdueSnapshot_BookUpdate;
+DROP TRIGGER IF EXISTS TRG_OverdueSnapshot_Delete;
+
+ALTER TABLE OverdueSnapshotLoan RENAME TO OverdueSnapshotLoan_Old;
+DROP INDEX IF EXISTS IDX_OverdueSnapshotLoan_LoanID;
+
+-- Взятия, просроченные на дату снимка, в порядке отчёта (срок возврата, ID взятия)
+CREATE TABLE OverdueSnapshotLoan (
+    SnapshotDate TEXT NOT NULL,
+    EndDate TEXT NOT NULL, -- Копия Loan.EndDate для сортировки
+    LoanID INTEGER NOT NULL,
+
+    PRIMARY KEY(SnapshotDate, EndDate, LoanID),
+    FOREIGN KEY(SnapshotDate) REFERENCES OverdueSnapshot(SnapshotDate) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+INSERT INTO OverdueSnapshotLoan (SnapshotDate, EndDate, LoanID)
+SELECT OverdueSnapshotLoan_Old.SnapshotDate, Loan.EndDate, Loan.ID
+FROM OverdueSnapshotLoan_Old INNER JOIN Loan ON Loan.ID = OverdueSnapshotLoan_Old.LoanID;
+
+DROP TABLE OverdueSnapshotLoan_Old;
+
+CREATE INDEX IDX_OverdueSnapshotLoan_LoanID ON OverdueSnapshotLoan(LoanID);
+
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_Delete
+AFTER DELETE ON OverdueSnapshot
+BEGIN
+    DELETE FROM OverdueSnapshotLoan WHERE SnapshotDate = OLD.SnapshotDate;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_LoanInsert
+AFTER INSERT ON Loan
+WHEN NEW.ReturnDate IS NULL OR NEW.ReturnDate > NEW.EndDate
+BEGIN
+    INSERT INTO OverdueSnapshotLoan (SnapshotDate, EndDate, LoanID)
+    SELECT OverdueSnapshot.SnapshotDate, NEW.EndDate, NEW.ID FROM OverdueSnapshot
+    WHERE OverdueSnapshot.SnapshotDate > NEW.EndDate;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_LoanUpdate
+AFTER UPDATE OF ID, EndDate, ReturnDate ON Loan
+BEGIN
+    DELETE FROM OverdueSnapshotLoan WHERE LoanID = OLD.ID;
+    INSERT INTO OverdueSnapshotLoan (SnapshotDate, EndDate, LoanID)
+    SELECT OverdueSnapshot.SnapshotDate, NEW.EndDate, NEW.ID FROM OverdueSnapshot
+    WHERE OverdueSnapshot.SnapshotDate > NEW.EndDate
+    AND (NEW.ReturnDate IS NULL OR NEW.ReturnDate > NEW.EndDate);
+END;
+
+-- Срабатывает и при каскадном удалении взятий вместе с книгой или читателем
+CREATE TRIGGER IF NOT EXISTS TRG_OverdueSnapshot_LoanDelete
+AFTER DELETE ON Loan
+BEGIN
+    DELETE FROM OverdueSnapshotLoan WHERE LoanID = OLD.ID;
+END;
+
+END TRANSACTION;
@@ -0,0 +1,44 @@
+/*
+    Индексы в порядке сортировки списков взятий, чтобы страницы читались по индексу без сортировки:
+    история книги упорядочена по (StartDate, ID), список невозвращённых взятий - по (название книги, ID взятия).
+    Название книги копируется в таблицу невозвращённых взятий CurrentLoan и поддерживается триггерами.
+*/
+
+BEGIN TRANSACTION;
+
+-- ID после даты выдачи: взятия книги идут в порядке истории (ReturnDate остаётся в индексе для проверок доступности)
+DROP INDEX IF EXISTS IDX_Loan_BookID;
+CREATE INDEX IDX_Loan_BookID ON Loan(BookID, StartDate, ID, ReturnDate);
+
+ALTER TABLE CurrentLoan ADD COLUMN BookName TEXT NOT NULL DEFAULT ''; -- Копия Book.Name для сортировки
+
+UPDATE CurrentLoan SET BookName = (SELECT Book.Name FROM Book WHERE Book.ID = CurrentLoan.BookID);
+
+CREATE INDEX IDX_CurrentLoan_BookName ON CurrentLoan(BookName, LoanID);
+
+DROP TRIGGER IF EXISTS TRG_CurrentLoan_Insert;
+DROP TRIGGER IF EXISTS TRG_CurrentLoan_Update;
+
+CREATE TRIGGER IF NOT EXISTS TRG_CurrentLoan_Insert
+AFTER INSERT ON Loan
+WHEN NEW.ReturnDate IS NULL
+BEGIN
+    INSERT INTO CurrentLoan (LoanID, BookID, StartDate, BookName)
+    SELECT NEW.ID, NEW.BookID, NEW.StartDate, Book.Name FROM Book WHERE Book.ID = NEW.BookID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_CurrentLoan_Update
+AFTER UPDATE OF ID, BookID, StartDate, ReturnDate ON Loan
+BEGIN
+    DELETE FROM CurrentLoan WHERE LoanID = OLD.ID;
+    INSERT INTO CurrentLoan (LoanID, BookID, StartDate, BookName)
+    SELECT NEW.ID, NEW.BookID, NEW.StartDate, Book.Name FROM Book WHERE Book.ID = NEW.BookID AND NEW.ReturnDate IS NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_CurrentLoan_BookUpdate
+AFTER UPDATE OF Name ON Book
+BEGIN
+    UPDATE CurrentLoan SET BookName = NEW.Name WHERE BookID = NEW.ID;
+END;
+
+END TRANSACTION;
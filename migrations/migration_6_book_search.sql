@@ -0,0 +1,41 @@
+/*
+    Создать полнотекстовый индекс (FTS5, триграммы) по названию, автору и жанру книг.
+    Индекс хранит только триграммы, сами значения читаются из таблицы Book (external content),
+    и поддерживается в актуальном состоянии триггерами.
+    Требует SQLite 3.34 или новее (токенизатор trigram).
+*/
+
+BEGIN TRANSACTION;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS BookSearch USING fts5(
+    Name,
+    Author,
+    Genre,
+    content='Book',
+    content_rowid='ID',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS TRG_BookSearch_Insert
+AFTER INSERT ON Book
+BEGIN
+    INSERT INTO BookSearch(rowid, Name, Author, Genre) VALUES (NEW.ID, NEW.Name, NEW.Author, NEW.Genre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_BookSearch_Delete
+AFTER DELETE ON Book
+BEGIN
+    INSERT INTO BookSearch(BookSearch, rowid, Name, Author, Genre) VALUES ('delete', OLD.ID, OLD.Name, OLD.Author, OLD.Genre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_BookSearch_Update
+AFTER UPDATE ON Book
+BEGIN
+    INSERT INTO BookSearch(BookSearch, rowid, Name, Author, Genre) VALUES ('delete', OLD.ID, OLD.Name, OLD.Author, OLD.Genre);
+    INSERT INTO BookSearch(rowid, Name, Author, Genre) VALUES (NEW.ID, NEW.Name, NEW.Author, NEW.Genre);
+END;
+
+-- Заполнить индекс уже существующими книгами
+INSERT INTO BookSearch(BookSearch) VALUES ('rebuild');
+
+END TRANSACTION;
@@ -0,0 +1,62 @@
+/*
+    Добавить столбцы со значениями, приведёнными к единому регистру (str.casefold),
+    для поиска без учёта регистра по кириллице: LIKE и COLLATE NOCASE в SQLite учитывают регистр только для ASCII.
+    Значения вычисляются приложением: репозитории заполняют их при записи,
+    а существующие строки заполняются при запуске приложения (fill_folded_columns в репозиториях книг и читателей).
+*/
+
+BEGIN TRANSACTION;
+
+ALTER TABLE Book ADD COLUMN NameFolded TEXT;
+ALTER TABLE Book ADD COLUMN AuthorFolded TEXT;
+ALTER TABLE Book ADD COLUMN GenreFolded TEXT;
+
+ALTER TABLE Client ADD COLUMN NameFolded TEXT;
+
+CREATE INDEX IDX_Book_NameFolded ON Book(NameFolded);
+CREATE INDEX IDX_Book_AuthorFolded ON Book(AuthorFolded);
+CREATE INDEX IDX_Book_GenreFolded ON Book(GenreFolded);
+
+CREATE INDEX IDX_Client_NameFolded ON Client(NameFolded);
+
+/*
+    Полнотекстовый индекс книг перестраивается по столбцам с приведённым регистром,
+    чтобы он находил все книги, которые находит сравнение по этим столбцам
+*/
+DROP TRIGGER TRG_BookSearch_Insert;
+DROP TRIGGER TRG_BookSearch_Delete;
+DROP TRIGGER TRG_BookSearch_Update;
+DROP TABLE BookSearch;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS BookSearch USING fts5(
+    NameFolded,
+    AuthorFolded,
+    GenreFolded,
+    content='Book',
+    content_rowid='ID',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS TRG_BookSearch_Insert
+AFTER INSERT ON Book
+BEGIN
+    INSERT INTO BookSearch(rowid, NameFolded, AuthorFolded, GenreFolded) VALUES (NEW.ID, NEW.NameFolded, NEW.AuthorFolded, NEW.GenreFolded);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_BookSearch_Delete
+AFTER DELETE ON Book
+BEGIN
+    INSERT INTO BookSearch(BookSearch, rowid, NameFolded, AuthorFolded, GenreFolded) VALUES ('delete', OLD.ID, OLD.NameFolded, OLD.AuthorFolded, OLD.GenreFolded);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_BookSearch_Update
+AFTER UPDATE ON Book
+BEGIN
+    INSERT INTO BookSearch(BookSearch, rowid, NameFolded, AuthorFolded, GenreFolded) VALUES ('delete', OLD.ID, OLD.NameFolded, OLD.AuthorFolded, OLD.GenreFolded);
+    INSERT INTO BookSearch(rowid, NameFolded, AuthorFolded, GenreFolded) VALUES (NEW.ID, NEW.NameFolded, NEW.AuthorFolded, NEW.GenreFolded);
+END;
+
+-- Столбцы ещё не заполнены, индекс наполнится через триггер обновления при их заполнении
+INSERT INTO BookSearch(BookSearch) VALUES ('rebuild');
+
+END TRANSACTION;
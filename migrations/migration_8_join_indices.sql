@@ -0,0 +1,23 @@
+/*
+    Создать индексы по ключам соединений и сортировки, используемым репозиториями
+*/
+
+BEGIN TRANSACTION;
+
+-- Взятия книги: соединения с Book, поиск невыданных книг на дату, триггеры TRG_LoanOnce_*, история книги
+CREATE INDEX IDX_Loan_BookID ON Loan(BookID, StartDate, ReturnDate);
+
+-- Взятия читателя: соединения с Client и статистика по читателям (число взятий, дата последнего посещения)
+CREATE INDEX IDX_Loan_ClientID ON Loan(ClientID, StartDate, ReturnDate);
+
+-- Невозвращённые взятия (обычно их намного меньше, чем всех взятий)
+CREATE INDEX IDX_Loan_BookID_Unreturned ON Loan(BookID) WHERE ReturnDate IS NULL;
+
+-- Сортировка списков книг и читателей по имени (ID - уникальный ключ для постраничного вывода)
+CREATE INDEX IDX_Book_Name ON Book(Name, ID);
+CREATE INDEX IDX_Client_Name ON Client(Name, ID);
+
+-- Группировка статистики популярности жанров
+CREATE INDEX IDX_Book_Genre ON Book(Genre);
+
+END TRANSACTION;
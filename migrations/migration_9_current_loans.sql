@@ -0,0 +1,42 @@
+/*
+    Создать таблицу невозвращённых взятий, поддерживаемую триггерами.
+    По ней доступность книг на текущую дату проверяется поиском по ключу, без обхода всех взятий.
+*/
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS CurrentLoan (
+    LoanID INTEGER PRIMARY KEY, -- ID невозвращённого взятия
+    BookID INTEGER NOT NULL,
+    StartDate TEXT NOT NULL, -- Дата выдачи книги (копия Loan.StartDate)
+
+    FOREIGN KEY(LoanID) REFERENCES Loan(ID) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE INDEX IDX_CurrentLoan_BookID ON CurrentLoan(BookID, StartDate);
+
+CREATE TRIGGER IF NOT EXISTS TRG_CurrentLoan_Insert
+AFTER INSERT ON Loan
+WHEN NEW.ReturnDate IS NULL
+BEGIN
+    INSERT INTO CurrentLoan (LoanID, BookID, StartDate) VALUES (NEW.ID, NEW.BookID, NEW.StartDate);
+END;
+
+CREATE TRIGGER IF NOT EXISTS TRG_CurrentLoan_Update
+AFTER UPDATE OF ID, BookID, StartDate, ReturnDate ON Loan
+BEGIN
+    DELETE FROM CurrentLoan WHERE LoanID = OLD.ID;
+    INSERT INTO CurrentLoan (LoanID, BookID, StartDate) SELECT NEW.ID, NEW.BookID, NEW.StartDate WHERE NEW.ReturnDate IS NULL;
+END;
+
+-- Срабатывает и при каскадном удалении взятий вместе с книгой или читателем
+CREATE TRIGGER IF NOT EXISTS TRG_CurrentLoan_Delete
+AFTER DELETE ON Loan
+BEGIN
+    DELETE FROM CurrentLoan WHERE LoanID = OLD.ID;
+END;
+
+INSERT INTO CurrentLoan (LoanID, BookID, StartDate)
+SELECT ID, BookID, StartDate FROM Loan WHERE ReturnDate IS NULL;
+
+END TRANSACTION;
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterator, Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock, local
+from typing import Any, Self
+
+from modules.view import CachingView
+
+
+class AsyncExecutor[C]:
+    '''
+    Ограниченный пул потоков для выполнения блокирующих запросов к БД из asyncio.
+    Каждый поток пула открывает собственное подключение и создаёт для него контекст
+    (например, набор репозиториев), поэтому одновременно выполняется не больше max_workers запросов,
+    а медленный отчёт занимает только один поток и не задерживает цикл событий.
+    '''
+
+    def __init__(self, connection_factory: Callable[[], sqlite3.Connection], context_factory: Callable[[sqlite3.Connection], C],
+                 max_workers: int = 4) -> None:
+        '''
+        connection_factory : Callable[[], sqlite3.Connection] -- функция, открывающая подключение потока.
+                                                                Подключение должно допускать закрытие из другого потока
+                                                                (check_same_thread=False), чтобы его можно было закрыть в close.
+        context_factory : Callable[[sqlite3.Connection], C] -- функция, создающая контекст потока для его подключения.
+        max_workers : int -- число потоков (и подключений).
+        '''
+        self._connection_factory = connection_factory
+        self._context_factory = context_factory
+        self._local = local()
+        self._connections : list[sqlite3.Connection] = []
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='AsyncExecutor', initializer=self._init_thread)
+
+    async def run[T](self: Self, function: Callable[[C], T]) -> T:
+        '''Выполнить функцию в потоке пула, передав ей контекст потока'''
+        return await self.run_with_connection(lambda connection, context: function(context))
+
+    async def run_with_connection[T](self: Self, function: Callable[[sqlite3.Connection, C], T]) -> T:
+        '''Выполнить функцию в потоке пула, передав ей подключение и контекст потока'''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._call, function))
+
+    async def view[T](self: Self, function: Callable[[C], Sequence[T]]) -> AsyncView[T]:
+        '''Получить в потоке пула список (обычно view репозитория) и обернуть его в AsyncView'''
+        return AsyncView(self, await self.run(function))
+
+    def close(self: Self) -> None:
+        '''Дождаться выполнения начатых запросов, остановить потоки и закрыть их подключения'''
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+    async def __aenter__(self: Self) -> Self:
+        return self
+
+    async def __aexit__(self: Self, *args: Any) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def _init_thread(self: Self) -> None:
+        connection = self._connection_factory()
+        with self._lock:
+            self._connections.append(connection)
+        self._local.connection = connection
+        self._local.context = self._context_factory(connection)
+
+    def _call[T](self: Self, function: Callable[[sqlite3.Connection, C], T]) -> T:
+        return function(self._local.connection, self._local.context)
+
+
+class AsyncRepository[R]:
+    '''
+    Асинхронная обёртка репозитория: методы репозитория вызываются в потоке AsyncExecutor
+    через экземпляр репозитория, созданный для подключения этого потока.
+
+        books = AsyncRepository(executor, lambda context: context.books)
+        found = await books.view(lambda repo: repo.get_books(predicate))
+        page = await found.get_page(0, 10)
+    '''
+
+    def __init__(self, executor: AsyncExecutor[Any], select: Callable[[Any], R]) -> None:
+        '''
+        executor : AsyncExecutor[Any] -- пул потоков.
+        select : Callable[[Any], R] -- функция, выбирающая репозиторий из контекста потока.
+        '''
+        self._executor = executor
+        self._select = select
+
+    async def run[T](self: Self, method: Callable[[R], T]) -> T:
+        '''Вызвать метод репозитория (например, lambda repo: repo.add_book(book)) и вернуть результат'''
+        return await self._executor.run(lambda context: method(self._select(context)))
+
+    async def view[T](self: Self, method: Callable[[R], Sequence[T]]) -> AsyncView[T]:
+        '''Вызвать метод репозитория, возвращающий список, и получить асинхронную обёртку этого списка'''
+        return await self._executor.view(lambda context: method(self._select(context)))
+
+
+class AsyncView[T]:
+    '''
+    Асинхронная обёртка списка, возвращённого репозиторием.
+    Запросы CachingView выполняются в любом свободном потоке AsyncExecutor через подключение этого потока
+    (как при предзагрузке страниц), а результаты попадают в кеш view. Прочие списки уже загружены в память.
+    '''
+    iter_batch_size : int = 100
+    '''Число записей, загружаемых за раз при асинхронном обходе'''
+
+    def __init__(self, executor: AsyncExecutor[Any], items: Sequence[T]) -> None:
+        self._executor = executor
+        self._items = items
+
+    @property
+    def items(self: Self) -> Sequence[T]:
+        '''Обёрнутый список (его синхронные методы можно вызывать только из потока, в котором он был создан)'''
+        return self._items
+
+    async def len(self: Self) -> int:
+        '''Число записей'''
+        items = self._items
+        if not isinstance(items, CachingView):
+            return len(items)
+        return await self._executor.run_with_connection(lambda connection, _: items.prefetch_len(connection))
+
+    async def get_page(self: Self, index: int, size: int) -> Sequence[T]:
+        '''
+        Получить страницу записей.
+
+        index: int -- номер страницы (с нуля).
+        size: int -- число записей на странице.
+        '''
+        items = self._items
+        if not isinstance(items, CachingView):
+            return items[index * size:(index + 1) * size]
+        return await self._executor.run_with_connection(lambda connection, _: items.prefetch_page(index, size, connection))
+
+    async def __aiter__(self: Self) -> AsyncIterator[T]:
+        '''Обойти все записи, загружая их страницами по iter_batch_size'''
+        index = 0
+        while True:
+            page = await self.get_page(index, self.iter_batch_size)
+            for item in page:
+                yield item
+            if len(page) < self.iter_batch_size:
+                return
+            index += 1
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Callable, Iterable
+from typing import Any, Protocol
+
+
+class _HasID(Protocol):
+    ID : int | None
+
+
+def insert_many[T: _HasID](connection: sqlite3.Connection, table: str, items: Iterable[T], query: str, to_params: Callable[[T], dict[str, Any]]) -> list[T]:
+    '''
+    Вставить записи в таблицу одним запросом executemany.
+    Если транзакция ещё не начата, то она начинается с BEGIN IMMEDIATE; фиксирует её вызывающий код.
+    Записям без ID присваиваются ID, следующие за наибольшим ID в таблице и среди переданных записей
+    (так же, как их присвоил бы SQLite для INTEGER PRIMARY KEY без AUTOINCREMENT).
+    Если вставка не удалась, присвоенные ID сбрасываются обратно в None и ошибка поднимается дальше.
+
+    Аргументы:
+    connection : sqlite3.Connection -- подключение к БД.
+    table : str -- таблица, в которую вставляются записи (по ней определяется следующий ID).
+    items : Iterable[T] -- вставляемые записи.
+    query : str -- запрос INSERT с явно указанным ID (параметр :id).
+    to_params : Callable[[T], dict[str, Any]] -- параметры запроса для записи (без ID).
+
+    Возвращает список вставленных записей.
+    '''
+    items = list(items)
+    assigned : list[T] = []
+    try:
+        #Блокировка записи берётся сразу, чтобы другое подключение не заняло вычисленные ID
+        if not connection.in_transaction:
+            connection.execute("BEGIN IMMEDIATE;")
+        cur = connection.execute(f"SELECT COALESCE(MAX(ID), 0) FROM {table};")
+        cur.row_factory = None
+        next_id = max([cur.fetchone()[0], *(item.ID for item in items if item.ID is not None)]) + 1
+        for item in items:
+            if item.ID is None:
+                item.ID = next_id
+                next_id += 1
+                assigned.append(item)
+        connection.executemany(query, ({ **to_params(item), "id": item.ID } for item in items))
+    except:
+        for item in assigned:
+            item.ID = None
+        raise
+    return items
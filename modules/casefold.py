@@ -0,0 +1,31 @@
+import sqlite3
+
+LIKE_ESCAPE = "\\"
+'''Символ экранирования шаблонов из contains_pattern (для LIKE ... ESCAPE)'''
+
+def fold(value: str) -> str:
+    '''Привести строку к единому регистру для поиска без учёта регистра (в том числе по кириллице).'''
+    return value.casefold()
+
+def contains_pattern(value: str) -> str:
+    '''
+    Шаблон LIKE для поиска подстроки value в столбце со значениями, приведёнными через fold.
+    Символы шаблонов % и _ в value экранируются и ищутся буквально.
+    '''
+    escaped = fold(value).replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", f"{LIKE_ESCAPE}%").replace("_", f"{LIKE_ESCAPE}_")
+    return f"%{escaped}%"
+
+def register_casefold(connection: sqlite3.Connection) -> None:
+    '''Зарегистрировать в подключении SQL-функцию casefold(value), аналогичную fold.'''
+    connection.create_function("casefold", 1, lambda value: fold(value) if isinstance(value, str) else value, deterministic=True)
+
+def fts_phrase(column: str, value: str) -> str | None:
+    '''
+    Фраза запроса FTS5, находящая строки, у которых столбец {column}Folded содержит подстроку value без учёта регистра
+    (для триграммных индексов по столбцам с приведённым регистром, например BookSearch и ClientSearch).
+    Возвращает None, если индекс не поможет: триграммный индекс не ищет подстроки короче трёх символов.
+    '''
+    folded = fold(value)
+    if len(folded) < 3:
+        return None
+    return f'{column}Folded : "{folded.replace('"', '""')}"'
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class ConnectionProfile:
+    '''
+    Настройки подключения к БД под определённый характер нагрузки.
+    Все профили переводят БД в режим WAL: читатели не блокируют писателя и наоборот,
+    поэтому фоновые подключения (подгрузка страниц, отчёты, ночные задачи) не мешают работе с меню.
+    '''
+    synchronous : str
+    '''Уровень PRAGMA synchronous (в режиме WAL уровень NORMAL не повреждает БД при сбое, но может потерять последние транзакции при отключении питания)'''
+    cache_size_kib : int
+    '''Размер кеша страниц в КиБ'''
+    mmap_size : int
+    '''Объём файла БД в байтах, читаемый через отображение в память (0 - не использовать)'''
+    temp_store : str
+    '''Где хранить временные таблицы и индексы (для сортировок и DISTINCT): MEMORY, FILE или DEFAULT'''
+    busy_timeout : float
+    '''Сколько секунд ждать снятия блокировки другим подключением, прежде чем поднять ошибку "database is locked"'''
+    cached_statements : int
+    '''Размер кеша подготовленных запросов модуля sqlite3'''
+
+
+PROFILES : dict[str, ConnectionProfile] = {
+    #Рабочее место библиотекаря: короткие транзакции и постраничные отчёты
+    "desk": ConnectionProfile(
+        synchronous="NORMAL",
+        cache_size_kib=16 * 1024,
+        mmap_size=64 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout=5.0,
+        cached_statements=256
+    ),
+    #Отчёты и ночные задачи: длинные чтения по всей БД
+    "reporting": ConnectionProfile(
+        synchronous="NORMAL",
+        cache_size_kib=64 * 1024,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout=30.0,
+        cached_statements=256
+    ),
+    #Массовая загрузка данных: большие транзакции, которые при сбое можно повторить
+    "bulk-import": ConnectionProfile(
+        synchronous="OFF",
+        cache_size_kib=128 * 1024,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout=60.0,
+        cached_statements=64
+    )
+}
+'''Именованные профили подключений'''
+
+
+def open_database(path: str | Path, profile: str = "desk", read_only: bool = False, check_same_thread: bool = True,
+                  factory: type[sqlite3.Connection] = sqlite3.Connection) -> sqlite3.Connection:
+    '''
+    Открыть подключение к БД с настройками профиля и включёнными внешними ключами
+    (внешние ключи активируются для каждого подключения, а не для БД в целом).
+
+    Аргументы:
+    path : str | Path -- путь к файлу БД.
+    profile : str -- название профиля из PROFILES.
+    read_only : bool -- открыть БД только для чтения (режим журнала такое подключение не меняет).
+    check_same_thread : bool -- запрещать использование подключения из других потоков
+                                (False - для подключений, которые по очереди используют разные потоки, например из пула).
+    factory : type[sqlite3.Connection] -- класс подключения (например, modules.pool.SharedWriter).
+
+    Если профиля с таким названием нет, то поднимается ValueError.
+    '''
+    settings = PROFILES.get(profile)
+    if settings is None:
+        raise ValueError(f"Unknown connection profile: {profile}.")
+
+    if read_only:
+        connection = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True,
+                                     timeout=settings.busy_timeout, cached_statements=settings.cached_statements,
+                                     check_same_thread=check_same_thread, factory=factory)
+    else:
+        connection = sqlite3.connect(path, timeout=settings.busy_timeout, cached_statements=settings.cached_statements,
+                                     check_same_thread=check_same_thread, factory=factory)
+    try:
+        if not read_only:
+            #Режим журнала сохраняется в файле БД, поэтому достаточно одного пишущего подключения
+            connection.execute("PRAGMA journal_mode = WAL;")
+        connection.execute(f"PRAGMA synchronous = {settings.synchronous};")
+        connection.execute(f"PRAGMA cache_size = {-settings.cache_size_kib};")
+        connection.execute(f"PRAGMA mmap_size = {settings.mmap_size};")
+        connection.execute(f"PRAGMA temp_store = {settings.temp_store};")
+        connection.execute("PRAGMA foreign_keys = ON;")
+    except:
+        connection.close()
+        raise
+    return connection
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from typing import Callable, Self
-from weakref import WeakMethod
+from typing import Any, Callable, Self
+from weakref import WeakMethod, finalize, ref
 
 
 class WeakSubscriber[*TArgs](WeakMethod[Callable[[*TArgs], None]]):
@@ -21,44 +21,104 @@ class WeakSubscriber[*TArgs](WeakMethod[Callable[[*TArgs], None]]):
         '''Жив ли ещё этот подписчик'''
         return self._alive # type: ignore
 
+    @property
+    def owner(self: Self) -> Any | None:
+        '''Объект, которому принадлежит метод подписчика (None, если объект уже удалён)'''
+        #WeakMethod является слабой ссылкой на объект метода
+        return ref.__call__(self)
+
 
 class Event[*TArgs]:
     '''
     Класс события с множеством подписчиков.
     Поддерживает слабые методы через WeakSubscriber.
+
+    Слабые подписчики удаляются из события сами, как только удаляется их объект,
+    поэтому вызов события обходит только живых подписчиков, а отписка выполняется за O(1).
     '''
 
     def __init__(self) -> None:
-        self._subscribers : list[Callable[[*TArgs], None]] = []
-        '''Подписчики этого события'''
+        self._subscribers : dict[Callable[[*TArgs], None], _Subscription] = {}
+        '''Подписчики этого события в порядке подписки'''
+        self._purged_count : int = 0
+        '''Количество слабых подписчиков, удалённых после удаления их объекта'''
+
+    @property
+    def live_count(self: Self) -> int:
+        '''Количество живых подписок (с учётом повторных подписок того же подписчика)'''
+        return sum(s.count for sub, s in list(self._subscribers.items()) if not isinstance(sub, WeakSubscriber) or sub.alive)
+
+    @property
+    def dead_count(self: Self) -> int:
+        '''Количество подписок, объект которых уже удалён, но которые ещё не убраны из события'''
+        return sum(s.count for sub, s in list(self._subscribers.items()) if isinstance(sub, WeakSubscriber) and not sub.alive)
+
+    @property
+    def purged_count(self: Self) -> int:
+        '''Количество слабых подписчиков, автоматически убранных из события за всё время'''
+        return self._purged_count
 
     def __iadd__(self: Self, other: Callable[[*TArgs], None] | WeakSubscriber[*TArgs]) -> Self:
         '''
         Добавить подписчика этого события
         '''
-        self._subscribers.append(other)
+        subscription = self._subscribers.get(other)
+        if subscription is not None:
+            subscription.count += 1
+            return self
+
+        finalizer = None
+        if isinstance(other, WeakSubscriber):
+            owner = other.owner
+            if owner is None:
+                #Объект подписчика уже удалён, вызывать нечего
+                return self
+            #Событие передаётся слабой ссылкой, чтобы финализатор не продлевал его жизнь
+            finalizer = finalize(owner, Event._purge, ref(self), other)
+        self._subscribers[other] = _Subscription(1, finalizer)
         return self
 
     def __isub__(self: Self, other: Callable[[*TArgs], None] | WeakSubscriber[*TArgs]) -> Self:
         '''
         Убрать подписчика этого события
         '''
-        #remove subscriber if any
-        try:
-            self._subscribers.remove(other)
-        except ValueError:
-            pass
+        if isinstance(other, WeakSubscriber) and not other.alive:
+            #Мёртвый подписчик уже убран финализатором (или будет убран им)
+            return self
+        subscription = self._subscribers.get(other)
+        if subscription is None:
+            return self
+        subscription.count -= 1
+        if subscription.count == 0:
+            del self._subscribers[other]
+            if subscription.finalizer is not None:
+                subscription.finalizer.detach()
         return self
         
     def __call__(self: Self, *args: *TArgs) -> None:
         '''
         Вызвать всех подписчиков этого события с указанными аргументами
         '''
-        purge = False
-        for sub in self._subscribers:
-            sub(*args)
-            if isinstance(sub, WeakSubscriber):
-                purge = purge or not sub.alive
-        
-        if purge:
-            self._subscribers = [x for x in self._subscribers if not isinstance(x, WeakSubscriber) or x.alive]
\ No newline at end of file
+        #Подписчики могут отписаться (или быть удалены сборщиком мусора) во время вызова, поэтому обходим копию
+        for sub, subscription in list(self._subscribers.items()):
+            for _ in range(subscription.count):
+                sub(*args)
+
+    @staticmethod
+    def _purge(event_ref: ref[Event[*TArgs]], sub: WeakSubscriber[*TArgs]) -> None:
+        '''Убрать подписчика, объект которого был удалён'''
+        event = event_ref()
+        if event is None:
+            return
+        #Ключ ищется по идентичности: мёртвые WeakMethod равны только самим себе
+        if event._subscribers.pop(sub, None) is not None:
+            event._purged_count += 1
+
+
+class _Subscription:
+    '''Запись о подписке: количество повторных подписок и финализатор объекта слабого подписчика'''
+    __slots__ = ("count", "finalizer")
+
+    def __init__(self, count: int, finalizer: finalize | None) -> None:
+        self.count = count
+        self.finalizer = finalizer
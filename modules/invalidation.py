@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import Callable, Self
+from collections.abc import Iterable
+from threading import Lock
+
+from modules.events import Event, WeakSubscriber
+
+
+class InvalidationBus:
+    '''
+    Шина сброса кешей, общая для нескольких репозиториев.
+    Подписчик указывает таблицы, от которых зависят его данные,
+    и вызывается только при изменении хотя бы одной из этих таблиц.
+    Подписываться и сообщать об изменениях можно из разных потоков.
+    '''
+
+    def __init__(self) -> None:
+        self._tables : dict[str, Event[()]] = {}
+        '''События изменения по имени таблицы'''
+        self._lock = Lock()
+
+    def subscribe(self: Self, tables: Iterable[str], subscriber: Callable[[], None] | WeakSubscriber[()]) -> None:
+        '''
+        Подписаться на изменения указанных таблиц.
+
+        Аргументы:
+        tables : Iterable[str] -- таблицы, от которых зависит подписчик.
+        subscriber : Callable[[], None] | WeakSubscriber[()] -- подписчик (обычно WeakSubscriber(view.reset_cache)).
+        '''
+        with self._lock:
+            for table in tables:
+                if table not in self._tables:
+                    self._tables[table] = Event[()]()
+                self._tables[table] += subscriber
+
+    def notify(self: Self, *tables: str) -> None:
+        '''
+        Сообщить об изменении указанных таблиц.
+        Подписчик, зависящий от нескольких изменённых таблиц, может быть вызван несколько раз.
+        '''
+        #Подписчики вызываются без блокировки, чтобы они могли сами подписываться на шину
+        with self._lock:
+            events = [self._tables[table] for table in tables if table in self._tables]
+        for event in events:
+            event()
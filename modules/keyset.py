@@ -0,0 +1,24 @@
+from collections.abc import Sequence
+from typing import Any
+
+def seek_condition(columns: Sequence[str], key: tuple[Any, ...] | None, backward: bool) -> str | None:
+    '''
+    Условие поиска от ключа сортировки для keyset-пагинации, например "(Book.Name, Book.ID) > (:key0, :key1)".
+    Если ключ не указан, возвращает None.
+
+    Аргументы:
+    columns : Sequence[str] -- столбцы ключа сортировки (все сортируются по возрастанию).
+    key : tuple[Any, ...] | None -- значение ключа, от которого ведётся поиск.
+    backward : bool -- искать записи, предшествующие ключу, а не следующие за ним.
+    '''
+    if key is None:
+        return None
+    return f"({', '.join(columns)}) {'<' if backward else '>'} ({', '.join(f':key{i}' for i in range(len(columns)))})"
+
+def seek_order(columns: Sequence[str], backward: bool) -> str:
+    '''Порядок сортировки для keyset-пагинации (без ORDER BY).'''
+    return ', '.join(f"{column} {'DESC' if backward else 'ASC'}" for column in columns)
+
+def seek_params(key: tuple[Any, ...] | None) -> dict[str, Any]:
+    '''Параметры запроса для условия из seek_condition.'''
+    return {} if key is None else { f'key{i}': value for i, value in enumerate(key) }
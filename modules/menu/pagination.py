@@ -1,23 +1,71 @@
 from __future__ import annotations
 
-from typing import Self, Callable
+from typing import Self, Callable, Any
 from collections.abc import Sequence
+from queue import Queue
+from threading import Thread
+import logging
+import sqlite3
 
 from modules.menu.static import StaticMenuEntry, MenuEntryBack
 from modules.menu.core import MenuBase, MenuEntryBase, MenuHostBase
 from modules.menu.input import converter_int, validator_int_range
 
 from modules.events import Event, WeakSubscriber
+from modules.view import View, CachingView
 
 import math
 
+_log = logging.getLogger(__name__)
+
+class PagePrefetcher:
+    '''
+    Фоновый загрузчик страниц для PaginationMenu.
+    Загружает страницы CachingView в отдельном потоке через собственное подключение к БД
+    и передаёт результат в кеш view, чтобы переход на соседнюю страницу не ждал запроса.
+    '''
+    def __init__(self, connection_factory: Callable[[], Any]) -> None:
+        '''
+        connection_factory : Callable[[], Any] -- функция, открывающая подключение для потока предзагрузки.
+                                                  Вызывается в потоке предзагрузки. Подключению достаточно прав только на чтение.
+        '''
+        self._queue : Queue[tuple[CachingView[Any], int, int] | None] = Queue()
+        self._thread = Thread(target=self._run, args=(connection_factory,), name='PagePrefetcher', daemon=True)
+        self._thread.start()
+
+    def request(self: Self, view: CachingView[Any], index: int, size: int) -> None:
+        '''Поставить в очередь загрузку страницы index размером size'''
+        self._queue.put((view, index, size))
+
+    def close(self: Self) -> None:
+        '''Остановить поток предзагрузки, дождавшись завершения текущей загрузки'''
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self: Self, connection_factory: Callable[[], Any]) -> None:
+        connection = connection_factory()
+        try:
+            while (task := self._queue.get()) is not None:
+                view, index, size = task
+                try:
+                    view.prefetch_page(index, size, connection)
+                except sqlite3.Error:
+                    #Предзагрузка - только оптимизация: при ошибке страница будет загружена обычным образом при переходе на неё
+                    _log.warning("Page prefetch failed (page %d, size %d)", index, size, exc_info=True)
+        finally:
+            connection.close()
+
 class PaginationMenu[T](MenuBase):
     '''
     Меню, отображающее список записей с поддержкой пагинации
     '''
+    prefetcher : PagePrefetcher | None = None
+    '''Загрузчик соседних страниц по умолчанию для всех меню. Если None, то страницы не загружаются заранее.'''
+
     def __init__(self, items: Sequence[T],
                  entry_generator : Callable[[T], MenuEntryBase] | None = None,
-                 text_generator : Callable[[T], str] | None = None) -> None:
+                 text_generator : Callable[[T], str] | None = None,
+                 prefetcher : PagePrefetcher | None = None) -> None:
         '''
         items: Sequence[T] -- список записей, которые необходимо отобразить.
         entry_generator : Callable[[T], MenuEntryBase] | None - генератор пункта меню для записи.
@@ -26,6 +74,8 @@ class PaginationMenu[T](MenuBase):
         text_generator : Callable[[T], str] | None - генератор текст для записи.
                                                      Если установлен, то записи отображаются в виде заголовка меню.
                                                      Несовместим с entry_generator.        
+        prefetcher : PagePrefetcher | None - загрузчик соседних страниц. Если не указан, используется PaginationMenu.prefetcher.
+                                             Используется, только если items - CachingView.
         '''
 
         if entry_generator is not None and text_generator is not None:
@@ -36,6 +86,8 @@ class PaginationMenu[T](MenuBase):
         self._items = items
         self.__currentPage = 0
         self._pageSize = 10
+        if prefetcher is not None:
+            self.prefetcher = prefetcher
 
     @MenuBase.text.getter
     def text(self: Self) -> str:
@@ -47,7 +99,7 @@ class PaginationMenu[T](MenuBase):
             return f'Страница {self._current_page + 1}/{ self._page_count }\nВсего записей: {items_len}'
         else:
             res = ''
-            for item in self._items[self._current_page * self._pageSize:(self._current_page + 1) * self._pageSize]:
+            for item in self._page_items:
                 res += self._text_generator(item) + '\n'
             res += f'Страница {self._current_page + 1}/{ self._page_count }\nВсего записей: {items_len}'
             return res
@@ -72,7 +124,7 @@ class PaginationMenu[T](MenuBase):
 
             #Добавить все записи текущей страницы как пункты меню
             if self._entry_generator is not None:
-                for item in self._items[self._current_page * self._pageSize:(self._current_page + 1) * self._pageSize]:
+                for item in self._page_items:
                     entries.append(self._entry_generator(item))
                 
 
@@ -86,6 +138,24 @@ class PaginationMenu[T](MenuBase):
         '''Число страниц с текущими настройками'''
         return int(math.ceil(len(self._items) / self._pageSize))
 
+    @property
+    def _page_items(self: Self) -> Sequence[T]:
+        '''Записи текущей страницы. Для View страница запрашивается через get_page, что позволяет использовать keyset-пагинацию.'''
+        if isinstance(self._items, View):
+            page = self._items.get_page(self._current_page, self._pageSize)
+            self._prefetch_neighbours()
+            return page
+        return self._items[self._current_page * self._pageSize:(self._current_page + 1) * self._pageSize]
+
+    def _prefetch_neighbours(self: Self) -> None:
+        '''Запросить фоновую загрузку следующей и предыдущей страниц'''
+        if self.prefetcher is None or not isinstance(self._items, CachingView):
+            return
+        if self._current_page + 1 < self._page_count:
+            self.prefetcher.request(self._items, self._current_page + 1, self._pageSize)
+        if self._current_page > 0:
+            self.prefetcher.request(self._items, self._current_page - 1, self._pageSize)
+
     @property
     def _current_page(self: Self) -> int:
         '''Текущая страница, ограниченная числом страниц.'''
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Empty, LifoQueue
+from threading import Lock, get_ident, local
+from typing import Any, Self
+
+from modules.database import open_database
+from modules.invalidation import InvalidationBus
+from modules.write_queue import WriteQueue
+
+
+class SharedWriter(sqlite3.Connection):
+    '''
+    Пишущее подключение, общее для нескольких потоков (потока, создавшего пул, и потока очереди записи пула).
+    Поток получает подключение в исключительное пользование с первого запроса транзакции до её фиксации или отката,
+    а запрос вне транзакции - на время его выполнения, поэтому транзакции разных потоков не смешиваются.
+
+    Поток, начавший транзакцию (например, unit_of_work), не должен ждать в ней результата очереди записи:
+    очередь не получит подключение, пока транзакция не завершится.
+    '''
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._lock = Lock()
+        self._owner : int | None = None
+        '''Поток, которому сейчас принадлежит подключение'''
+
+    def execute(self, *args: Any) -> sqlite3.Cursor:
+        self._acquire()
+        try:
+            return super().execute(*args)
+        finally:
+            self._release_if_idle()
+
+    def executemany(self, *args: Any) -> sqlite3.Cursor:
+        self._acquire()
+        try:
+            return super().executemany(*args)
+        finally:
+            self._release_if_idle()
+
+    def commit(self) -> None:
+        self._acquire()
+        try:
+            super().commit()
+        finally:
+            self._release_if_idle()
+
+    def rollback(self) -> None:
+        self._acquire()
+        try:
+            super().rollback()
+        finally:
+            self._release_if_idle()
+
+    def _acquire(self: Self) -> None:
+        if self._owner == get_ident():
+            return
+        self._lock.acquire()
+        self._owner = get_ident()
+
+    def _release_if_idle(self: Self) -> None:
+        if self._owner == get_ident() and not self.in_transaction:
+            self._owner = None
+            self._lock.release()
+
+
+class ConnectionPool:
+    '''
+    Пул подключений к БД в режиме WAL: одно пишущее подключение и до max_readers подключений только для чтения (mode=ro).
+    Репозитории пишут через writer, а view выполняют запросы через подключения для чтения (см. CachingView.readers),
+    поэтому долгий отчёт не занимает подключение, через которое фиксируются изменения.
+    Очередь записи пула (write_queue) пишет через то же подключение writer, так что в процессе остаётся один писатель.
+
+    Подключения для чтения открываются по мере необходимости. Поток, который уже взял подключение из пула,
+    при повторном запросе получает то же подключение, поэтому вложенные запросы (например, при обходе view в цикле)
+    не ждут сами себя. Подключения для чтения видят только зафиксированные изменения.
+
+    Метрики пула: size, in_use, peak_in_use, borrows, waits, wait_time, max_wait.
+    '''
+
+    def __init__(self, path: str | Path, max_readers: int = 4, profile: str = "desk", timeout: float = 30.0) -> None:
+        '''
+        path : str | Path -- путь к файлу БД.
+        max_readers : int -- максимальное число подключений для чтения.
+        profile : str -- профиль подключений (см. modules.database.PROFILES).
+        timeout : float -- сколько секунд ждать освобождения подключения для чтения, прежде чем поднять TimeoutError.
+        '''
+        if max_readers < 1:
+            raise ValueError("The pool needs at least one read connection.")
+        self._path = path
+        self._profile = profile
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self.writer = open_database(path, profile, check_same_thread=False, factory=SharedWriter)
+        '''Пишущее подключение (используется из потока, создавшего пул, и из потока очереди записи)'''
+        self._write_queue : WriteQueue | None = None
+        self._idle : LifoQueue[sqlite3.Connection] = LifoQueue()
+        '''Свободные подключения для чтения (последнее освобождённое выдаётся первым: его кеш страниц "теплее")'''
+        self._readers : list[sqlite3.Connection] = []
+        self._lock = Lock()
+        self._local = local()
+        '''Подключение, взятое текущим потоком'''
+
+        self.in_use : int = 0
+        '''Число занятых подключений для чтения'''
+        self.peak_in_use : int = 0
+        '''Наибольшее число одновременно занятых подключений для чтения'''
+        self.borrows : int = 0
+        '''Число выдач подключений для чтения (без повторных выдач тому же потоку)'''
+        self.waits : int = 0
+        '''Число выдач, которым пришлось ждать освобождения подключения'''
+        self.wait_time : float = 0.0
+        '''Суммарное время ожидания подключений в секундах'''
+        self.max_wait : float = 0.0
+        '''Наибольшее время ожидания подключения в секундах'''
+
+    @property
+    def size(self: Self) -> int:
+        '''Число открытых подключений для чтения'''
+        return len(self._readers)
+
+    @contextmanager
+    def reader(self: Self) -> Iterator[sqlite3.Connection]:
+        '''Взять подключение для чтения на время блока with'''
+        held = getattr(self._local, "connection", None)
+        if held is not None:
+            yield held
+            return
+
+        connection = self._acquire()
+        self._local.connection = connection
+        try:
+            yield connection
+        finally:
+            self._local.connection = None
+            with self._lock:
+                self.in_use -= 1
+            self._idle.put(connection)
+
+    def open_reader(self: Self) -> sqlite3.Connection:
+        '''
+        Открыть подключение только для чтения к БД пула с профилем пула (check_same_thread=False).
+        Подключения, открытые не из пула, не учитываются в его метриках и закрываются вызывающим.
+        '''
+        return open_database(self._path, self._profile, read_only=True, check_same_thread=False)
+
+    def write_queue(self: Self, bus: InvalidationBus | None = None, max_batch: int = 32, max_delay: float = 0.05) -> WriteQueue:
+        '''
+        Получить очередь записи пула, которая пишет через подключение writer (см. WriteQueue).
+        Очередь создаётся при первом вызове (аргументы последующих вызовов не учитываются) и закрывается вместе с пулом.
+        '''
+        if self._write_queue is None:
+            self._write_queue = WriteQueue(lambda: self.writer, bus, max_batch, max_delay, close_connection=False)
+        return self._write_queue
+
+    def close(self: Self) -> None:
+        '''
+        Зафиксировать операции очереди записи и закрыть все подключения пула
+        (занятые подключения для чтения должны быть к этому моменту освобождены).
+        '''
+        if self._write_queue is not None:
+            self._write_queue.close()
+        with self._lock:
+            readers, self._readers = self._readers, []
+        for connection in readers:
+            connection.close()
+        self.writer.close()
+
+    def __enter__(self: Self) -> Self:
+        return self
+
+    def __exit__(self: Self, *args: Any) -> None:
+        self.close()
+
+    def _acquire(self: Self) -> sqlite3.Connection:
+        with self._lock:
+            self.borrows += 1
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                if len(self._readers) < self.max_readers:
+                    connection = self.open_reader()
+                    self._readers.append(connection)
+                else:
+                    connection = None
+            if connection is not None:
+                self._mark_in_use()
+                return connection
+            self.waits += 1
+
+        started = time.perf_counter()
+        try:
+            connection = self._idle.get(timeout=self.timeout)
+        except Empty:
+            raise TimeoutError(f"No read connection was released within {self.timeout} seconds.") from None
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            self._mark_in_use()
+        return connection
+
+    def _mark_in_use(self: Self) -> None:
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, Self
+
+
+class ReportCache:
+    '''
+    Общий для всех view кеш готовых результатов запросов (длин и страниц отчётов).
+    Ключ записи - подпись запроса view (тип view и параметры запроса) и запрошенный блок,
+    поэтому повторно открытый отчёт берёт страницы из кеша, хотя view для него создаётся заново.
+
+    Кеш действителен, пока БД не изменилась: изменения других подключений (в том числе других процессов)
+    отслеживаются через PRAGMA data_version, а изменения собственного подключения - через его total_changes
+    (data_version их не учитывает). При любом изменении кеш очищается целиком.
+    Кеш привязан к одному подключению и должен использоваться из того же потока, что и подключение.
+    '''
+
+    def __init__(self, connection: sqlite3.Connection, max_entries: int = 256) -> None:
+        '''
+        connection : sqlite3.Connection -- подключение, через которое выполняются кешируемые запросы.
+        max_entries : int -- максимальное число записей кеша, давно не использованные записи вытесняются.
+        '''
+        self._connection = connection
+        self._entries : OrderedDict[Hashable, Any] = OrderedDict()
+        '''Записи кеша в порядке использования'''
+        self._version : tuple[int, int] | None = None
+        '''Версия БД, для которой действительны записи кеша'''
+        self.max_entries = max_entries
+        self.hits : int = 0
+        '''Число запросов, обслуженных из кеша'''
+        self.misses : int = 0
+        '''Число запросов, для которых в кеше не нашлось записи'''
+
+    def get(self: Self, key: Hashable) -> Any | None:
+        '''
+        Получить результат из кеша (или None, если результата нет или БД изменилась с момента его сохранения).
+        '''
+        self._validate()
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self: Self, key: Hashable, value: Any) -> None:
+        '''
+        Сохранить результат в кеше.
+        Результат должен быть получен при той же версии БД, что и при последнем вызове get.
+        '''
+        if self._version is None:
+            self._validate()
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self: Self) -> None:
+        '''Очистить кеш'''
+        self._entries.clear()
+
+    def __len__(self: Self) -> int:
+        return len(self._entries)
+
+    def _validate(self: Self) -> None:
+        '''Очистить кеш, если БД изменилась с момента предыдущей проверки'''
+        cur = self._connection.execute("PRAGMA data_version;")
+        cur.row_factory = None
+        version = (cur.fetchone()[0], self._connection.total_changes)
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Self
+
+from modules.invalidation import InvalidationBus
+
+
+class UnitOfWork:
+    '''
+    Единица работы: транзакция, общая для нескольких вызовов репозиториев с одним подключением.
+    Пока единица работы активна, репозитории не фиксируют изменения сами, а сообщения об изменённых таблицах
+    накапливаются и рассылаются один раз после фиксации всей единицы работы.
+    Создаётся через unit_of_work.
+    '''
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+        '''Подключение, изменения через которое входят в единицу работы'''
+        self.failed : bool = False
+        '''Была ли транзакция откачена из-за ошибки в одной из операций'''
+        self._changes : dict[int, tuple[InvalidationBus, set[str]]] = {}
+        '''Изменённые таблицы по шинам, через которые о них нужно сообщить'''
+
+    def defer_notify(self: Self, bus: InvalidationBus, tables: tuple[str, ...]) -> None:
+        '''Запомнить изменённые таблицы, чтобы сообщить о них после фиксации'''
+        _, changed = self._changes.setdefault(id(bus), (bus, set()))
+        changed.update(tables)
+
+    def _notify(self: Self) -> None:
+        for bus, tables in self._changes.values():
+            if len(tables) > 0:
+                bus.notify(*sorted(tables))
+        self._changes.clear()
+
+
+_active : dict[int, UnitOfWork] = {}
+'''Активные единицы работы по id подключения (подключение живо, пока активна его единица работы)'''
+
+
+@contextmanager
+def unit_of_work(connection: sqlite3.Connection) -> Iterator[UnitOfWork]:
+    '''
+    Выполнить несколько операций репозиториев одной транзакцией:
+
+        with unit_of_work(connection):
+            loanRepo.update_loan(returned)
+            loanRepo.add_loan(issued)
+
+    Изменения фиксируются одним COMMIT при выходе из блока, а затем о всех изменённых таблицах
+    сообщается один раз. Если в блоке поднимается исключение, то транзакция откатывается и сообщения не рассылаются.
+    Вложенный unit_of_work с тем же подключением присоединяется к внешнему.
+
+    Ошибка в операции репозитория откатывает всю транзакцию. Если такую ошибку перехватить внутри блока,
+    то при выходе из него будет поднята sqlite3.OperationalError, а не зафиксирована только часть операций.
+    '''
+    outer = _active.get(id(connection))
+    if outer is not None:
+        yield outer
+        return
+
+    unit = UnitOfWork(connection)
+    if not connection.in_transaction:
+        connection.execute("BEGIN IMMEDIATE;")
+    _active[id(connection)] = unit
+    try:
+        yield unit
+    except:
+        del _active[id(connection)]
+        connection.rollback()
+        raise
+    del _active[id(connection)]
+    if unit.failed:
+        #Операции после ошибки выполнялись уже в новой транзакции, её тоже нужно откатить
+        connection.rollback()
+        raise sqlite3.OperationalError("The unit of work was rolled back because one of its operations failed.")
+    try:
+        connection.commit()
+    except:
+        connection.rollback()
+        raise
+    unit._notify()
+
+
+def commit(connection: sqlite3.Connection, bus: InvalidationBus, *tables: str) -> None:
+    '''
+    Зафиксировать изменения операции репозитория и сообщить об изменении таблиц.
+    Внутри unit_of_work фиксация и сообщение откладываются до конца единицы работы.
+    '''
+    unit = _active.get(id(connection))
+    if unit is not None:
+        unit.defer_notify(bus, tables)
+        return
+    connection.commit()
+    if len(tables) > 0:
+        bus.notify(*tables)
+
+
+def rollback(connection: sqlite3.Connection) -> None:
+    '''
+    Откатить изменения операции репозитория после ошибки.
+    Внутри unit_of_work откатывается вся единица работы.
+    '''
+    connection.rollback()
+    unit = _active.get(id(connection))
+    if unit is not None:
+        unit.failed = True
@@ -1,11 +1,22 @@
-from collections.abc import Sequence
-from typing import Self, overload
+from collections import OrderedDict
+from collections.abc import Sequence, Iterator, Callable, Hashable
+from typing import Self, Any, overload, TYPE_CHECKING
+from threading import RLock
+from contextlib import contextmanager
 import abc
+import copy
+
+if TYPE_CHECKING:
+    from modules.pool import ConnectionPool
+    from modules.report_cache import ReportCache
 
 class View[T](Sequence[T], abc.ABC):
     """
         Абстрактный класс-реализация Sequence[T], упрощающая реализацию get_item.
     """
+    iter_batch_size : int = 100
+    '''Число записей, загружаемых за раз при обходе view в цикле'''
+
     def __len__(self: Self) -> int:
         return self._get_len()
 
@@ -18,11 +29,45 @@ class View[T](Sequence[T], abc.ABC):
 
     def __getitem__(self: Self, index: int | slice) -> T | Sequence[T]:
         if isinstance(index, int):
-            return self._get_slice(index, 1, 1)[0]
+            return self._load_slice(index, 1, 1)[0]
         else:
-            scs = index.indices(self._get_len())
-            return self._get_slice(scs[0], (scs[1] - scs[0]) // scs[2], scs[2])
+            scs = index.indices(len(self))
+            return self._load_slice(scs[0], (scs[1] - scs[0]) // scs[2], scs[2])
+
+    def __iter__(self: Self) -> Iterator[T]:
+        """
+            Обойти все записи. В отличие от Sequence.__iter__, не загружает каждую запись отдельным запросом.
+        """
+        return self._iter_items(self.iter_batch_size)
+
+    def get_page(self: Self, index: int, size: int) -> Sequence[T]:
+        """
+            Получить страницу записей.
+
+            index: int -- номер страницы (с нуля).
+            size: int -- число записей на странице.
+        """
+        return self[index * size:(index + 1) * size]
+
+    def _load_slice(self: Self, start: int, count: int, stride: int) -> Sequence[T]:
+        """
+            Получить записи для __getitem__. Наследники могут переопределить, чтобы кешировать результат _get_slice.
+        """
+        return self._get_slice(start, count, stride)
         
+    def _iter_items(self: Self, batch_size: int) -> Iterator[T]:
+        """
+            Обойти все записи для __iter__. По умолчанию записи загружаются блоками по batch_size через _load_slice,
+            наследники могут переопределить, чтобы читать все записи одним запросом.
+        """
+        start = 0
+        while True:
+            items = self._load_slice(start, batch_size, 1)
+            yield from items
+            if len(items) < batch_size:
+                return
+            start += batch_size
+
     @abc.abstractmethod
     def _get_slice(self: Self, start: int, count: int, stride: int) -> Sequence[T]:
         raise NotImplementedError()
@@ -31,19 +76,355 @@ class View[T](Sequence[T], abc.ABC):
     def _get_len(self: Self) -> int:
         raise NotImplementedError()
     
+def iter_cursor[T](cursor: Any, batch_size: int, convert: Callable[[Any], T]) -> Iterator[T]:
+    """
+        Лениво обойти результат запроса, выбирая строки из курсора блоками по batch_size (fetchmany)
+        и преобразуя каждую строку через convert. Курсор закрывается по окончании обхода, в том числе досрочном.
+    """
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if len(rows) == 0:
+                return
+            for row in rows:
+                yield convert(row)
+    finally:
+        cursor.close()
+
 class CachingView[T](View[T], abc.ABC):
     """
-        View[T], кеширующий значение своей длины и предоставляющий функцию сброса кеша.
+        View[T], кеширующий значение своей длины и загруженные блоки записей и предоставляющий функцию сброса кеша.
+        Блоки записей хранятся в LRU-кеше по ключу (start, count, stride), размер кеша ограничен
+        числом блоков и общим числом записей в них.
+        Кеш можно заполнять из фонового потока через prefetch_page.
+        Если задан общий кеш отчётов (report_cache), то длина и блоки записей, которых нет в кеше view,
+        сначала ищутся в нём: так заново созданный view того же отчёта не выполняет запросов.
+        Если задан пул подключений (readers), то запросы выполняются через взятое из него подключение для чтения.
     """
     _cached_len : int | None = None
+    _cached_slices : OrderedDict[tuple[int, int, int], Sequence[T]] | None = None
+    _cached_rows : int = 0
+    _cache_generation : int = 0
+    '''Увеличивается при каждом сбросе кеша, чтобы отбрасывать результаты загрузок, начатых до сброса'''
+    _cache_lock = RLock()
+    '''Блокировка кешей всех view (кеши изменяются и потоком предзагрузки)'''
+
+    cache_max_slices : int = 32
+    '''Максимальное число блоков записей в кеше'''
+    cache_max_rows : int = 1000
+    '''Максимальное суммарное число записей в кешированных блоках'''
+    cache_hits : int = 0
+    '''Число запросов блоков, обслуженных из кеша'''
+    cache_misses : int = 0
+    '''Число запросов блоков, потребовавших обращения к _get_slice'''
+    report_cache : 'ReportCache | None' = None
+    '''Общий для всех view кеш готовых результатов (используется только в потоке подключения view)'''
+    readers : 'ConnectionPool | None' = None
+    '''Пул, из которого берутся подключения для запросов view (они видят только зафиксированные изменения).
+    Если None, то запросы выполняются через подключение view.'''
 
     def __len__(self: Self) -> int:
-        if self._cached_len is None:
-            self._cached_len = self._get_len()
-        return self._cached_len
+        with self._cache_lock:
+            if self._cached_len is not None:
+                return self._cached_len
+            generation = self._cache_generation
+
+        length = self._report_get("len")
+        if length is None:
+            with self._reading() as view:
+                length = view._get_len()
+            if self._is_current(generation):
+                self._report_put(length, "len")
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._cached_len = length
+        return length
+
+    def __iter__(self: Self) -> Iterator[T]:
+        if self.readers is None:
+            return super().__iter__()
+        return self._iter_pooled()
+
+    def _iter_pooled(self: Self) -> Iterator[T]:
+        """
+            Обойти все записи через подключение для чтения, взятое из пула на время обхода.
+        """
+        with self._reading() as view:
+            yield from view._iter_items(self.iter_batch_size)
+
+    @contextmanager
+    def _reading(self: Self) -> Iterator[Self]:
+        """
+            View для выполнения запросов: сам view или, если задан пул readers, его копия (_detach)
+            с подключением для чтения, взятым из пула на время блока with.
+        """
+        if self.readers is None:
+            yield self
+            return
+        with self.readers.reader() as connection:
+            yield self._detach(connection)
+
+    def set_cache_limits(self: Self, max_slices: int, max_rows: int) -> None:
+        """
+            Изменить ограничения размера кеша блоков записей этого view.
+
+            max_slices: int -- максимальное число блоков.
+            max_rows: int -- максимальное суммарное число записей в блоках.
+        """
+        with self._cache_lock:
+            self.cache_max_slices = max_slices
+            self.cache_max_rows = max_rows
+            self._trim_cache()
     
     def reset_cache(self: Self) -> None:
         """
             Сбросить все кешированные значения.
         """
-        self._cached_len = None
\ No newline at end of file
+        with self._cache_lock:
+            self._cached_len = None
+            self._cached_slices = None
+            self._cached_rows = 0
+            self._cache_generation += 1
+
+    def prefetch_page(self: Self, index: int, size: int, connection: Any) -> Sequence[T]:
+        """
+            Заранее загрузить страницу в кеш, выполнив запросы через указанное подключение, и вернуть её.
+            Предназначено для фоновых потоков, у которых есть собственное подключение к БД.
+            Если кеш был сброшен во время загрузки, результат не попадает в кеш.
+
+            index: int -- номер страницы (с нуля).
+            size: int -- число записей на странице.
+            connection: Any -- подключение, через которое выполняются запросы.
+        """
+        key = (index * size, size, 1)
+        with self._cache_lock:
+            if self._cached_slices is not None and key in self._cached_slices:
+                return self._cached_slices[key]
+            generation = self._cache_generation
+            detached = self._detach(connection)
+
+        items = detached.get_page(index, size)
+
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._adopt_page(detached, index, size, items)
+        return items
+
+    def prefetch_len(self: Self, connection: Any) -> int:
+        """
+            Аналог prefetch_page для длины view: загрузить длину через указанное подключение, сохранить в кеше и вернуть.
+        """
+        with self._cache_lock:
+            if self._cached_len is not None:
+                return self._cached_len
+            generation = self._cache_generation
+            detached = self._detach(connection)
+
+        length = len(detached)
+
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._cached_len = length
+        return length
+
+    def _detach(self: Self, connection: Any) -> Self:
+        """
+            Копия этого view с пустым кешем блоков, выполняющая запросы через другое подключение.
+            Наследники хранят подключение в поле _connection.
+        """
+        clone = copy.copy(self)
+        clone._connection = connection #type: ignore
+        #Общий кеш отчётов проверяется через подключение view, которое нельзя использовать из другого потока
+        clone.report_cache = None
+        #Копия уже выполняет запросы через переданное подключение
+        clone.readers = None
+        clone._cached_slices = None
+        clone._cached_rows = 0
+        return clone
+
+    def _adopt_page(self: Self, detached: Self, index: int, size: int, items: Sequence[T]) -> None:
+        """
+            Перенести в кеш этого view страницу, загруженную копией из _detach.
+        """
+        if self._cached_len is None:
+            self._cached_len = detached._cached_len
+        self._put_cached_slice((index * size, size, 1), items)
+
+    def _load_slice(self: Self, start: int, count: int, stride: int) -> Sequence[T]:
+        key = (start, count, stride)
+        with self._cache_lock:
+            generation = self._cache_generation
+            items = self._get_cached_slice(key)
+        if items is None:
+            items = self._report_get("slice", *key)
+            if items is None:
+                with self._reading() as view:
+                    items = view._get_slice(start, count, stride)
+                if self._is_current(generation):
+                    self._report_put(items, "slice", *key)
+            self._put_cached_slice(key, items, generation)
+        return items
+
+    def _is_current(self: Self, generation: int) -> bool:
+        """
+            Не сбрасывался ли кеш после того, как поколение generation было запомнено перед запросом.
+            Результаты запросов, начатых до сброса (например, через подключение из пула до фиксации очереди записи),
+            в кеш не сохраняются.
+        """
+        with self._cache_lock:
+            return generation == self._cache_generation
+
+    def _report_signature(self: Self) -> Hashable | None:
+        """
+            Подпись запроса view для общего кеша отчётов: совпадает у view, которые возвращают одни и те же записи.
+            Если возвращает None, то view не использует общий кеш.
+            По умолчанию - тип view, условие (поле _predicate) и параметры (поле _params) его запросов.
+        """
+        params = getattr(self, "_params", None)
+        return (
+            type(self).__module__,
+            type(self).__qualname__,
+            getattr(self, "_predicate", None),
+            tuple(sorted(params.items())) if params is not None else None
+        )
+
+    def _report_get(self: Self, *key: Hashable) -> Any | None:
+        """
+            Получить результат из общего кеша отчётов (или None, если его там нет или кеш не задан).
+        """
+        if self.report_cache is None:
+            return None
+        signature = self._report_signature()
+        if signature is None:
+            return None
+        return self.report_cache.get((signature, *key))
+
+    def _report_put(self: Self, value: Any, *key: Hashable) -> None:
+        """
+            Сохранить результат в общем кеше отчётов, если он задан.
+        """
+        if self.report_cache is None:
+            return
+        signature = self._report_signature()
+        if signature is None:
+            return
+        self.report_cache.put((signature, *key), value)
+
+    def _get_cached_slice(self: Self, key: tuple[int, int, int]) -> Sequence[T] | None:
+        """
+            Получить блок записей из кеша (или None, если блока в кеше нет) с учётом статистики попаданий.
+        """
+        with self._cache_lock:
+            if self._cached_slices is None or key not in self._cached_slices:
+                self.cache_misses += 1
+                return None
+            self.cache_hits += 1
+            self._cached_slices.move_to_end(key)
+            return self._cached_slices[key]
+
+    def _put_cached_slice(self: Self, key: tuple[int, int, int], items: Sequence[T], generation: int | None = None) -> None:
+        """
+            Добавить блок записей в кеш, вытеснив при необходимости давно не использованные блоки.
+            Если задано поколение generation и кеш с тех пор сбрасывался, то блок не добавляется.
+        """
+        with self._cache_lock:
+            if generation is not None and generation != self._cache_generation:
+                return
+            if len(items) > self.cache_max_rows:
+                return
+            if self._cached_slices is None:
+                self._cached_slices = OrderedDict()
+            if key in self._cached_slices:
+                self._cached_rows -= len(self._cached_slices[key])
+            self._cached_slices[key] = items
+            self._cached_rows += len(items)
+            self._trim_cache()
+
+    def _trim_cache(self: Self) -> None:
+        if self._cached_slices is None:
+            return
+        while len(self._cached_slices) > 0 and (len(self._cached_slices) > self.cache_max_slices or self._cached_rows > self.cache_max_rows):
+            _, evicted = self._cached_slices.popitem(last=False)
+            self._cached_rows -= len(evicted)
+
+class KeysetCachingView[T](CachingView[T], abc.ABC):
+    """
+        CachingView[T] с поддержкой keyset-пагинации.
+        Запоминает ключи сортировки первой и последней записи каждой загруженной страницы,
+        и соседние страницы запрашивает поиском от ключа, а не смещением (LIMIT start,count).
+        Так стоимость перехода на следующую или предыдущую страницу не зависит от номера страницы.
+    """
+    _page_bounds : dict[tuple[int, int], tuple[tuple[Any, ...], tuple[Any, ...]]] | None = None
+    '''Ключи сортировки первой и последней записи загруженных страниц по (номер страницы, размер страницы)'''
+
+    def get_page(self: Self, index: int, size: int) -> Sequence[T]:
+        key = (index * size, size, 1)
+        with self._cache_lock:
+            generation = self._cache_generation
+            items = self._get_cached_slice(key)
+        if items is None:
+            items = self._report_get("slice", *key)
+            if items is None:
+                with self._reading() as view:
+                    items = view._seek_page(index, size)
+                if self._is_current(generation):
+                    self._report_put(items, "slice", *key)
+            self._put_cached_slice(key, items, generation)
+
+        if len(items) > 0:
+            with self._cache_lock:
+                if generation != self._cache_generation:
+                    return items
+                if self._page_bounds is None:
+                    self._page_bounds = {}
+                self._page_bounds[(index, size)] = (self._get_key(items[0]), self._get_key(items[-1]))
+        return items
+
+    def _seek_page(self: Self, index: int, size: int) -> Sequence[T]:
+        """
+            Загрузить страницу поиском от ключа соседней страницы.
+        """
+        with self._cache_lock:
+            bounds = dict(self._page_bounds) if self._page_bounds is not None else {}
+
+        if index == 0:
+            return self._get_seek_slice(None, size, False)
+        elif (index - 1, size) in bounds:
+            return self._get_seek_slice(bounds[(index - 1, size)][1], size, False)
+        elif (index + 1, size) in bounds:
+            return list(reversed(self._get_seek_slice(bounds[(index + 1, size)][0], size, True)))
+        else:
+            #Ключ соседней страницы неизвестен (например, после сброса кеша), поэтому один раз ищем по смещению
+            return self._get_slice(index * size, size, 1)
+
+    def reset_cache(self: Self) -> None:
+        with self._cache_lock:
+            super().reset_cache()
+            self._page_bounds = None
+
+    def _detach(self: Self, connection: Any) -> Self:
+        clone = super()._detach(connection)
+        clone._page_bounds = dict(self._page_bounds) if self._page_bounds is not None else None
+        return clone
+
+    def _adopt_page(self: Self, detached: Self, index: int, size: int, items: Sequence[T]) -> None:
+        super()._adopt_page(detached, index, size, items)
+        if detached._page_bounds is not None and (index, size) in detached._page_bounds:
+            if self._page_bounds is None:
+                self._page_bounds = {}
+            self._page_bounds[(index, size)] = detached._page_bounds[(index, size)]
+
+    @abc.abstractmethod
+    def _get_key(self: Self, item: T) -> tuple[Any, ...]:
+        """
+            Ключ сортировки записи. Должен однозначно определять положение записи в view.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def _get_seek_slice(self: Self, key: tuple[Any, ...] | None, count: int, backward: bool) -> Sequence[T]:
+        """
+            Получить до count записей, следующих за ключом key (или с начала, если key равен None).
+            Если backward равен True, то записи, предшествующие ключу, в порядке удаления от него.
+        """
+        raise NotImplementedError()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Lock, Thread
+from typing import Any, Self
+
+from modules.invalidation import InvalidationBus
+
+
+class WriteQueue:
+    '''
+    Очередь отложенной записи с групповой фиксацией.
+    Операции записи выполняются в отдельном потоке через собственное подключение к БД: поток собирает
+    операции, пришедшие за max_delay секунд (но не больше max_batch), и фиксирует их одной транзакцией.
+    Каждая операция выполняется в своей точке сохранения (SAVEPOINT), поэтому ошибка одной операции
+    (например, отказ триггера) откатывает только её, а остальные операции группы фиксируются.
+
+    Вызывающий код получает Future, который завершается результатом операции после фиксации группы
+    или ошибкой операции (либо ошибкой фиксации всей группы). После фиксации группы об изменённых таблицах
+    один раз сообщается через шину (из потока записи).
+
+    Ограничения надёжности:
+    * операция считается сохранённой только после завершения её Future; операции, ещё стоящие в очереди
+      или выполняемые в незафиксированной группе, теряются при аварийном завершении процесса;
+    * если подключение потока записи открыто с PRAGMA synchronous = NORMAL (профили modules.database),
+      то при отключении питания могут потеряться и последние зафиксированные группы (БД при этом не повреждается);
+    * другие подключения (в том числе основное подключение приложения) видят изменения только после фиксации группы,
+      поэтому перед чтением только что отправленных изменений нужно дождаться их Future или вызвать flush;
+    * перед завершением программы нужно вызвать close: поток записи является фоновым (daemon)
+      и не удерживает процесс, поэтому без close неотправленные операции будут потеряны;
+    * если поток записи не смог открыть подключение (или завершился из-за непредвиденной ошибки),
+      то Future всех ожидающих операций завершаются этой ошибкой, а очередь перестаёт принимать операции.
+    '''
+
+    def __init__(self, connection_factory: Callable[[], sqlite3.Connection], bus: InvalidationBus | None = None,
+                 max_batch: int = 32, max_delay: float = 0.05, close_connection: bool = True) -> None:
+        '''
+        connection_factory : Callable[[], sqlite3.Connection] -- функция, открывающая подключение для потока записи.
+                                                                Вызывается в потоке записи.
+        bus : InvalidationBus | None -- шина, через которую сообщается об изменённых таблицах после фиксации группы.
+        max_batch : int -- максимальное число операций в одной транзакции.
+        max_delay : float -- сколько секунд поток записи ждёт новых операций после первой операции группы.
+        close_connection : bool -- закрывать ли подключение при остановке потока записи
+                                   (False - если подключение принадлежит другому объекту, например пулу, см. ConnectionPool.write_queue).
+        '''
+        self._bus = bus
+        self._close_connection = close_connection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.commits : int = 0
+        '''Число зафиксированных групп'''
+        self._queue : Queue[_Operation | None] = Queue()
+        self._lock = Lock()
+        '''Защищает постановку операций в очередь от одновременного закрытия очереди'''
+        self._closed = False
+        self._error : BaseException | None = None
+        '''Ошибка, из-за которой остановился поток записи'''
+        self._thread = Thread(target=self._run, args=(connection_factory,), name='WriteQueue', daemon=True)
+        self._thread.start()
+
+    def submit[T](self: Self, operation: Callable[[sqlite3.Connection], T], *tables: str) -> Future[T]:
+        '''
+        Поставить операцию записи в очередь.
+
+        Аргументы:
+        operation : Callable[[sqlite3.Connection], T] -- операция, выполняющая запросы через переданное подключение.
+                                                         Не должна фиксировать или откатывать транзакцию.
+        tables : str -- таблицы, которые изменяет операция.
+
+        Возвращает Future с результатом операции. Если очередь уже закрыта или поток записи остановился из-за ошибки,
+        то поднимается RuntimeError.
+        '''
+        with self._lock:
+            if self._error is not None:
+                raise RuntimeError("The write queue has stopped because of an error.") from self._error
+            if self._closed:
+                raise RuntimeError("The write queue is closed.")
+            future : Future[T] = Future()
+            self._queue.put(_Operation(operation, tables, future))
+        return future
+
+    def flush(self: Self) -> None:
+        '''Дождаться фиксации всех операций, поставленных в очередь до вызова'''
+        self.submit(lambda connection: None).result()
+
+    def close(self: Self) -> None:
+        '''Зафиксировать все операции из очереди и остановить поток записи'''
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self: Self, connection_factory: Callable[[], sqlite3.Connection]) -> None:
+        try:
+            connection = connection_factory()
+        except BaseException as e:
+            self._fail(e)
+            return
+        batch : list[_Operation] = []
+        try:
+            running = True
+            while running:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch = [first]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        operation = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except Empty:
+                        break
+                    if operation is None:
+                        running = False
+                        break
+                    batch.append(operation)
+                self._write(connection, batch)
+        except BaseException as e:
+            for operation in batch:
+                if not operation.future.done():
+                    operation.future.set_exception(e)
+            self._fail(e)
+            raise
+        finally:
+            if self._close_connection:
+                connection.close()
+
+    def _fail(self: Self, error: BaseException) -> None:
+        '''Остановить приём операций и завершить ошибкой Future всех операций, оставшихся в очереди'''
+        with self._lock:
+            self._error = error
+            self._closed = True
+        while True:
+            try:
+                operation = self._queue.get_nowait()
+            except Empty:
+                return
+            if operation is not None and operation.future.set_running_or_notify_cancel():
+                operation.future.set_exception(error)
+
+    def _write(self: Self, connection: sqlite3.Connection, batch: list[_Operation]) -> None:
+        '''Выполнить группу операций одной транзакцией и завершить их Future'''
+        done : list[tuple[_Operation, Any]] = []
+        try:
+            connection.execute("BEGIN IMMEDIATE;")
+            for operation in batch:
+                if not operation.future.set_running_or_notify_cancel():
+                    continue
+                connection.execute("SAVEPOINT write_queue;")
+                try:
+                    result = operation.run(connection)
+                except Exception as e:
+                    connection.execute("ROLLBACK TO write_queue;")
+                    connection.execute("RELEASE write_queue;")
+                    operation.future.set_exception(e)
+                else:
+                    connection.execute("RELEASE write_queue;")
+                    done.append((operation, result))
+            connection.commit()
+        except Exception as e:
+            #Не удалось начать или зафиксировать транзакцию: вся группа откатывается
+            if connection.in_transaction:
+                connection.rollback()
+            for operation in batch:
+                if not operation.future.done():
+                    operation.future.set_exception(e)
+            return
+        self.commits += 1
+
+        tables = sorted({ table for operation, _ in done for table in operation.tables })
+        if self._bus is not None and len(tables) > 0:
+            self._bus.notify(*tables)
+        for operation, result in done:
+            operation.future.set_result(result)
+
+
+class _Operation:
+    '''Операция в очереди записи: функция, изменяемые таблицы и Future для результата'''
+    __slots__ = ("run", "tables", "future")
+
+    def __init__(self, run: Callable[[sqlite3.Connection], Any], tables: tuple[str, ...], future: Future[Any]) -> None:
+        self.run = run
+        self.tables = tables
+        self.future = future
@@ -0,0 +1,4 @@
+'''
+Служебные задачи для БД библиотеки.
+Запускаются из корня проекта как модули, например: python -m tools.snapshot_overdue
+'''
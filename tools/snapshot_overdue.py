@@ -0,0 +1,29 @@
+'''
+Ночная задача: снимок отчёта о просроченных книгах.
+
+Сохраняет снимок отчёта на указанную дату (по умолчанию - на сегодня), чтобы отчёт
+"Просроченные книги" на эту дату открывался из снимка, и удаляет снимки старше заданного числа дней.
+Снимки поддерживаются триггерами, поэтому задачу можно запускать в любое время, например ночью по расписанию:
+    python -m tools.snapshot_overdue --db library.db
+'''
+import argparse
+from datetime import date, timedelta
+
+from components.loans.sqlite3 import LoanRepositorySqlite3
+from modules.database import open_database
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сохранить снимок отчёта о просроченных книгах.")
+    parser.add_argument("--db", default="library.db", help="путь к БД")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="дата отчёта в формате ГГГГ-ММ-ДД (по умолчанию - сегодня)")
+    parser.add_argument("--keep", type=int, default=7, help="сколько дней хранить снимки")
+    args = parser.parse_args()
+
+    connection = open_database(args.db, "reporting")
+    try:
+        repo = LoanRepositorySqlite3(connection)
+        count = repo.snapshot_expired_loans(args.date)
+        deleted = repo.delete_expired_loans_snapshots(args.date - timedelta(days=args.keep))
+    finally:
+        connection.close()
+    print(f"Снимок на {args.date.isoformat()}: просроченных взятий - {count}, удалено старых снимков - {deleted}")